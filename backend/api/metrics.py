@@ -0,0 +1,35 @@
+import time
+from flask import Blueprint, Response, g, request
+from backend.utils.metrics import registry, HTTP_SECONDS
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_TEXT = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metrics_bp.before_app_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint != 'metrics.metrics':
+        # шаблон маршруту, а не фактичний шлях — щоб кількість серій не росла з id
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                             endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Метрики процесу в текстовому форматі Prometheus.
+
+    Повертає:
+      Response: Гістограми тривалості зовнішніх запитів, SQL-запитів, етапів /rank і HTTP-запитів,
+      а також частки влучань у кеші.
+    """
+    return Response(registry.render(), mimetype=None, content_type=PROMETHEUS_TEXT)
@@ -1,10 +1,16 @@
+import json
 import logging
-from flask import Blueprint, request, jsonify, abort
-from backend.services.product_service import get_cached_suitable, fetch_and_cache
+from flask import Blueprint, Response, request, jsonify, abort, url_for, stream_with_context
+from backend.services.product_service import (get_or_fetch_suitable, get_cached_suitable,
+                                              normalize_query, record_query)
+from backend.services.job_service import submit_fetch_job, get_job, job_results
+from backend.services.stream_service import stream_suitable
 
 logger = logging.getLogger(__name__)
 products_bp = Blueprint('products', __name__)
 
+NDJSON = 'application/x-ndjson'
+
 @products_bp.route('/products', methods=['GET'])
 def get_products():
     """
@@ -14,6 +20,14 @@ def get_products():
       - query (str): Текст пошуку.
       - limit (int): Максимальна кількість результатів.
 
+    Заголовок «Prefer: respond-async» вмикає асинхронний режим: за нестачі товарів у кеші
+    догрузка ставиться у фонове завдання, а відповідь 202 містить уже закешовані товари
+    та job_id для опитування /products/jobs/<job_id>.
+
+    Заголовок «Accept: application/x-ndjson» вмикає потоковий режим: по рядку JSON на товар
+    (спершу закешовані, далі нові — щойно збережені й визнані «підходящими»),
+    останній рядок — підсумок {"type": "done", ...}.
+
     Повертає:
       Response: JSON-відповідь із кількістю та списком товарів.
     """
@@ -22,12 +36,50 @@ def get_products():
     if not query or limit < 1:
         logger.warning("Невалідні параметри запиту: query=%r, limit=%r", query, limit)
         abort(400, "Невалідний запит або ліміт")
+    record_query(normalize_query(query))
+
+    if request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON:
+        lines = (json.dumps(record) + '\n' for record in stream_suitable(query, limit))
+        return Response(stream_with_context(lines), mimetype=NDJSON)
 
-    products = get_cached_suitable(query, limit)
-    if len(products) < limit:
-        fetch_and_cache(query, limit)
-        products = get_cached_suitable(query, limit)
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        products = get_cached_suitable(normalize_query(query), limit)
+        if len(products) < limit:
+            job = submit_fetch_job(query, limit)
+            items = [p.to_dict() for p in products]
+            logger.info("Запит '%s' передано у фонове завдання %s (у кеші %d)", query, job.id, len(items))
+            return jsonify({
+                'count': len(items),
+                'items': items,
+                'job': job.to_dict(),
+                'status_url': url_for('products.get_job_status', job_id=job.id),
+            }), 202
+    else:
+        products = get_or_fetch_suitable(query, limit)
 
     items = [p.to_dict() for p in products]
     logger.info("Повернуто %d товарів за запитом '%s'", len(items), query)
     return jsonify({'count': len(items), 'items': items}), 200
+
+
+@products_bp.route('/products/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Повертає стан фонового завдання догрузки.
+
+    Параметри:
+      - job_id (str): Ідентифікатор завдання з відповіді 202.
+
+    Повертає:
+      Response: JSON зі статусом і прогресом (found/suitable/needed);
+                для завершеного завдання — також кількість і список товарів.
+    """
+    job = get_job(job_id)
+    if job is None:
+        abort(404, "Завдання не знайдено")
+
+    body = job.to_dict()
+    if job.status == 'done':
+        items = [p.to_dict() for p in job_results(job)]
+        body.update({'count': len(items), 'items': items})
+    return jsonify(body), 200
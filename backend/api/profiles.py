@@ -0,0 +1,112 @@
+import cProfile
+import logging
+import time
+from flask import Blueprint, Flask, current_app, g, jsonify, request, send_file
+from backend.utils.profiler import (StackSampler, ProfileRing, EXTENSIONS, PROFILE_DIR, PROFILE_INTERVAL,
+                                    PROFILE_MODE, PROFILE_MODES, PROFILE_RING_SIZE, PROFILE_SLOW_MS)
+
+logger = logging.getLogger(__name__)
+profiles_bp = Blueprint('profiles', __name__)
+
+PROFILED_ENDPOINTS = ('/products', '/rank')
+
+
+def _profiled(rule: str, endpoints) -> bool:
+    return any(rule == prefix or rule.startswith(prefix + '/') for prefix in endpoints)
+
+
+def install_profiler(app: Flask, threshold: float = PROFILE_SLOW_MS / 1000, directory=PROFILE_DIR,
+                     ring_size: int = PROFILE_RING_SIZE, mode: str = PROFILE_MODE,
+                     endpoints=PROFILED_ENDPOINTS, interval: float = PROFILE_INTERVAL):
+    """
+    Реєструє хуки before_request/teardown_request, що профілюють запити до endpoints
+    і зберігають у кільце профілі запитів, довших за threshold секунд; решта відкидається.
+    У режимі 'off' (за замовчуванням) хуки не реєструються.
+    Для потокових відповідей /products (Accept: application/x-ndjson) вимірюється лише час
+    до початку відповіді.
+
+    :param mode: 'sample' (семплер стеків), 'cprofile' або 'off'.
+    :return: Кільце профілів (також app.extensions['profile_ring']) або None, якщо mode == 'off'.
+    :raises ValueError: Для невідомого режиму.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Невідомий режим профілювання '{mode}', допустимі: {PROFILE_MODES}")
+    if mode == 'off':
+        return None
+    ring = ProfileRing(directory, ring_size)
+    app.extensions['profile_ring'] = ring
+
+    @app.before_request
+    def _start_profile():
+        if request.url_rule is None or not _profiled(request.url_rule.rule, endpoints):
+            return
+        if mode == 'sample':
+            profiler = StackSampler(interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # з Python 3.12 одночасно може працювати лише один профайлер
+                return
+        g.profile = (time.perf_counter(), profiler)
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        started, profiler = g.pop('profile', (None, None))
+        if profiler is None:
+            return
+        if mode == 'sample':
+            profiler.stop()
+            write = lambda path: path.write_text(profiler.collapsed(), encoding='utf-8')
+        else:
+            profiler.disable()
+            write = lambda path: profiler.dump_stats(str(path))
+        duration = time.perf_counter() - started
+        if duration < threshold:
+            return
+        try:
+            path = ring.save(request.url_rule.rule, duration, EXTENSIONS[mode], write)
+        except OSError:
+            logger.exception("Не вдалося зберегти профіль запиту %s", request.path)
+            return
+        logger.warning("Повільний запит %s %s: %.0f мс, профіль %s",
+                       request.method, request.path, duration * 1000, path.name)
+
+    return ring
+
+
+def _ring():
+    return current_app.extensions.get('profile_ring')
+
+
+@profiles_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Список збережених профілів повільних запитів.
+
+    Повертає:
+      Response: JSON {items: [{name, created, endpoint, duration_ms, format, size}]}
+      від найновішого або 404, якщо профілювання вимкнено.
+    """
+    ring = _ring()
+    if ring is None:
+        return jsonify({'error': 'Профілювання вимкнено'}), 404
+    return jsonify({'items': ring.list()}), 200
+
+
+@profiles_bp.route('/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """
+    Завантаження профілю: .collapsed — стеки для flamegraph.pl/speedscope, .prof — для pstats/snakeviz.
+
+    Повертає:
+      Response: Файл профілю або 404.
+    """
+    ring = _ring()
+    path = ring.path(name) if ring is not None else None
+    if path is None:
+        return jsonify({'error': 'Профіль не знайдено'}), 404
+    mimetype = 'text/plain' if path.suffix == '.collapsed' else 'application/octet-stream'
+    return send_file(path.resolve(), mimetype=mimetype, as_attachment=True, download_name=name)
@@ -1,41 +1,332 @@
 import logging
 from flask import Blueprint, request, jsonify
-import pandas as pd
-from backend.services.ranking_service import compute_critic_weights, voronin_score
+import numpy as np
+from backend.services.ranking_service import (modes_to_mask, build_matrix, rank_scenarios,
+                                              rank_matrix, rank_cache_stats, select_top, score_stats,
+                                              create_session, get_session, update_session,
+                                              session_ranking, delete_session, rank_sensitivity,
+                                              rank_features)
+from backend.services.product_service import feature_matrix, normalize_query
+from backend.utils.metrics import RANK_SECONDS
 
 logger = logging.getLogger(__name__)
 rank_bp = Blueprint('ranking', __name__)
 
+MAX_BATCH_SCENARIOS = 256
+# товарів × сценаріїв за один запит /rank/batch (матриця скорів S×n)
+MAX_BATCH_CELLS = 1_000_000
+SENSITIVITY_DRAWS = 1000
+MAX_SENSITIVITY_DRAWS = 20000
+# гістограма місць займає n² лічильників: 2000 товарів — 32 МБ
+MAX_SENSITIVITY_ITEMS = 2000
+SENSITIVITY_CONCENTRATION = 100.0
+
+
+def _pagination():
+    """
+    Параметри top_k та offset із рядка запиту.
+
+    :return: (top_k, offset) або None, якщо пагінацію не запитано; top_k = None — до кінця рейтингу.
+    :raises ValueError: Для від'ємних або нечислових значень.
+    """
+    if 'top_k' not in request.args and 'offset' not in request.args:
+        return None
+    try:
+        top_k = int(request.args['top_k']) if 'top_k' in request.args else None
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        top_k = offset = -1
+    if offset < 0 or (top_k is not None and top_k < 0):
+        raise ValueError("top_k та offset мають бути невід'ємними цілими числами")
+    return top_k, offset
+
+
+def _request_matrix(data: list):
+    """
+    Матриця критеріїв із тіла /rank; критерії й режими беруться з першого товару.
+
+    :return: (назви критеріїв, матриця n×m, вектор режимів "max").
+    :raises ValueError: Для некоректних режимів.
+    """
+    first = data[0]['selected_characteristics']
+    parameters = [ch['parameter'] for ch in first]
+    X = np.array([
+        [values.get(p, np.nan) for p in parameters]
+        for values in ({ch['parameter']: ch['value'] for ch in item['selected_characteristics']} for item in data)
+    ], dtype=np.float64)
+    return parameters, X, modes_to_mask([ch['mode'] for ch in first])
+
+
+def _page(items: list, scores: np.ndarray, top_k, offset: int) -> dict:
+    """Сторінка рейтингу: лише вибрані рядки плюс загальна кількість і статистика скорів."""
+    total = int(np.count_nonzero(~np.isnan(scores)))
+    top_k = total if top_k is None else top_k
+    return {
+        'total': total,
+        'offset': offset,
+        'top_k': top_k,
+        'stats': score_stats(scores),
+        'items': [{'title': items[i].get('title'), 'id': items[i].get('id'), 'score': float(scores[i])}
+                  for i in select_top(scores, top_k, offset)],
+    }
+
 @rank_bp.route('/rank', methods=['POST'])
 def rank():
     """
     Ендпоінт для багатокритеріального ранжування.
 
     Параметри:
-      Немає (очікується JSON-тіло запиту).
+      top_k (int, опціонально): Скільки найкращих товарів повернути.
+      offset (int, опціонально): Скільки найкращих товарів пропустити.
+      Тіло запиту — JSON-список товарів із вибраними характеристиками.
 
     Повертає:
-      Response: JSON-відповідь із відсортованим списком товарів.
+      Response: JSON-список товарів від кращого (меншого скору) до гіршого. Якщо задано top_k
+      чи offset — об'єкт {total, offset, top_k, stats, items} зі сторінкою того ж рейтингу.
     """
     data = request.get_json()
     if not isinstance(data, list) or not data:
         logger.warning("Невалідний формат даних для ранжування: %r", data)
         return jsonify({'error': 'Невалідний формат введення'}), 400
+    try:
+        pagination = _pagination()
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        parameters, X, maximize = _request_matrix(data)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    weights, scores = rank_matrix(X, maximize, [item['id'] for item in data], parameters)
+
+    with RANK_SECONDS.time(stage='serialize'):
+        if pagination is not None:
+            page = _page(data, scores, *pagination)
+            logger.info("Ранжування виконано для %d елементів, повернуто %d", page['total'], len(page['items']))
+            return jsonify(page), 200
+
+        results = sorted([
+            {'title': item['title'], 'id': item['id'], 'score': float(s)}
+            for item, s in zip(data, scores)
+        ], key=lambda x: x['score'])
+
+        logger.info("Ранжування успішно виконано для %d елементів", len(results))
+        return jsonify(results), 200
+
+
+@rank_bp.route('/rank/batch', methods=['POST'])
+def rank_batch():
+    """
+    Ендпоінт пакетного ранжування: багато сценаріїв над одним набором альтернатив.
+
+    Тіло запиту:
+      {"items": [{"id", "title", "values": {критерій: значення}}],
+       "scenarios": [{"name", "criteria": {критерій: "max"|"min"}, "ids": [...]?}]}
+
+    Параметри:
+      top_k, offset (int, опціонально): Сторінка рейтингу кожного сценарію (див. /rank).
+
+    Повертає:
+      Response: JSON із вагами та відсортованими (від кращого, меншого скору) результатами
+      для кожного сценарію.
+    """
+    data = request.get_json(silent=True) or {}
+    items, scenarios = data.get('items'), data.get('scenarios')
+    if (not isinstance(items, list) or not items or not isinstance(scenarios, list) or not scenarios
+            or not all(isinstance(item, dict) and isinstance(item.get('values'), dict) for item in items)
+            or not all(isinstance(scenario, dict) and isinstance(scenario.get('criteria'), dict)
+                       for scenario in scenarios)):
+        logger.warning("Невалідний формат даних для пакетного ранжування")
+        return jsonify({'error': 'Невалідний формат введення'}), 400
+    if len(scenarios) > MAX_BATCH_SCENARIOS:
+        return jsonify({'error': f'Не більше {MAX_BATCH_SCENARIOS} сценаріїв за запит'}), 400
+    if len(items) * len(scenarios) > MAX_BATCH_CELLS:
+        return jsonify({'error': f'Не більше {MAX_BATCH_CELLS} пар товар×сценарій за запит'}), 400
+
+    try:
+        top_k, offset = _pagination() or (None, 0)
+        parameters, X = build_matrix(items)
+        ranked = rank_scenarios(X, parameters, scenarios, ids=[item.get('id') for item in items])
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    response = []
+    for scenario in ranked:
+        page = _page(items, scenario['scores'], top_k, offset)
+        response.append({
+            'name': scenario['name'],
+            'weights': scenario['weights'],
+            'count': page.pop('total'),
+            'results': page.pop('items'),
+            **page,
+        })
+
+    logger.info("Пакетне ранжування: %d сценаріїв, %d елементів", len(response), len(items))
+    return jsonify({'parameters': parameters, 'scenarios': response}), 200
+
+
+@rank_bp.route('/rank/query', methods=['POST'])
+def rank_query():
+    """
+    Ранжування закешованих товарів пошукового запиту на сервері, без пересилання значень.
+
+    Тіло запиту:
+      {"query", "limit"?, "criteria": {критерій: "max"|"min"}, "bounds"?: {критерій: [мін, макс]}}
+      Критерії — назви характеристик або "Ціна"; товари ті самі, що повертає /products з тими ж
+      query та limit (лише вже закешовані, без звернень до зовнішніх API).
+
+    Параметри:
+      top_k, offset (int, опціонально): Сторінка рейтингу (див. /rank).
+
+    Повертає:
+      Response: JSON {query, weights, excluded, total, offset, top_k, stats, items} — items від
+      кращого (меншого скору); excluded — товари без значень критеріїв або поза межами bounds.
+    """
+    data = request.get_json(silent=True) or {}
+    query, limit, criteria = data.get('query'), data.get('limit', 10), data.get('criteria')
+    bounds = data.get('bounds') or {}
+    if (not isinstance(query, str) or not query.strip() or not isinstance(limit, int) or limit < 1
+            or not isinstance(criteria, dict) or not criteria or not isinstance(bounds, dict)):
+        logger.warning("Невалідний формат даних для ранжування за запитом: %r", data)
+        return jsonify({'error': 'Невалідний формат введення'}), 400
+
+    try:
+        top_k, offset = _pagination() or (None, 0)
+        features = feature_matrix(normalize_query(query), limit)
+        rows, parameters, weights, scores = rank_features(features, criteria, bounds)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
 
-    df = pd.DataFrame([
-        {ch['parameter']: ch['value'] for ch in item['selected_characteristics']}
-        for item in data
-    ])
-    modes = [ch['mode'] for ch in data[0]['selected_characteristics']]
+    with RANK_SECONDS.time(stage='serialize'):
+        items = [{'id': features['ids'][i], 'title': features['titles'][i]} for i in rows]
+        page = _page(items, scores, top_k, offset)
+        logger.info("Ранжування за запитом %r: %d товарів, повернуто %d", query, page['total'], len(page['items']))
+        return jsonify({
+            'query': normalize_query(query),
+            'weights': dict(zip(parameters, map(float, weights))),
+            'excluded': len(features['ids']) - len(rows),
+            **page,
+        }), 200
 
-    weights = compute_critic_weights(df, modes)
-    scores = voronin_score(df, weights, modes)
 
-    results = sorted([
-        {'title': item['title'], 'id': item['id'], 'score': float(s)}
-        for item, s in zip(data, scores)
-    ], key=lambda x: x['score'], reverse=True)
+@rank_bp.route('/rank/cache', methods=['GET'])
+def rank_cache():
+    """
+    Стан кешу результатів ранжування.
+
+    Повертає:
+      Response: JSON із лічильниками влучань/промахів, кількістю записів і розміром у байтах.
+    """
+    return jsonify(rank_cache_stats()), 200
+
+
+@rank_bp.route('/rank/sensitivity', methods=['POST'])
+def rank_sensitivity_view():
+    """
+    Аналіз стійкості рейтингу до збурень ваг CRITIC (Монте-Карло, розподіл Діріхле навколо ваг).
+
+    Параметри:
+      draws (int, опціонально): Кількість спроб (за замовчуванням 1000, не більше 20000).
+      concentration (float, опціонально): Концентрація Діріхле; більша — менші збурення.
+      seed (int, опціонально): Зерно генератора для відтворюваних результатів.
+      Тіло запиту — як у /rank, не більше 2000 товарів.
+
+    Повертає:
+      Response: JSON із базовими вагами та для кожного товару (у порядку базового рейтингу) —
+      базове місце, середнє місце, 5/50/95-й перцентилі місця та ймовірність бути першим.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Невалідний формат введення'}), 400
+    try:
+        draws = int(request.args.get('draws', SENSITIVITY_DRAWS))
+        concentration = float(request.args.get('concentration', SENSITIVITY_CONCENTRATION))
+        seed = int(request.args['seed']) if 'seed' in request.args else None
+        if not 0 < draws <= MAX_SENSITIVITY_DRAWS or not concentration > 0:
+            raise ValueError(f"draws має бути від 1 до {MAX_SENSITIVITY_DRAWS}, concentration — додатним")
+        if len(data) > MAX_SENSITIVITY_ITEMS:
+            raise ValueError(f"Аналіз стійкості — не більше {MAX_SENSITIVITY_ITEMS} товарів")
+        parameters, X, maximize = _request_matrix(data)
+        result = rank_sensitivity(X, maximize, draws, concentration, seed)
+    except (KeyError, TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
 
-    logger.info("Ранжування успішно виконано для %d елементів", len(results))
-    return jsonify(results), 200
+    order = np.argsort(result['base_rank'])
+    items = [{
+        'id': data[i]['id'],
+        'title': data[i].get('title'),
+        'score': float(result['scores'][i]),
+        'base_rank': int(result['base_rank'][i]),
+        'mean_rank': float(result['mean_rank'][i]),
+        'rank_p05': int(result['rank_p05'][i]),
+        'rank_p50': int(result['rank_p50'][i]),
+        'rank_p95': int(result['rank_p95'][i]),
+        'p_top1': float(result['p_top1'][i]),
+    } for i in order]
+    logger.info("Аналіз стійкості: %d товарів, %d спроб", len(items), draws)
+    return jsonify({
+        'draws': draws,
+        'concentration': concentration,
+        'seed': seed,
+        'weights': dict(zip(parameters, map(float, result['weights']))),
+        'items': items,
+    }), 200
+
+
+def _session_response(session_id: str, session: dict):
+    """Сторінка рейтингу сесії разом із вагами критеріїв."""
+    try:
+        items, weights, scores = session_ranking(session)
+        pagination = _pagination() or (None, 0)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return {'session_id': session_id, 'weights': weights, **_page(items, scores, *pagination)}
+
+
+@rank_bp.route('/rank/sessions', methods=['POST'])
+def create_rank_session():
+    """
+    Створює сесію ранжування: стан CRITIC зберігається між запитами й оновлюється інкрементально.
+
+    Тіло запиту — як у /rank. Параметри top_k/offset — як у /rank.
+
+    Повертає:
+      Response: 201 з session_id, вагами й сторінкою рейтингу.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Невалідний формат введення'}), 400
+    try:
+        session_id = create_session(data)
+    except (KeyError, TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    response = _session_response(session_id, get_session(session_id))
+    return (jsonify(response), 201) if isinstance(response, dict) else response
+
+
+@rank_bp.route('/rank/sessions/<session_id>', methods=['GET', 'PATCH', 'DELETE'])
+def rank_session(session_id):
+    """
+    Ранжування в межах сесії.
+
+    GET — поточний рейтинг; PATCH з тілом {"add": [товари як у /rank], "remove": [id]} —
+    зміна набору товарів без повного перерахунку ваг; DELETE — завершення сесії.
+
+    Повертає:
+      Response: JSON із вагами й сторінкою рейтингу, 204 для DELETE або 404 для невідомої сесії.
+    """
+    if request.method == 'DELETE':
+        return ('', 204) if delete_session(session_id) else (jsonify({'error': 'Сесію не знайдено'}), 404)
 
+    session = get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Сесію не знайдено'}), 404
+    if request.method == 'PATCH':
+        data = request.get_json(silent=True) or {}
+        try:
+            update_session(session, add=data.get('add') or [], remove=data.get('remove') or [])
+        except (KeyError, TypeError, ValueError) as exc:
+            return jsonify({'error': str(exc)}), 400
+    response = _session_response(session_id, session)
+    return (jsonify(response), 200) if isinstance(response, dict) else response
@@ -1,11 +1,23 @@
+import os
 from logging.config import dictConfig
 from flask import Flask
 from backend.data.database import initialize_database
+from backend.services.job_service import resume_pending_jobs
+from backend.services.reprice_service import RepriceScheduler
 from api.products import products_bp
 from api.ranking import rank_bp
+from api.metrics import metrics_bp
+from api.profiles import profiles_bp, install_profiler
+from backend.utils.profiler import PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_RING_SIZE, PROFILE_MODE
 
-def create_app():
-    """Створює Flask-додаток, реєструє API-блютпринти та налаштовує логування."""
+def create_app(background: bool = True):
+    """
+    Створює Flask-додаток, реєструє API-блютпринти та налаштовує логування.
+
+    :param background: Чи запускати фонову роботу процесу: відновлення перерваних завдань
+                       і (за REPRICE_IN_PROCESS=1) планувальник переоцінки. False — для процесу,
+                       що лише стежить за змінами коду (батьківський процес перезавантажувача).
+    """
     dictConfig({
         'version': 1,
         'disable_existing_loggers': False,
@@ -35,9 +47,24 @@ def create_app():
 
     app = Flask(__name__)
     initialize_database()
+    if background:
+        resume_pending_jobs()
+        # переоцінка цін у процесі API — за бажанням; інакше окремо: backend/reprice.py
+        if os.environ.get('REPRICE_IN_PROCESS') == '1':
+            RepriceScheduler().start()
     app.register_blueprint(products_bp)
     app.register_blueprint(rank_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiles_bp)
+    # профілі повільних /products та /rank вмикаються явно: PROFILE_MODE=sample|cprofile
+    install_profiler(app,
+                     threshold=float(os.environ.get('PROFILE_SLOW_MS', PROFILE_SLOW_MS)) / 1000,
+                     directory=os.environ.get('PROFILE_DIR', PROFILE_DIR),
+                     ring_size=int(os.environ.get('PROFILE_RING_SIZE', PROFILE_RING_SIZE)),
+                     mode=os.environ.get('PROFILE_MODE', PROFILE_MODE))
     return app
 
 if __name__ == '__main__':
-    create_app().run(debug=True, port=8000)
+    # з debug=True перезавантажувач Werkzeug обслуговує запити в дочірньому процесі
+    # (WERKZEUG_RUN_MAIN=true); лише він відновлює завдання, інакше кожне виконувалося б двічі
+    create_app(background=os.environ.get('WERKZEUG_RUN_MAIN') == 'true').run(debug=True, port=8000)
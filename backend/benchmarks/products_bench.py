@@ -0,0 +1,109 @@
+"""
+Наскрізний бенчмарк /products на симуляторі зовнішніх API (див. upstream_simulator).
+
+Для кожного з --queries різних запитів виконується холодний виклик /products (порожня база)
+та --warm повторних (товари вже в кеші). Звіт — перцентилі затримок і кількість звернень
+до кожного ендпоінта симулятора.
+
+Запуск:
+    PYTHONPATH=. python backend/benchmarks/products_bench.py [--queries 5] [--limit 20]
+        [--catalogue 200] [--latency-scale 1.0] [--error-rate 0.0] [--no-throttle] [--json out.json]
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+import numpy as np
+from flask import Flask
+from backend.benchmarks.upstream_simulator import UpstreamSimulator, SimulatorConfig
+from backend.data.database import db, initialize_database
+from backend.api.products import products_bp
+
+
+def percentiles(samples: List[float]) -> dict:
+    """p50/p90/p99/max у мілісекундах."""
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1e3
+    return {
+        'count': len(samples),
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def run(queries: int, limit: int, warm: int, config: SimulatorConfig, real_throttle: bool = True) -> dict:
+    """
+    Запускає симулятор, тимчасову базу й Flask-клієнт і вимірює холодні та теплі запити.
+
+    :return: Звіт {'cold': {...}, 'warm': {...}} із перцентилями та лічильниками звернень.
+    """
+    app = Flask(__name__)
+    app.register_blueprint(products_bp)
+    client = app.test_client()
+    texts = [f"павербанк серія {i}" for i in range(queries)]
+
+    report = {}
+    # база застосунку (файл і pragmas) повертається після бенчмарку
+    saved_database, saved_pragmas = db.database, list(db._pragmas)
+    simulator = UpstreamSimulator(config).start()
+    with tempfile.TemporaryDirectory() as tmp, simulator.point_enricher(real_throttle=real_throttle):
+        db.init(str(Path(tmp) / 'products.db'), pragmas={'journal_mode': 'wal'})
+        try:
+            initialize_database()
+            for phase, repeats in (('cold', 1), ('warm', warm)):
+                simulator.reset_counters()
+                latencies, counts = [], []
+                for _ in range(repeats):
+                    for text in texts:
+                        started = time.perf_counter()
+                        response = client.get('/products', query_string={'query': text, 'limit': limit})
+                        latencies.append(time.perf_counter() - started)
+                        counts.append(response.get_json()['count'] if response.status_code == 200 else 0)
+                report[phase] = {
+                    'latency_ms': percentiles(latencies),
+                    'items_per_request': float(np.mean(counts)),
+                    'upstream_calls': dict(simulator.calls),
+                    'upstream_errors': dict(simulator.errors),
+                }
+        finally:
+            db.close()
+            db.init(saved_database, pragmas=saved_pragmas)
+            simulator.stop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=5, help='різних пошукових запитів')
+    parser.add_argument('--limit', type=int, default=20, help='limit для /products')
+    parser.add_argument('--warm', type=int, default=5, help='повторів кожного запиту з кешу')
+    parser.add_argument('--catalogue', type=int, default=200, help='товарів на запит у симуляторі')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='множник затримок симулятора')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='частка відповідей 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-throttle', action='store_true', help='вимкнути per-host обмежувач частоти')
+    parser.add_argument('--json', type=Path, help='зберегти звіт у JSON')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = SimulatorConfig(catalogue_size=args.catalogue, error_rate=args.error_rate, seed=args.seed)
+    config.latency = {k: v * args.latency_scale for k, v in config.latency.items()}
+    report = run(args.queries, args.limit, args.warm, config, real_throttle=not args.no_throttle)
+
+    for phase, result in report.items():
+        latency = result['latency_ms']
+        print(f"{phase:>5}: n={latency['count']} p50={latency['p50']:.1f} мс p90={latency['p90']:.1f} мс "
+              f"p99={latency['p99']:.1f} мс max={latency['max']:.1f} мс, товарів={result['items_per_request']:.1f}")
+        print(f"       звернення: {result['upstream_calls']}, помилки: {result['upstream_errors']}")
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
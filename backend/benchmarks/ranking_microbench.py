@@ -0,0 +1,80 @@
+"""
+Мікробенчмарк ранжування: колишній шлях через pandas проти ядра NumPy.
+
+Запуск:
+    PYTHONPATH=. python backend/benchmarks/ranking_microbench.py [--rows 100 10000 1000000] [--cols 30]
+"""
+import argparse
+import time
+from typing import List
+import numpy as np
+import pandas as pd
+from backend.services.ranking_core import critic_weights, voronin_scores
+
+
+def legacy_rank(items: List[dict], modes: List[str]) -> np.ndarray:
+    """Попередня реалізація /rank: DataFrame зі словників, нормалізація по стовпцях і pandas corr."""
+    df = pd.DataFrame(items)
+    norm = df.copy()
+    for i, col in enumerate(df.columns):
+        span = df[col].max() - df[col].min()
+        norm[col] = (df[col] - df[col].min()) / span if modes[i] == 'max' else (df[col].max() - df[col]) / span
+    C = norm.std(ddof=0) * (1 - norm.corr()).sum(axis=1)
+    weights = C / C.sum()
+
+    Y = np.zeros_like(df.values, dtype=float)
+    for j, mode in enumerate(modes):
+        col = df.iloc[:, j].astype(float).values
+        col_min, col_max = col.min(), col.max()
+        span = col_max - col_min
+        Y[:, j] = (col_max - col) / span if mode == 'max' else (col - col_min) / span
+    return np.sum(weights.values / (1.0 - Y + 1e-12), axis=1)
+
+
+def numpy_rank(items: List[dict], modes: List[str]) -> np.ndarray:
+    """Новий шлях /rank: матриця з даних запиту і ядро ranking_core."""
+    parameters = list(items[0])
+    X = np.array([[item[p] for p in parameters] for item in items], dtype=np.float64)
+    maximize = np.array([m == 'max' for m in modes])
+    return voronin_scores(X, critic_weights(X, maximize), maximize)
+
+
+def numpy_core(X: np.ndarray, maximize: np.ndarray) -> np.ndarray:
+    """Лише обчислення над готовою матрицею."""
+    return voronin_scores(X, critic_weights(X, maximize), maximize)
+
+
+def best_of(fn, *args, repeat: int = 3) -> float:
+    """Найкращий час виконання fn(*args) з repeat спроб, секунди."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10_000, 1_000_000])
+    parser.add_argument('--cols', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'рядків':>10} {'pandas, мс':>12} {'numpy, мс':>12} {'ядро, мс':>10} {'прискорення':>12}")
+    for n in args.rows:
+        X = rng.lognormal(size=(n, args.cols))
+        maximize = rng.random(args.cols) < 0.5
+        modes = ['max' if m else 'min' for m in maximize]
+        items = pd.DataFrame(X, columns=[f'c{j}' for j in range(args.cols)]).to_dict('records')
+        assert np.allclose(legacy_rank(items, modes), numpy_rank(items, modes))
+
+        legacy = best_of(legacy_rank, items, modes, repeat=args.repeat)
+        fast = best_of(numpy_rank, items, modes, repeat=args.repeat)
+        core = best_of(numpy_core, X, maximize, repeat=args.repeat)
+        print(f"{n:>10} {legacy * 1e3:>12.2f} {fast * 1e3:>12.2f} {core * 1e3:>10.2f} {legacy / fast:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
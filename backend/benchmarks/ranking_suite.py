@@ -0,0 +1,184 @@
+"""
+Набір бенчмарків ранжування з JSON-базами та перевіркою регресій.
+
+Сітка: рядки 10…10⁶ × критерії 2…100 (комірки понад --max-cells значень пропускаються),
+для кожної — три профілі даних: змішані min/max, вироджені стовпці (span == 0) і всі "max".
+Вимірюється compute_critic_weights + voronin_score над готовим DataFrame; результат —
+найкращий час раунду та пропускна здатність (рядків за секунду).
+
+Запуск:
+    PYTHONPATH=. python backend/benchmarks/ranking_suite.py --save backend/benchmarks/baselines/ranking.json
+    PYTHONPATH=. python backend/benchmarks/ranking_suite.py --compare backend/benchmarks/baselines/ranking.json
+Код виходу 1, якщо пропускна здатність хоча б одного випадку впала більше ніж на --tolerance.
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from backend.services.ranking_service import compute_critic_weights, voronin_score
+
+ROWS = [10, 1_000, 100_000, 1_000_000]
+CRITERIA = [2, 10, 30, 100]
+PROFILES = ['mixed', 'degenerate', 'all_max']
+QUICK_ROWS = [10, 1_000, 10_000]
+QUICK_CRITERIA = [2, 10, 30]
+MAX_CELLS = 10_000_000
+# мінімальний сумарний час вимірювань одного випадку, с
+MIN_TIME = 0.2
+MIN_ROUNDS = 3
+ROUND_TIME = 0.02
+TOLERANCE = 0.25
+CONFIRM_ATTEMPTS = 2
+
+
+def make_case(rows: int, criteria: int, profile: str, seed: int = 0):
+    """Матриця з детермінованими даними профілю та відповідні режими."""
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(mean=3, sigma=1, size=(rows, criteria))
+    modes = ['max' if m else 'min' for m in rng.random(criteria) < 0.5]
+    if profile == 'degenerate':
+        X[:, ::4] = 42.0
+    elif profile == 'all_max':
+        modes = ['max'] * criteria
+    return pd.DataFrame(X, columns=[f'c{j}' for j in range(criteria)]), modes
+
+
+def rank_once(df: pd.DataFrame, modes: List[str]) -> np.ndarray:
+    weights = compute_critic_weights(df, modes)
+    return voronin_score(df, weights, modes)
+
+
+def measure(fn, *args, min_time: float = MIN_TIME, min_rounds: int = MIN_ROUNDS) -> dict:
+    """
+    Вимірює fn(*args), як timeit: малі випадки виконуються пачками щонайменше ROUND_TIME
+    на раунд; раунди повторюються, доки не набереться min_time і min_rounds.
+
+    :return: Найкращий і медіанний час одного виклику, кількість раундів і викликів у раунді.
+    """
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        if time.perf_counter() - t0 >= ROUND_TIME:
+            break
+        number *= 2
+    times = []
+    started = time.perf_counter()
+    while len(times) < min_rounds or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        times.append((time.perf_counter() - t0) / number)
+    return {'rounds': len(times), 'number': number, 'best_s': min(times), 'median_s': float(np.median(times))}
+
+
+def run_case(n: int, m: int, profile: str, min_time: float = MIN_TIME) -> dict:
+    """Вимірює один випадок сітки."""
+    df, modes = make_case(n, m, profile)
+    stats = measure(rank_once, df, modes, min_time=min_time)
+    return dict(stats, rows=n, criteria=m, profile=profile, rows_per_s=n / stats['best_s'])
+
+
+def run(rows=ROWS, criteria=CRITERIA, profiles=PROFILES, max_cells: int = MAX_CELLS,
+        min_time: float = MIN_TIME) -> Dict[str, dict]:
+    """
+    Виконує сітку бенчмарків.
+
+    :return: {ідентифікатор випадку: {'rows', 'criteria', 'profile', 'best_s', 'median_s',
+              'rounds', 'number', 'rows_per_s'}}.
+    """
+    logging.getLogger('backend.services.ranking_service').setLevel(logging.WARNING)
+    results = {}
+    for n in rows:
+        for m in criteria:
+            if n * m > max_cells:
+                continue
+            for profile in profiles:
+                key = f"rank/{profile}/{n}x{m}"
+                results[key] = run_case(n, m, profile, min_time)
+                print(f"{key:<32} best={results[key]['best_s'] * 1e3:10.3f} мс  "
+                      f"{results[key]['rows_per_s']:14,.0f} рядків/с  ({results[key]['rounds']} раундів)")
+    return results
+
+
+def confirm(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = TOLERANCE,
+            attempts: int = CONFIRM_ATTEMPTS) -> List[str]:
+    """
+    Перевіряє регресії з повторними вимірюваннями: випадок, що не вклався в допуск,
+    вимірюється ще до attempts разів довше (шум спільних машин), зберігається найкращий результат.
+
+    :return: Описи підтверджених регресій.
+    """
+    for _ in range(attempts):
+        suspects = [key for key, base in baseline.items()
+                    if key in results and results[key]['rows_per_s'] < base['rows_per_s'] * (1 - tolerance)]
+        if not suspects:
+            break
+        for key in suspects:
+            retry = run_case(results[key]['rows'], results[key]['criteria'], results[key]['profile'],
+                             min_time=MIN_TIME * 5)
+            if retry['rows_per_s'] > results[key]['rows_per_s']:
+                results[key] = retry
+    return compare(results, baseline, tolerance)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Порівнює пропускну здатність із базою.
+
+    :return: Описи регресій (випадки, повільніші за базу більше ніж на tolerance).
+    """
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        ratio = current['rows_per_s'] / base['rows_per_s']
+        if ratio < 1 - tolerance:
+            regressions.append(f"{key}: {ratio:.2f}× від бази "
+                               f"({current['rows_per_s']:,.0f} проти {base['rows_per_s']:,.0f} рядків/с)")
+    return regressions
+
+
+def environment() -> dict:
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'platform': platform.platform()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='мала сітка для швидкої перевірки')
+    parser.add_argument('--max-cells', type=int, default=MAX_CELLS, help='максимум рядків × критеріїв')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help='секунд вимірювань на випадок')
+    parser.add_argument('--save', type=Path, help='зберегти результати як базу')
+    parser.add_argument('--compare', type=Path, help='порівняти з базою')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='допустиме падіння пропускної здатності')
+    args = parser.parse_args()
+
+    rows, criteria = (QUICK_ROWS, QUICK_CRITERIA) if args.quick else (ROWS, CRITERIA)
+    results = run(rows, criteria, max_cells=args.max_cells, min_time=args.min_time)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({'environment': environment(), 'results': results}, indent=2))
+        print(f"Базу збережено: {args.save}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = confirm(results, baseline['results'], args.tolerance)
+        if regressions:
+            print("Регресії продуктивності:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"Регресій немає (допуск {args.tolerance:.0%}, база: {baseline['environment']['platform']})")
+
+
+if __name__ == '__main__':
+    main()
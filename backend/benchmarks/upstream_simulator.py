@@ -0,0 +1,277 @@
+"""
+Локальний симулятор зовнішніх API (Prozorro та Hotline) для офлайн-бенчмарків і тестів.
+
+Імітує:
+  POST /api/search/products?text=&page=   — пошук Prozorro (сторінки по PAGE_SIZE товарів),
+  GET  /api/products/<id>                 — картка товару Prozorro з характеристиками,
+  POST /svc/search/api/json-rpc           — пошук Hotline (search.search),
+  POST /svc/frontend-api/graphql          — urlTypeDefiner та getOffers Hotline,
+  GET  /__stats                           — лічильники звернень.
+
+Каталог детермінований (залежить від seed і тексту запиту), затримки та частка помилок
+задаються параметрами. Кожен «хост» обслуговується на 127.0.0.1 на окремому порту, щоб
+per-host обмежувач частоти клієнта поводився так само, як із реальними API.
+
+Запуск окремо (хости — на портах 8900, 8901, 8902):
+    PYTHONPATH=. python backend/benchmarks/upstream_simulator.py --port 8900
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import urlparse, parse_qs
+from backend.utils import product_enricher
+from backend.utils.throttle import throttle, HOST_MIN_INTERVALS
+
+PAGE_SIZE = 10
+# симулятор слухає лише loopback; кожен реальний хост — окремий порт
+BIND_ADDRESS = '127.0.0.1'
+HOSTS = ('prozorro.gov.ua', 'market-api.prozorro.gov.ua', 'hotline.ua')
+# глобальні змінні product_enricher, що перенаправляє point_enricher
+ENRICHER_URLS = ('PROZORRO_SEARCH_URL', 'PROZORRO_PRODUCT_URL', 'HOTLINE_BASE_URL',
+                 'HOTLINE_SEARCH_URL', 'HOTLINE_GRAPHQL_URL')
+REQUIREMENTS = [('Ємність', 'мА·год', 5000, 30000), ('Потужність', 'Вт', 10, 100),
+                ('Вага', 'г', 100, 600), ('Кількість портів', 'шт', 1, 4), ('Напруга', 'В', 5, 20)]
+
+
+@dataclass
+class SimulatorConfig:
+    """
+    Параметри симулятора.
+
+    Атрибути:
+      catalogue_size – товарів на один пошуковий запит,
+      latency        – середня затримка відповіді за ендпоінтом, с,
+      jitter         – частка випадкового відхилення затримки (0.2 — ±20 %),
+      error_rate     – частка відповідей 503,
+      not_found_rate – частка товарів, яких немає на Hotline,
+      seed           – зерно детермінованого каталогу.
+    """
+    catalogue_size: int = 200
+    latency: Dict[str, float] = field(default_factory=lambda: {
+        'search': 0.15, 'product': 0.08, 'hotline_search': 0.1, 'hotline_token': 0.05, 'hotline_offers': 0.1,
+    })
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    not_found_rate: float = 0.1
+    seed: int = 0
+
+
+class UpstreamSimulator:
+    """Симулятор у фонових потоках (по серверу на хост); лічильники звернень — у calls та errors."""
+
+    def __init__(self, config: SimulatorConfig = None, port: int = 0):
+        """
+        :param port: Порт першого хоста (наступні — port + 1, ...); 0 — вільні порти, обрані ОС.
+        """
+        self.config = config or SimulatorConfig()
+        self.calls = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self.servers = {}
+        for offset, host in enumerate(HOSTS):
+            server = ThreadingHTTPServer((BIND_ADDRESS, port + offset if port else 0), self._handler())
+            server.daemon_threads = True
+            self.servers[host] = server
+        self._threads = []
+
+    # --- детермінований каталог -------------------------------------------------
+
+    def _random(self, *key) -> random.Random:
+        return random.Random(zlib.crc32(repr((self.config.seed,) + key).encode()))
+
+    def search_page(self, text: str, page: int) -> list:
+        namespace = zlib.crc32(text.encode()) % 100000
+        first = (page - 1) * PAGE_SIZE
+        items = []
+        for i in range(first, min(first + PAGE_SIZE, self.config.catalogue_size)):
+            rng = self._random('item', text, i)
+            code = f"SIM{namespace}-{i}{rng.choice('ABCDEFGH')}"
+            # частина назв без коду в дужках — як у реальному пошуку
+            title = f"{text} модель {i} ({code})" if rng.random() > 0.1 else f"{text} модель {i}"
+            items.append({'id': f"{namespace}-{i}", 'title': title})
+        return items
+
+    def product(self, product_id: str) -> dict:
+        rng = self._random('product', product_id)
+        responses = []
+        for j, (name, unit, lo, hi) in enumerate(REQUIREMENTS):
+            if j < 3 or rng.random() < 0.5:
+                responses.append({'requirement': name, 'value': rng.randint(lo, hi), 'unit': {'name': unit}})
+        return {'data': {'id': product_id, 'requirementResponses': responses}}
+
+    def hotline_found(self, identifier: str) -> bool:
+        return self._random('found', identifier).random() >= self.config.not_found_rate
+
+    def offers(self, slug: str) -> list:
+        rng = self._random('offers', slug)
+        base = rng.uniform(300, 3000)
+        return [round(base * rng.uniform(0.85, 1.3), 2) for _ in range(rng.randint(1, 30))]
+
+    # --- HTTP ---------------------------------------------------------------------
+
+    def _delay(self, endpoint: str) -> None:
+        mean = self.config.latency.get(endpoint, 0.0)
+        if mean > 0:
+            with self._lock:
+                factor = 1 + self._rng.uniform(-self.config.jitter, self.config.jitter)
+            time.sleep(mean * factor)
+
+    def _fail(self, endpoint: str) -> bool:
+        with self._lock:
+            self.calls[endpoint] += 1
+            failed = self._rng.random() < self.config.error_rate
+            if failed:
+                self.errors[endpoint] += 1
+        return failed
+
+    def _dispatch(self, method: str, path: str, query: dict, body: dict):
+        if method == 'GET' and path == '/__stats':
+            return 200, {'calls': dict(self.calls), 'errors': dict(self.errors)}
+        if method == 'POST' and path == '/api/search/products':
+            endpoint = 'search'
+        elif method == 'GET' and path.startswith('/api/products/'):
+            endpoint = 'product'
+        elif method == 'POST' and path == '/svc/search/api/json-rpc':
+            endpoint = 'hotline_search'
+        elif method == 'POST' and path == '/svc/frontend-api/graphql':
+            endpoint = 'hotline_token' if body.get('operationName') == 'urlTypeDefiner' else 'hotline_offers'
+        else:
+            return 404, {'error': 'not found'}
+
+        self._delay(endpoint)
+        if self._fail(endpoint):
+            return 503, {'error': 'simulated failure'}
+
+        if endpoint == 'search':
+            return 200, {'data': self.search_page(query.get('text', [''])[0], int(query.get('page', ['1'])[0]))}
+        if endpoint == 'product':
+            return 200, self.product(path.rsplit('/', 1)[-1])
+        if endpoint == 'hotline_search':
+            identifier = body.get('params', {}).get('q', '')
+            found = self.hotline_found(identifier)
+            return 200, {'result': [{'url': f"/ua/sim/{identifier.lower()}/"}] if found else []}
+        if endpoint == 'hotline_token':
+            return 200, {'data': {'urlTypeDefiner': {'token': 'sim-token'}}}
+        slug = body.get('variables', {}).get('path', '')
+        edges = [{'node': {'price': price}} for price in self.offers(slug)]
+        return 200, {'data': {'byPathQueryProduct': {'offers': {'edges': edges}}}}
+
+    def _handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                status, payload = simulator._dispatch(method, parsed.path, parse_qs(parsed.query), body)
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    # --- керування ------------------------------------------------------------------
+
+    def url(self, host: str) -> str:
+        """Базова URL-адреса симульованого хоста (наприклад, 'hotline.ua')."""
+        return f"http://{BIND_ADDRESS}:{self.servers[host].server_address[1]}"
+
+    def start(self) -> 'UpstreamSimulator':
+        for host, server in self.servers.items():
+            thread = threading.Thread(target=server.serve_forever, name=f'upstream-sim-{host}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    @contextmanager
+    def point_enricher(self, real_throttle: bool = True):
+        """
+        Контекстний менеджер: на час блоку перенаправляє константи URL product_enricher
+        на симулятор і налаштовує для нього спільний HostThrottle; після блоку все відновлює.
+
+        :param real_throttle: Застосувати до симульованих хостів інтервали реальних хостів
+                              (інакше — без обмеження частоти).
+        """
+        saved_urls = {name: getattr(product_enricher, name) for name in ENRICHER_URLS}
+        saved_intervals, saved_jitter = dict(throttle.intervals), throttle.jitter
+        product_enricher.PROZORRO_SEARCH_URL = f"{self.url('prozorro.gov.ua')}/api/search/products"
+        product_enricher.PROZORRO_PRODUCT_URL = f"{self.url('market-api.prozorro.gov.ua')}/api/products"
+        product_enricher.HOTLINE_BASE_URL = self.url('hotline.ua')
+        product_enricher.HOTLINE_SEARCH_URL = f"{self.url('hotline.ua')}/svc/search/api/json-rpc"
+        product_enricher.HOTLINE_GRAPHQL_URL = f"{self.url('hotline.ua')}/svc/frontend-api/graphql"
+        for host in HOSTS:
+            address = self.url(host).split('://', 1)[1]
+            throttle.intervals[address] = HOST_MIN_INTERVALS.get(host, 0.0) if real_throttle else 0.0
+        if not real_throttle:
+            throttle.jitter = 0.0
+        try:
+            yield self
+        finally:
+            for name, value in saved_urls.items():
+                setattr(product_enricher, name, value)
+            throttle.intervals = saved_intervals
+            throttle.jitter = saved_jitter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--catalogue', type=int, default=200, help='товарів на запит')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='множник затримок')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--not-found-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(catalogue_size=args.catalogue, error_rate=args.error_rate,
+                             not_found_rate=args.not_found_rate, seed=args.seed)
+    config.latency = {k: v * args.latency_scale for k, v in config.latency.items()}
+    simulator = UpstreamSimulator(config, port=args.port).start()
+    for host in HOSTS:
+        print(f"{host} → {simulator.url(host)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
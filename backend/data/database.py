@@ -1,19 +1,50 @@
 import logging
+import re
 from peewee import SqliteDatabase
+from backend.utils.metrics import SQLITE_SECONDS
 
 # налаштування логера
 logger = logging.getLogger(__name__)
 
+# типи операцій для мітки метрики; решта (PRAGMA, CREATE, BEGIN…) — 'other'
+SQL_OPERATIONS = {'select', 'insert', 'update', 'delete', 'with'}
+SQL_KEYWORD = re.compile(r'\s*(\w+)')
+
+
+class InstrumentedSqliteDatabase(SqliteDatabase):
+    """
+    SqliteDatabase, що записує тривалість кожного запиту в метрику sqlite_query_seconds.
+    Для SELECT вимірюється виконання та перший крок курсора, без вибірки решти рядків.
+    """
+
+    def execute_sql(self, sql, *args, **kwargs):
+        match = SQL_KEYWORD.match(sql)
+        operation = match.group(1).lower() if match else 'other'
+        if operation not in SQL_OPERATIONS:
+            operation = 'other'
+        with SQLITE_SECONDS.time(operation=operation):
+            return super().execute_sql(sql, *args, **kwargs)
+
+
 # підключення до SQLite з WAL-журналом
-db = SqliteDatabase('products.db', pragmas={'journal_mode': 'wal'})
+db = InstrumentedSqliteDatabase('products.db', pragmas={'journal_mode': 'wal'})
+
+# мінімальний гарантований ліміт змінних у запиті SQLite (SQLITE_MAX_VARIABLE_NUMBER до 3.32)
+SQLITE_MAX_VARIABLES = 999
 
 def initialize_database():
     """
-    Ініціалізує з'єднання з базою та створює таблиці.
+    Ініціалізує з'єднання з базою, створює таблиці та застосовує міграції.
     Викликається при старті додатку.
     """
-    from backend.data.models import Product  # щоб уникнути циклічних імпортів
+    # щоб уникнути циклічних імпортів
+    from backend.data.models import (Product, ProductCharacteristic, ProductSearch, HotlinePrice,
+                                     HotlineResolution, QueryStats, QueryRequirement, QueryProduct,
+                                     FetchJob)
+    from backend.data.migrations import run_migrations
     db.connect()
-    db.create_tables([Product])
+    db.create_tables([Product, ProductCharacteristic, ProductSearch, HotlinePrice,
+                      HotlineResolution, QueryStats, QueryRequirement, QueryProduct, FetchJob])
+    run_migrations()
     logger.info("База даних ініціалізована, таблиці створені.")
 
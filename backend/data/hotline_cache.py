@@ -0,0 +1,167 @@
+import datetime
+import json
+import logging
+import threading
+from typing import List, Optional, Tuple
+from backend.data.database import db
+from backend.data.models import HotlinePrice, HotlineResolution
+from backend.utils.lru_cache import LRUCache
+from backend.utils.metrics import register_cache
+from backend.utils.price_trend import pack_offers, smart_trend_batch
+
+logger = logging.getLogger(__name__)
+
+# час життя записів кешу цін
+PRICE_TTL = datetime.timedelta(hours=24)
+NOT_FOUND_TTL = datetime.timedelta(hours=6)
+
+# зіставлення identifier → (url_path, slug, token) змінюється значно рідше за ціни
+RESOLUTION_TTL = datetime.timedelta(days=30)
+RESOLUTION_MAX_ENTRIES = 50_000
+RESOLUTION_MEMORY_SIZE = 4096
+_PRUNE_EVERY = 256
+TREND_BATCH_SIZE = 5000
+
+_resolutions = LRUCache(maxsize=RESOLUTION_MEMORY_SIZE, ttl=RESOLUTION_TTL.total_seconds())
+register_cache('hotline_resolution', _resolutions.stats)
+_stores_since_prune = 0
+_prune_lock = threading.Lock()
+
+
+def get_fresh_price(identifier: str,
+                    ttl: datetime.timedelta = PRICE_TTL,
+                    not_found_ttl: datetime.timedelta = NOT_FOUND_TTL) -> Optional[HotlinePrice]:
+    """
+    Повертає запис кешу, якщо він ще свіжий, інакше None.
+    Для негативних записів («не знайдено на Hotline») діє окремий TTL.
+    """
+    entry = HotlinePrice.get_or_none(HotlinePrice.identifier == identifier)
+    if entry is None:
+        return None
+    age = datetime.datetime.utcnow() - entry.fetched_at
+    if age > (ttl if entry.found else not_found_ttl):
+        logger.debug("Кеш ціни для %s застарів (%s)", identifier, age)
+        return None
+    return entry
+
+
+def store_price(identifier: str, offers: List[float], trend: Optional[float]) -> None:
+    """Зберігає (або перезаписує) сирі пропозиції та трендову ціну для ідентифікатора."""
+    (HotlinePrice
+     .insert(identifier=identifier,
+             offers=json.dumps(offers),
+             smart_trend=trend,
+             found=bool(offers),
+             fetched_at=datetime.datetime.utcnow())
+     .on_conflict_replace()
+     .execute())
+    logger.debug("Збережено ціну Hotline для %s: %s", identifier, trend)
+
+
+def get_resolution(identifier: str,
+                   ttl: datetime.timedelta = RESOLUTION_TTL) -> Optional[Tuple[str, str, str]]:
+    """
+    Повертає (url_path, slug, token) для ідентифікатора або None.
+    Спершу перевіряється in-memory LRU, далі — таблиця HotlineResolution.
+    """
+    resolution = _resolutions.get(identifier)
+    if resolution is not None:
+        return resolution
+
+    entry = HotlineResolution.get_or_none(HotlineResolution.identifier == identifier)
+    if entry is None:
+        return None
+    now = datetime.datetime.utcnow()
+    remaining = ttl - (now - entry.resolved_at)
+    if remaining <= datetime.timedelta(0):
+        logger.debug("Зіставлення Hotline для %s застаріло", identifier)
+        return None
+
+    # last_used_at оновлюється лише при промаху in-memory кешу — цього достатньо для LRU на диску
+    (HotlineResolution
+     .update(last_used_at=now)
+     .where(HotlineResolution.identifier == identifier)
+     .execute())
+    resolution = (entry.url_path, entry.slug, entry.token)
+    _resolutions.set(identifier, resolution, ttl=remaining.total_seconds())
+    return resolution
+
+
+def store_resolution(identifier: str, url_path: str, slug: str, token: str) -> None:
+    """Зберігає зіставлення в пам'яті та в базі; періодично запускає витіснення."""
+    global _stores_since_prune
+    now = datetime.datetime.utcnow()
+    (HotlineResolution
+     .insert(identifier=identifier, url_path=url_path, slug=slug, token=token,
+             resolved_at=now, last_used_at=now)
+     .on_conflict_replace()
+     .execute())
+    _resolutions.set(identifier, (url_path, slug, token))
+
+    with _prune_lock:
+        _stores_since_prune += 1
+        due = _stores_since_prune >= _PRUNE_EVERY
+        if due:
+            _stores_since_prune = 0
+    if due:
+        prune_resolutions()
+
+
+def invalidate_resolution(identifier: str) -> None:
+    """Видаляє зіставлення (наприклад, коли токен перестав працювати)."""
+    _resolutions.pop(identifier)
+    HotlineResolution.delete().where(HotlineResolution.identifier == identifier).execute()
+
+
+def prune_resolutions(ttl: datetime.timedelta = RESOLUTION_TTL,
+                      max_entries: int = RESOLUTION_MAX_ENTRIES) -> int:
+    """
+    Витісняє прострочені записи та найдавніше використані понад max_entries.
+
+    :return: Кількість видалених рядків.
+    """
+    cutoff = datetime.datetime.utcnow() - ttl
+    removed = HotlineResolution.delete().where(HotlineResolution.resolved_at < cutoff).execute()
+
+    overflow = HotlineResolution.select().count() - max_entries
+    if overflow > 0:
+        oldest = (HotlineResolution
+                  .select(HotlineResolution.identifier)
+                  .order_by(HotlineResolution.last_used_at)
+                  .limit(overflow))
+        removed += HotlineResolution.delete().where(HotlineResolution.identifier.in_(oldest)).execute()
+    if removed:
+        logger.info("Витіснено %d зіставлень Hotline", removed)
+    return removed
+
+
+def recompute_trends(batch_size: int = TREND_BATCH_SIZE) -> int:
+    """
+    Перераховує трендові ціни всіх знайдених записів кешу з їхніх сирих пропозицій
+    (без звернень до Hotline) пакетами через smart_trend_batch.
+
+    :return: Кількість записів, тренд яких змінився.
+    """
+    changed, last = 0, ''
+    while True:
+        entries = list(HotlinePrice
+                       .select(HotlinePrice.identifier, HotlinePrice.offers, HotlinePrice.smart_trend)
+                       .where(HotlinePrice.found & (HotlinePrice.identifier > last))
+                       .order_by(HotlinePrice.identifier)
+                       .limit(batch_size))
+        if not entries:
+            break
+        last = entries[-1].identifier
+        trends = smart_trend_batch(*pack_offers([json.loads(entry.offers) for entry in entries]))
+        updated = []
+        for entry, trend in zip(entries, trends.tolist()):
+            trend = round(trend, 2)
+            if entry.smart_trend != trend:
+                entry.smart_trend = trend
+                updated.append(entry)
+        if updated:
+            with db.atomic():
+                HotlinePrice.bulk_update(updated, fields=[HotlinePrice.smart_trend], batch_size=500)
+            changed += len(updated)
+    logger.info("Перераховано трендові ціни: змінено %d записів", changed)
+    return changed
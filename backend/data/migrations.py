@@ -0,0 +1,112 @@
+import json
+import logging
+from peewee import chunked
+from backend.data.database import db, SQLITE_MAX_VARIABLES
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_characteristics() -> None:
+    """Переносить JSON-характеристики наявних товарів у таблицю ProductCharacteristic."""
+    from backend.data.models import Product, ProductCharacteristic
+
+    with_rows = ProductCharacteristic.select(ProductCharacteristic.product)
+    products = (Product
+                .select(Product.id, Product.characteristics)
+                .where(Product.id.not_in(with_rows))
+                .tuples())
+    rows = []
+    for product_id, characteristics in products:
+        rows.extend(ProductCharacteristic.rows_for(product_id, json.loads(characteristics or '[]')))
+    for chunk in chunked(rows, SQLITE_MAX_VARIABLES // 5):
+        ProductCharacteristic.insert_many(chunk).execute()
+    logger.info("Перенесено %d характеристик у ProductCharacteristic", len(rows))
+
+
+def create_product_search() -> None:
+    """Створює тригери синхронізації product → product_fts та індексує наявні товари."""
+    db.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+          INSERT INTO product_fts (product_id, title, identifier)
+          VALUES (new.id, new.title, new.identifier);
+        END""")
+    db.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+          DELETE FROM product_fts WHERE product_id = old.id;
+        END""")
+    db.execute_sql("""
+        CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF id, title, identifier ON product BEGIN
+          DELETE FROM product_fts WHERE product_id = old.id;
+          INSERT INTO product_fts (product_id, title, identifier)
+          VALUES (new.id, new.title, new.identifier);
+        END""")
+    db.execute_sql("DELETE FROM product_fts")
+    db.execute_sql("""
+        INSERT INTO product_fts (product_id, title, identifier)
+        SELECT id, title, identifier FROM product""")
+    logger.info("Побудовано повнотекстовий індекс product_fts")
+
+
+def add_repricing_columns() -> None:
+    """Додає час оновлення ціни товару та лічильник запитів для планувальника переоцінки цін."""
+    columns = {
+        'product': [('price_updated_at', 'DATETIME')],
+        'querystats': [('hits', 'INTEGER NOT NULL DEFAULT 0'), ('last_queried_at', 'DATETIME')],
+    }
+    for table, wanted in columns.items():
+        existing = {column.name for column in db.get_columns(table)}
+        for name, definition in wanted:
+            if name not in existing:
+                db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {definition}')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "product_price_updated_at" ON "product" ("price_updated_at")')
+
+
+def encode_characteristic_values() -> None:
+    """Перебудовує ProductCharacteristic так, щоб raw_value зберігав вихідне значення в JSON."""
+    from backend.data.models import ProductCharacteristic
+
+    # раніше рядки зберігались як є, а числа й булеві — у JSON, тож тип значення губився
+    ProductCharacteristic.delete().execute()
+    migrate_characteristics()
+
+
+def scope_suitability_per_query() -> None:
+    """
+    Переносить «підходящість» із глобального Product.suitable у QueryProduct.suitable
+    і оцінює кожен товар кожного запиту за must-have набором саме цього запиту.
+    """
+    if 'suitable' not in {column.name for column in db.get_columns('queryproduct')}:
+        db.execute_sql('ALTER TABLE "queryproduct" ADD COLUMN "suitable" INTEGER NOT NULL DEFAULT 0')
+    for query, required in db.execute_sql('SELECT "query", "required" FROM "querystats"').fetchall():
+        required = json.loads(required or '[]')
+        has_all, params = '', []
+        if required:
+            has_all = f"""AND (SELECT COUNT(DISTINCT c."requirement") FROM "productcharacteristic" c
+                               WHERE c."product_id" = p."id"
+                                 AND c."requirement" IN ({', '.join('?' * len(required))})) = ?"""
+            params = [*required, len(required)]
+        db.execute_sql(f"""
+            UPDATE "queryproduct" SET "suitable" = EXISTS (
+              SELECT 1 FROM "product" p
+              WHERE p."id" = "queryproduct"."product_id" AND p."price" IS NOT NULL {has_all})
+            WHERE "query" = ?""", params + [query])
+
+
+# міграції застосовуються по порядку; номер версії схеми зберігається в PRAGMA user_version
+MIGRATIONS = [
+    migrate_characteristics,
+    create_product_search,
+    add_repricing_columns,
+    encode_characteristic_values,
+    scope_suitability_per_query,
+]
+
+
+def run_migrations() -> None:
+    """Застосовує міграції, новіші за поточну версію схеми бази."""
+    version = db.execute_sql('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with db.atomic():
+            migration()
+            db.execute_sql(f'PRAGMA user_version = {number:d}')
+        logger.info("Застосовано міграцію %d: %s", number, migration.__name__)
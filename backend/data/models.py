@@ -1,7 +1,10 @@
 import datetime
 import json
 import logging
-from peewee import Model, CharField, TextField, FloatField, BooleanField, DateTimeField
+from typing import List, Optional
+from peewee import (Model, CharField, TextField, FloatField, BooleanField, DateTimeField,
+                    IntegerField, CompositeKey, ForeignKeyField)
+from playhouse.sqlite_ext import FTS5Model, SearchField
 from backend.data.database import db
 
 logger = logging.getLogger(__name__)
@@ -20,9 +23,12 @@ class Product(BaseModel):
       identifier     – текст у дужках (код товару),
       title          – назва (нижній регістр),
       price          – ціна (з Hotline або None),
-      characteristics– JSON-рядок зі списком характеристик,
-      suitable       – чи відповідає «must-have» вимогам,
-      created_at     – час створення запису.
+      characteristics– JSON-рядок зі списком характеристик (застаріла копія; читається лише
+                       міграцією, джерело правди — ProductCharacteristic),
+      suitable       – застарілий глобальний прапорець (лише для сумісності схеми; «підходящість»
+                       залежить від запиту — див. QueryProduct.suitable),
+      created_at     – час створення запису,
+      price_updated_at – час останнього оновлення ціни (None — з моменту створення не оновлювалась).
     """
     id = CharField(primary_key=True)
     identifier = CharField()
@@ -31,13 +37,210 @@ class Product(BaseModel):
     characteristics = TextField()
     suitable = BooleanField(default=True)
     created_at = DateTimeField(default=datetime.datetime.utcnow)
+    # індекс створюється міграцією add_repricing_columns (стовпець додається до наявних баз)
+    price_updated_at = DateTimeField(null=True)
 
     def to_dict(self) -> dict:
-        """Повертає словник для JSON-відповіді."""
+        """
+        Повертає словник для JSON-відповіді.
+        Характеристики беруться з characteristic_rows (варто завантажувати через attach_characteristics).
+        """
         return {
             'id': self.id,
             'identifier': self.identifier,
             'title': self.title,
             'price': self.price,
-            'characteristics': json.loads(self.characteristics),
+            'characteristics': [ch.to_dict() for ch in self.characteristic_rows],
+        }
+
+
+def _to_number(value) -> Optional[float]:
+    """Повертає числове значення характеристики або None, якщо воно нечислове."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+class ProductCharacteristic(BaseModel):
+    """
+    Характеристика товару в нормалізованому вигляді.
+
+    Атрибути:
+      product   – товар (product_id),
+      requirement – назва характеристики,
+      value     – числове значення для фільтрації (None, якщо значення нечислове),
+      raw_value – вихідне значення в JSON (саме його повертає API, тип зберігається),
+      unit      – одиниця виміру.
+    """
+    product = ForeignKeyField(Product, backref='characteristic_rows')
+    requirement = TextField()
+    value = FloatField(null=True)
+    raw_value = TextField(null=True)
+    unit = TextField(null=True)
+
+    class Meta:
+        indexes = (
+            (('requirement', 'product'), False),
+        )
+
+    @staticmethod
+    def rows_for(product_id: str, characteristics: List[dict]) -> List[dict]:
+        """Перетворює список характеристик із API на рядки для insert_many."""
+        rows = []
+        for ch in characteristics:
+            value = ch.get('value')
+            rows.append({
+                'product': product_id,
+                'requirement': ch.get('requirement'),
+                'value': _to_number(value),
+                'raw_value': json.dumps(value, ensure_ascii=False),
+                'unit': ch.get('unit'),
+            })
+        return rows
+
+    def to_dict(self) -> dict:
+        """Повертає характеристику у форматі API."""
+        return {
+            'requirement': self.requirement,
+            'value': json.loads(self.raw_value) if self.raw_value is not None else None,
+            'unit': self.unit,
+        }
+
+
+class ProductSearch(FTS5Model):
+    """
+    Повнотекстовий індекс FTS5 за назвою та ідентифікатором товару.
+    Синхронізується з таблицею product тригерами (див. migrations.create_product_search).
+    """
+    product_id = SearchField(unindexed=True)
+    title = SearchField()
+    identifier = SearchField()
+
+    class Meta:
+        database = db
+        table_name = 'product_fts'
+        options = {'tokenize': 'unicode61 remove_diacritics 2', 'prefix': '2 3'}
+
+
+class HotlinePrice(BaseModel):
+    """
+    Закешована ціна Hotline для ідентифікатора товару.
+
+    Атрибути:
+      identifier  – код товару (первинний ключ),
+      offers      – JSON-рядок зі списком цін пропозицій (порожній, якщо товар не знайдено),
+      smart_trend – трендова ціна, обчислена з offers (None, якщо пропозицій немає),
+      found       – чи знайдено товар на Hotline (False — негативний кеш),
+      fetched_at  – час отримання даних.
+    """
+    identifier = CharField(primary_key=True)
+    offers = TextField(default='[]')
+    smart_trend = FloatField(null=True)
+    found = BooleanField(default=True)
+    fetched_at = DateTimeField(default=datetime.datetime.utcnow, index=True)
+
+
+class HotlineResolution(BaseModel):
+    """
+    Закешоване зіставлення ідентифікатора товару зі сторінкою Hotline.
+
+    Атрибути:
+      identifier   – код товару (первинний ключ),
+      url_path     – шлях сторінки товару на Hotline,
+      slug         – останній сегмент url_path (параметр getOffers),
+      token        – x-token, отриманий з urlTypeDefiner,
+      resolved_at  – час отримання,
+      last_used_at – час останнього звернення (для витіснення LRU).
+    """
+    identifier = CharField(primary_key=True)
+    url_path = TextField()
+    slug = TextField()
+    token = TextField()
+    resolved_at = DateTimeField(default=datetime.datetime.utcnow)
+    last_used_at = DateTimeField(default=datetime.datetime.utcnow, index=True)
+
+
+class QueryStats(BaseModel):
+    """
+    Агрегати для пошукового запиту, що підтримуються інкрементально.
+
+    Атрибути:
+      query    – нормалізований текст запиту (первинний ключ),
+      total    – кількість врахованих товарів, що відповідають запиту,
+      required – JSON-рядок із поточним набором «must-have» характеристик,
+      hits     – скільки разів запит надходив до /products (пріоритет переоцінки цін),
+      last_queried_at – час останнього запиту.
+    """
+    query = CharField(primary_key=True)
+    total = IntegerField(default=0)
+    required = TextField(default='[]')
+    hits = IntegerField(default=0)
+    last_queried_at = DateTimeField(null=True)
+
+
+class QueryRequirement(BaseModel):
+    """Лічильник: у скількох товарах запиту query зустрічається характеристика requirement."""
+    query = CharField()
+    requirement = TextField()
+    count = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey('query', 'requirement')
+
+
+class QueryProduct(BaseModel):
+    """
+    Товари, вже враховані в лічильниках запиту (щоб кожен товар рахувався лише раз).
+
+    Атрибути:
+      query      – нормалізований пошуковий запит,
+      product_id – товар,
+      suitable   – чи відповідає товар «must-have» вимогам саме цього запиту.
+    """
+    query = CharField()
+    product_id = CharField()
+    suitable = BooleanField(default=False)
+
+    class Meta:
+        primary_key = CompositeKey('query', 'product_id')
+
+
+class FetchJob(BaseModel):
+    """
+    Фонове завдання догрузки товарів для запиту (асинхронний режим /products).
+
+    Атрибути:
+      id         – ідентифікатор завдання (uuid4 hex),
+      query      – нормалізований пошуковий запит,
+      needed     – потрібна кількість «підходящих» товарів,
+      status     – queued | running | done | failed,
+      found      – скільки нових товарів збережено,
+      suitable   – скільки «підходящих» товарів є зараз,
+      error      – текст помилки для failed,
+      created_at – час створення,
+      updated_at – час останнього оновлення прогресу.
+    """
+    id = CharField(primary_key=True)
+    query = CharField(index=True)
+    needed = IntegerField()
+    status = CharField(default='queued', index=True)
+    found = IntegerField(default=0)
+    suitable = IntegerField(default=0)
+    error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        """Повертає стан завдання для JSON-відповіді."""
+        return {
+            'job_id': self.id,
+            'query': self.query,
+            'status': self.status,
+            'progress': {'found': self.found, 'suitable': self.suitable, 'needed': self.needed},
+            'error': self.error,
         }
@@ -0,0 +1,40 @@
+"""
+Переоцінка цін закешованих товарів (окремо від API).
+
+Запуск:
+    PYTHONPATH=. python backend/reprice.py --once [--limit 500]
+    PYTHONPATH=. python backend/reprice.py [--interval 900] [--budget 600] [--workers 4]
+"""
+import argparse
+import logging
+from backend.data.database import initialize_database
+from backend.services.reprice_service import (reprice, RepriceScheduler, REPRICE_INTERVAL,
+                                              REPRICE_BUDGET_PER_HOUR, REPRICE_WORKERS, REPRICE_PASS_LIMIT)
+from backend.utils.throttle import TokenBucket
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='один прохід і вихід')
+    parser.add_argument('--limit', type=int, default=REPRICE_PASS_LIMIT, help='товарів за прохід')
+    parser.add_argument('--interval', type=float, default=REPRICE_INTERVAL, help='секунд між проходами')
+    parser.add_argument('--budget', type=int, default=REPRICE_BUDGET_PER_HOUR, help='запитів до Hotline на годину')
+    parser.add_argument('--workers', type=int, default=REPRICE_WORKERS, help='паралельних запитів')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+    initialize_database()
+    if args.once:
+        reprice(args.limit, TokenBucket.per_hour(args.budget), args.workers)
+        return
+
+    scheduler = RepriceScheduler(args.interval, args.budget, args.workers, args.limit)
+    scheduler.start()
+    try:
+        scheduler.join()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
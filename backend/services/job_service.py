@@ -0,0 +1,88 @@
+import datetime
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from backend.data.models import FetchJob, Product
+from backend.services.product_service import (normalize_query, fill_cache,
+                                              count_cached_suitable, get_cached_suitable)
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4
+ACTIVE_STATUSES = ('queued', 'running')
+
+# пул фонових воркерів: повільні холодні запити не займають потоки Flask
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='fetch-job')
+_submit_lock = threading.Lock()
+
+
+def _update(job_id: str, **fields) -> None:
+    """Оновлює поля завдання та час останньої зміни."""
+    fields['updated_at'] = datetime.datetime.utcnow()
+    FetchJob.update(**fields).where(FetchJob.id == job_id).execute()
+
+
+def _run_job(job_id: str) -> None:
+    """Виконує завдання у фоновому потоці, записуючи прогрес у таблицю FetchJob."""
+    job = FetchJob.get_by_id(job_id)
+    _update(job_id, status='running')
+    logger.info("Завдання %s: старт для %r (потрібно=%d)", job_id, job.query, job.needed)
+    try:
+        fill_cache(job.query, job.needed,
+                   progress=lambda found, suitable: _update(job_id, found=found, suitable=suitable))
+        _update(job_id, status='done', suitable=count_cached_suitable(job.query, job.needed))
+        logger.info("Завдання %s завершено", job_id)
+    except Exception as exc:
+        logger.exception("Завдання %s завершилося помилкою", job_id)
+        _update(job_id, status='failed', error=str(exc))
+
+
+def submit_fetch_job(query: str, limit: int) -> FetchJob:
+    """
+    Ставить у чергу догрузку товарів для запиту й повертає завдання.
+    Якщо для цього запиту вже є активне завдання з не меншим лімітом, повертається воно.
+    """
+    query = normalize_query(query)
+    with _submit_lock:
+        job = (FetchJob
+               .select()
+               .where((FetchJob.query == query)
+                      & FetchJob.status.in_(ACTIVE_STATUSES)
+                      & (FetchJob.needed >= limit))
+               .order_by(FetchJob.created_at)
+               .first())
+        if job is not None:
+            logger.debug("Запит %r приєднано до активного завдання %s", query, job.id)
+            return job
+        job = FetchJob.create(id=uuid.uuid4().hex, query=query, needed=limit)
+    _pool.submit(_run_job, job.id)
+    logger.info("Створено завдання %s для %r (потрібно=%d)", job.id, query, limit)
+    return job
+
+
+def get_job(job_id: str) -> Optional[FetchJob]:
+    """Повертає завдання за id або None."""
+    return FetchJob.get_or_none(FetchJob.id == job_id)
+
+
+def job_results(job: FetchJob) -> List[Product]:
+    """Повертає «підходящі» товари, доступні для запиту завдання."""
+    return get_cached_suitable(job.query, job.needed)
+
+
+def resume_pending_jobs() -> int:
+    """
+    Повторно ставить у чергу завдання, перервані зупинкою процесу.
+    Викликається при старті додатку.
+
+    :return: Кількість відновлених завдань.
+    """
+    pending = [job.id for job in FetchJob.select(FetchJob.id).where(FetchJob.status.in_(ACTIVE_STATUSES))]
+    for job_id in pending:
+        _update(job_id, status='queued')
+        _pool.submit(_run_job, job_id)
+    if pending:
+        logger.info("Відновлено %d незавершених завдань", len(pending))
+    return len(pending)
@@ -1,92 +1,490 @@
+import datetime
 import json
-import time
-import random
 import logging
-from typing import List
-from backend.data.models import Product
-from backend.utils.product_enricher import fetch_products, enrich_product
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, List, Optional, Set
+import numpy as np
+from peewee import chunked, fn, EXCLUDED, SQL, ModelSelect
+from backend.data.database import db, SQLITE_MAX_VARIABLES
+from backend.data.models import (Product, ProductCharacteristic, ProductSearch,
+                                 QueryStats, QueryRequirement, QueryProduct)
+from backend.utils.lru_cache import LRUCache
+from backend.utils.metrics import CACHE_LOOKUPS, register_cache
+from backend.utils.product_enricher import iter_product_pages, enrich_product
+from backend.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 MAX_FETCH_ATTEMPTS = 5
 COMMON_THRESHOLD = 0.8
+ENRICH_WORKERS = 8
+PERSIST_BATCH_SIZE = 50
+PERSIST_INTERVAL = 1.0
+FEATURE_CACHE_ENTRIES = 128
+FEATURE_CACHE_BYTES = 64 * 1024 * 1024
+FEATURE_CACHE_TTL = 600
+# назва стовпця ціни в матриці ознак (як у таблиці фронтенду)
+PRICE_FEATURE = 'Ціна'
+
+# паралельні промахи кешу для одного запиту виконують лише одне завантаження
+_fetches = SingleFlight()
+# матриці ознак за (запит, limit); скидаються при вставці товарів, зміні suitable та цін
+_features = LRUCache(maxsize=FEATURE_CACHE_ENTRIES, ttl=FEATURE_CACHE_TTL, maxbytes=FEATURE_CACHE_BYTES,
+                     sizeof=lambda features: features['matrix'].nbytes)
+_features_generation = 0
+_features_lock = threading.Lock()
+register_cache('features', _features.stats)
+
+def normalize_query(query: str) -> str:
+    """Нормалізує пошуковий запит: нижній регістр, одинарні пробіли."""
+    return ' '.join(query.lower().split())
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Перетворює пошуковий запит на вираз FTS5 MATCH:
+    кожне слово стає префіксним терміном ("слово"*), усі слова мають бути присутні.
+    """
+    tokens = re.findall(r'\w+', query.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def search_products(query: str, *fields) -> ModelSelect:
+    """Вибірка товарів, що відповідають запиту за повнотекстовим індексом product_fts."""
+    select = Product.select(*fields).join(ProductSearch, on=(ProductSearch.product_id == Product.id))
+    expression = match_expression(query)
+    if expression is None:
+        return select.where(SQL('0'))
+    return select.where(ProductSearch.match(expression))
 
 def get_cached_suitable(query: str, limit: int) -> List[Product]:
-    """Повертає закешовані «підходящі» товари за запитом."""
+    """
+    Повертає закешовані «підходящі» товари за запитом разом із характеристиками.
+    Порядок — за релевантністю bm25 (ідентифікатор важить більше за назву), далі новіші.
+    """
     logger.debug("get_cached_suitable(query=%r, limit=%d)", query, limit)
-    return (Product
-            .select()
-            .where(Product.suitable & Product.title.contains(query))
-            .order_by(Product.created_at.desc())
+    _catch_up_suitability(query)
+    return attach_characteristics(list(_suitable(query, limit)))
+
+def _suitable(query: str, limit: int, *fields) -> ModelSelect:
+    return (suitable_in_query(search_products(query, *fields), query)
+            .order_by(ProductSearch.bm25(0.0, 1.0, 2.0), Product.created_at.desc())
             .limit(limit))
 
-def update_suitability(products: List[Product]) -> None:
+def suitable_in_query(select: ModelSelect, query: str) -> ModelSelect:
+    """Обмежує вибірку товарів тими, що «підходять» саме для цього запиту (QueryProduct.suitable)."""
+    return (select
+            .switch(Product)
+            .join(QueryProduct, on=((QueryProduct.product_id == Product.id) & (QueryProduct.query == query)))
+            .where(QueryProduct.suitable))
+
+def count_cached_suitable(query: str, limit: int) -> int:
+    """Рахує закешовані «підходящі» товари за запитом (не більше limit), не завантажуючи їх."""
+    _catch_up_suitability(query)
+    return suitable_in_query(search_products(query, Product.id), query).limit(limit).count()
+
+def invalidate_features() -> None:
+    """Скидає кеш матриць ознак; матриці, що будуються в цей момент, не будуть закешовані."""
+    global _features_generation
+    with _features_lock:
+        _features_generation += 1
+        _features.clear()
+
+def feature_matrix(query: str, limit: int) -> dict:
     """
-    Оновлює поле suitable на основі загальних характеристик і наявності ціни.
-    — збирає частоту ключів,
-    — визначає «must-have» ключі,
-    — для кожного продукту ставить флаг.
+    Щільна матриця ознак закешованих «підходящих» товарів запиту (ті самі товари й порядок,
+    що й get_cached_suitable): рядки — товари, стовпці — ціна (PRICE_FEATURE) та характеристики
+    в порядку першої появи, NaN — для відсутніх і нечислових значень.
+    Результат кешується за (запит, limit); масив спільний для всіх викликів і доступний лише для читання.
+
+    :param query: Нормалізований запит.
+    :return: {'ids', 'titles', 'columns', 'matrix'}.
     """
-    if not products:
-        logger.debug("Немає продуктів для оновлення відповідності.")
-        return
+    key = (query, limit)
+    cached = _features.get(key)
+    if cached is not None:
+        return cached
+    _catch_up_suitability(query)
+    generation = _features_generation
 
-    key_freq = {}
-    for p in products:
-        for ch in json.loads(p.characteristics):
-            key_freq[ch['requirement']] = key_freq.get(ch['requirement'], 0) + 1
+    rows = list(_suitable(query, limit, Product.id, Product.title, Product.price).tuples())
+    index = {pid: i for i, (pid, _, _) in enumerate(rows)}
+    columns = {PRICE_FEATURE: 0}
+    cells = {(i, 0): price for i, (_, _, price) in enumerate(rows)}
+    for chunk in chunked(list(index), SQLITE_MAX_VARIABLES):
+        for pid, requirement, value in (ProductCharacteristic
+                                        .select(ProductCharacteristic.product, ProductCharacteristic.requirement,
+                                                ProductCharacteristic.value)
+                                        .where(ProductCharacteristic.product.in_(chunk))
+                                        .order_by(ProductCharacteristic.id)
+                                        .tuples()):
+            # повторна характеристика перезаписує попередню, як у таблиці фронтенду
+            cells[index[pid], columns.setdefault(requirement, len(columns))] = value
 
-    total = len(products)
-    required = {k for k, cnt in key_freq.items() if cnt / total >= COMMON_THRESHOLD}
-    logger.info("Обов'язкові характеристики: %s", required)
+    matrix = np.full((len(rows), len(columns)), np.nan)
+    for (i, j), value in cells.items():
+        if value is not None:
+            matrix[i, j] = value
+    matrix.flags.writeable = False
+    features = {
+        'ids': [pid for pid, _, _ in rows],
+        'titles': [title for _, title, _ in rows],
+        'columns': list(columns),
+        'matrix': matrix,
+    }
+    with _features_lock:
+        if generation == _features_generation:
+            _features.set(key, features)
+    return features
 
+def attach_characteristics(products: List[Product]) -> List[Product]:
+    """
+    Одним запитом IN (...) завантажує характеристики для вже вибраних товарів
+    і підставляє їх у characteristic_rows (як prefetch, але без повторного виконання пошукового запиту).
+    """
+    by_id = {p.id: p for p in products}
     for p in products:
-        keys = {ch['requirement'] for ch in json.loads(p.characteristics)}
-        is_ok = (p.price is not None) and required.issubset(keys)
-        if p.suitable != is_ok:
-            p.suitable = is_ok
-            p.save()
-            logger.info("Продукт %s відповідність встановлено в %s", p.id, is_ok)
+        p.characteristic_rows = []
+    for chunk in chunked(list(by_id), SQLITE_MAX_VARIABLES):
+        for ch in (ProductCharacteristic
+                   .select()
+                   .where(ProductCharacteristic.product.in_(chunk))
+                   .order_by(ProductCharacteristic.id)):
+            by_id[ch.product_id].characteristic_rows.append(ch)
+    return products
+
+def _count_requirements(product_ids: List[str]) -> Counter:
+    """Рахує, у скількох із заданих товарів зустрічається кожна характеристика."""
+    freq = Counter()
+    for chunk in chunked(product_ids, SQLITE_MAX_VARIABLES):
+        freq.update(dict(ProductCharacteristic
+                         .select(ProductCharacteristic.requirement,
+                                 fn.COUNT(fn.DISTINCT(ProductCharacteristic.product)))
+                         .where(ProductCharacteristic.product.in_(chunk))
+                         .group_by(ProductCharacteristic.requirement)
+                         .tuples()))
+    return freq
+
+def _apply_suitability(query: str, required: Set[str], candidate_ids: List[str] = None) -> int:
+    """
+    Встановлює QueryProduct.suitable для товарів запиту (або лише для candidate_ids)
+    за набором must-have цього запиту. Оновлюються тільки рядки, де прапорець змінюється.
+
+    :return: Кількість змінених рядків.
+    """
+    members = QueryProduct.select(QueryProduct.product_id).where(QueryProduct.query == query)
+    ok = Product.select(Product.id).where(Product.id.in_(members) & Product.price.is_null(False))
+    if required:
+        has_all = (ProductCharacteristic
+                   .select(ProductCharacteristic.product)
+                   .where(ProductCharacteristic.requirement.in_(sorted(required))
+                          & ProductCharacteristic.product.in_(members))
+                   .group_by(ProductCharacteristic.product)
+                   .having(fn.COUNT(fn.DISTINCT(ProductCharacteristic.requirement)) == len(required)))
+        ok = ok.where(Product.id.in_(has_all))
+
+    in_query = QueryProduct.query == query
+    if candidate_ids is None:
+        scopes = [in_query]
+    else:
+        chunk_size = max(1, SQLITE_MAX_VARIABLES - len(required) - 6)
+        scopes = [in_query & QueryProduct.product_id.in_(chunk) for chunk in chunked(candidate_ids, chunk_size)]
+
+    changed = 0
+    for scope in scopes:
+        changed += (QueryProduct.update(suitable=True)
+                    .where(scope & ~QueryProduct.suitable & QueryProduct.product_id.in_(ok)).execute())
+        changed += (QueryProduct.update(suitable=False)
+                    .where(scope & QueryProduct.suitable & QueryProduct.product_id.not_in(ok)).execute())
+    return changed
+
+def update_suitability(query: str) -> int:
+    """
+    Інкрементально оновлює «підходящість» товарів запиту (QueryProduct.suitable).
+    — враховує в лічильниках QueryRequirement лише товари, яких ще немає в QueryProduct,
+    — перераховує «must-have» ключі з лічильників (частка >= COMMON_THRESHOLD),
+    — оцінює лише нові товари; повна перевірка — тільки якщо змінився набір must-have,
+    — змінює прапорець bulk UPDATE лише для рядків, де він справді змінюється.
+
+    :return: Загальна кількість товарів, що відповідають запиту.
+    """
+    with db.atomic('IMMEDIATE'):
+        counted = QueryProduct.select(QueryProduct.product_id).where(QueryProduct.query == query)
+        new_ids = [pid for (pid,) in search_products(query, Product.id)
+                   .where(Product.id.not_in(counted))
+                   .tuples()]
+
+        stats, _ = QueryStats.get_or_create(query=query)
+        old_required = set(json.loads(stats.required))
+        if not new_ids:
+            return stats.total
+
+        freq = _count_requirements(new_ids)
+        for chunk in chunked([{'query': query, 'requirement': k, 'count': c} for k, c in freq.items()],
+                             SQLITE_MAX_VARIABLES // 3):
+            (QueryRequirement
+             .insert_many(chunk)
+             .on_conflict(conflict_target=[QueryRequirement.query, QueryRequirement.requirement],
+                          update={QueryRequirement.count: QueryRequirement.count + EXCLUDED.count})
+             .execute())
+        for chunk in chunked([{'query': query, 'product_id': pid} for pid in new_ids], SQLITE_MAX_VARIABLES // 2):
+            QueryProduct.insert_many(chunk).on_conflict_ignore().execute()
+
+        total = stats.total + len(new_ids)
+        required = {requirement for requirement, count in QueryRequirement
+                    .select(QueryRequirement.requirement, QueryRequirement.count)
+                    .where(QueryRequirement.query == query)
+                    .tuples()
+                    if count / total >= COMMON_THRESHOLD}
+        QueryStats.update(total=total, required=json.dumps(sorted(required))).where(
+            QueryStats.query == query).execute()
+
+        if required == old_required:
+            changed = _apply_suitability(query, required, new_ids)
+        else:
+            logger.info("Обов'язкові характеристики для %r: %s", query, required)
+            changed = _apply_suitability(query, required)
+        logger.info("Оновлено відповідність для %r: нових %d, змінено %d", query, len(new_ids), changed)
+    if changed:
+        invalidate_features()
+    return total
 
-def fetch_and_cache(query: str, needed: int) -> None:
+def _catch_up_suitability(query: str) -> None:
+    """
+    Оцінює для запиту товари, яких він ще не бачив (зокрема збережені іншими запитами):
+    «підходящість» залежить від must-have набору запиту, тож чужа оцінка не переноситься.
+    Якщо нових товарів немає — лише одна перевірка без транзакції на запис.
+    """
+    counted = QueryProduct.select(QueryProduct.product_id).where(QueryProduct.query == query)
+    if search_products(query, Product.id).where(Product.id.not_in(counted)).exists():
+        update_suitability(query)
+
+def refresh_suitability(product_ids: List[str]) -> int:
+    """
+    Переоцінює suitable для заданих товарів у кожному запиті, до якого вони належать
+    (наприклад, після того як ціна з'явилася чи зникла), за поточним набором must-have.
+
+    :return: Кількість змінених рядків.
+    """
+    by_query = {}
+    for chunk in chunked(product_ids, SQLITE_MAX_VARIABLES):
+        for query, pid in (QueryProduct
+                           .select(QueryProduct.query, QueryProduct.product_id)
+                           .where(QueryProduct.product_id.in_(chunk))
+                           .tuples()):
+            by_query.setdefault(query, []).append(pid)
+
+    changed = 0
+    with db.atomic('IMMEDIATE'):
+        required = dict(QueryStats
+                        .select(QueryStats.query, QueryStats.required)
+                        .where(QueryStats.query.in_(list(by_query)))
+                        .tuples())
+        for query, ids in by_query.items():
+            changed += _apply_suitability(query, set(json.loads(required.get(query, '[]'))), ids)
+    if changed:
+        invalidate_features()
+    return changed
+
+def record_query(query: str) -> None:
+    """Збільшує лічильник звернень до нормалізованого запиту (пріоритет переоцінки цін)."""
+    (QueryStats
+     .insert(query=query, hits=1, last_queried_at=datetime.datetime.utcnow())
+     .on_conflict(conflict_target=[QueryStats.query],
+                  update={QueryStats.hits: QueryStats.hits + 1,
+                          QueryStats.last_queried_at: EXCLUDED.last_queried_at})
+     .execute())
+
+def known_ids(ids: Iterable[str]) -> Set[str]:
+    """Повертає підмножину id, які вже є в базі (один запит IN (...) на кожні SQLITE_MAX_VARIABLES id)."""
+    found = set()
+    for chunk in chunked(list(ids), SQLITE_MAX_VARIABLES):
+        found.update(pid for (pid,) in Product.select(Product.id).where(Product.id.in_(chunk)).tuples())
+    return found
+
+def save_products(enriched: List[dict]) -> List[str]:
+    """
+    Зберігає нові збагачені товари та їхні характеристики в одній транзакції
+    (insert_many частинами з урахуванням ліміту змінних SQLite). Уже наявні id пропускаються.
+
+    :return: Список id вставлених товарів.
+    """
+    if not enriched:
+        return []
+    now = datetime.datetime.utcnow()
+    with db.atomic('IMMEDIATE'):
+        existing = known_ids(e['id'] for e in enriched)
+        fresh = list({e['id']: e for e in enriched if e['id'] not in existing}.values())
+        rows = [{
+            'id': e['id'],
+            'identifier': e['identifier'],
+            'title': e['title'],
+            'price': e['price'],
+            'characteristics': json.dumps(e['characteristics']),
+            'suitable': True,
+            'created_at': now,
+            'price_updated_at': now,
+        } for e in fresh]
+        characteristic_rows = [row for e in fresh
+                               for row in ProductCharacteristic.rows_for(e['id'], e['characteristics'])]
+        for chunk in chunked(rows, SQLITE_MAX_VARIABLES // 8):
+            Product.insert_many(chunk).on_conflict_ignore().execute()
+        for chunk in chunked(characteristic_rows, SQLITE_MAX_VARIABLES // 5):
+            ProductCharacteristic.insert_many(chunk).execute()
+    if rows:
+        invalidate_features()
+    logger.debug("Збережено %d продуктів", len(rows))
+    return [row['id'] for row in rows]
+
+def enrich_concurrently(raws: Iterable[dict], workers: int = ENRICH_WORKERS,
+                        idle_timeout: Optional[float] = None) -> Iterator[Optional[dict]]:
+    """
+    Збагачує товари пулом потоків і віддає результати в порядку завершення.
+
+    raws читається ліниво (не більше 2 * workers товарів у роботі), тож вхід може бути
+    генератором, що ще завантажує сторінки пошуку, — збагачення стартує з першої сторінки.
+    Частоту запитів до кожного хоста обмежує спільний HostThrottle,
+    тому кількість воркерів впливає лише на паралелізм, а не на навантаження на API.
+
+    :param idle_timeout: Якщо задано і за стільки секунд жоден товар не збагачено, віддається
+                         None — споживач може виконати відкладену роботу, не чекаючи повільного товару.
+    """
+    workers = max(1, workers)
+    raws = iter(raws)
+    exhausted = False
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='enrich') as pool:
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                raw = next(raws, None)
+                if raw is None:
+                    exhausted = True
+                else:
+                    pending[pool.submit(enrich_product, raw)] = raw['id']
+            if not pending:
+                return
+
+            done, _ = wait(pending, timeout=idle_timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                yield None
+            for future in done:
+                product_id = pending.pop(future)
+                try:
+                    enriched = future.result()
+                except Exception:
+                    logger.exception("Не вдалося збагатити продукт %s", product_id)
+                    continue
+                if enriched:
+                    yield enriched
+
+def fetch_and_cache(query: str, needed: int, workers: int = ENRICH_WORKERS,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    on_saved: Optional[Callable[[List[str]], None]] = None) -> None:
     """
     Підтягує товари з API поки не набере потрібну кількість «підходящих» або не вичерпає спроби.
+    Збагачення виконується паралельно (workers потоків) і починається з першої завантаженої
+    сторінки пошуку, поки наступні ще завантажуються; готові результати зберігаються
+    пакетами по PERSIST_BATCH_SIZE або щойно найстаріший незбережений товар чекає
+    PERSIST_INTERVAL секунд (навіть якщо наступний товар ще збагачується) і одразу
+    враховуються в suitability.
+
+    :param progress: Необов'язковий колбек progress(found, suitable): кількість збережених
+                     нових товарів і поточна кількість «підходящих» (викликається після
+                     кожного збереження та кожної спроби).
+    :param on_saved: Необов'язковий колбек on_saved(ids) зі списком id щойно збережених
+                     товарів (suitability для них уже оновлено).
     """
     attempts = 0
     limit = needed
+    found = 0
+    fetched = 0
+    suitable = count_cached_suitable(query, needed)
+
+    def flush(pending: List[dict]) -> None:
+        nonlocal found, suitable
+        saved = save_products(pending)
+        if saved:
+            found += len(saved)
+            update_suitability(query)
+            suitable = count_cached_suitable(query, needed)
+            if on_saved:
+                on_saved(saved)
+        if progress:
+            progress(found, suitable)
+
+    def fresh_raws(limit: int) -> Iterator[dict]:
+        """Нові товари з пошуку: одна перевірка IN (...) на сторінку, дублікати id — лише раз."""
+        nonlocal fetched
+        seen = set()
+        for page in iter_product_pages(query, limit):
+            fetched += len(page)
+            known = known_ids(raw['id'] for raw in page)
+            for raw in page:
+                if raw['id'] not in known and raw['id'] not in seen:
+                    seen.add(raw['id'])
+                    yield raw
+
     while attempts < MAX_FETCH_ATTEMPTS:
         logger.info("Спроба завантаження %d для %r (потрібно=%d, ліміт=%d)",
                     attempts + 1, query, needed, limit)
-        batch = fetch_products(limit, query)
-        if not batch:
+        fetched = 0
+        pending = []
+        oldest = None
+        for enriched in enrich_concurrently(fresh_raws(limit), workers, idle_timeout=PERSIST_INTERVAL):
+            if enriched is not None:
+                pending.append(enriched)
+                oldest = oldest or time.monotonic()
+            if pending and (len(pending) >= PERSIST_BATCH_SIZE
+                            or time.monotonic() - oldest >= PERSIST_INTERVAL):
+                flush(pending)
+                pending = []
+                oldest = None
+        flush(pending)
+        if not fetched:
             logger.warning("Жодного елемента не завантажено на спробі %d", attempts + 1)
             break
 
-        for raw in batch:
-            if Product.select().where(Product.id == raw['id']).exists():
-                continue
-            enriched = enrich_product(raw)
-            time.sleep(random.uniform(0.4, 0.8))
-            if enriched:
-                Product.create(
-                    id=enriched['id'],
-                    identifier=enriched['identifier'],
-                    title=enriched['title'],
-                    price=enriched['price'],
-                    characteristics=json.dumps(enriched['characteristics']),
-                    suitable=True
-                )
-                logger.debug("Збережено продукт %s", enriched['id'])
-
-        # Перерахунок suitability для всіх
-        products_all = list(Product.select().where(Product.title.contains(query)))
-        update_suitability(products_all)
-
-        suitable_now = get_cached_suitable(query, needed)
-        logger.info("Підходящих %d/%d", len(suitable_now), needed)
-        if len(suitable_now) >= needed:
+        # Інкрементальний перерахунок suitability (враховує й товари, збережені іншими запитами)
+        total = update_suitability(query)
+
+        suitable = count_cached_suitable(query, needed)
+        logger.info("Підходящих %d/%d", suitable, needed)
+        if progress:
+            progress(found, suitable)
+        if suitable >= needed:
             break
 
-        limit = needed - len(suitable_now) + len(products_all)
+        limit = needed - suitable + total
         attempts += 1
 
+
+def _fill_cache(query: str, needed: int, progress=None, on_saved=None) -> None:
+    """Завантажує товари, лише якщо в кеші досі бракує «підходящих» (перевірка після очікування)."""
+    if count_cached_suitable(query, needed) < needed:
+        fetch_and_cache(query, needed, progress=progress, on_saved=on_saved)
+
+def fill_cache(query: str, limit: int,
+               progress: Optional[Callable[[int, int], None]] = None,
+               on_saved: Optional[Callable[[List[str]], None]] = None) -> None:
+    """
+    Догружає «підходящі» товари для нормалізованого запиту через спільний single-flight.
+    Колбеки progress і on_saved викликаються, лише якщо саме цей виклик виконує завантаження.
+    """
+    _fetches.do(query, limit, lambda: _fill_cache(query, limit, progress, on_saved))
+
+def get_or_fetch_suitable(query: str, limit: int) -> List[Product]:
+    """
+    Повертає «підходящі» товари з кешу, а за нестачі — догружає їх через fetch_and_cache.
+    Паралельні запити з тим самим нормалізованим запитом чекають на одне спільне завантаження.
+    """
+    query = normalize_query(query)
+    products = get_cached_suitable(query, limit)
+    CACHE_LOOKUPS.inc(cache='products', result='hit' if len(products) >= limit else 'miss')
+    if len(products) < limit:
+        fill_cache(query, limit)
+        products = get_cached_suitable(query, limit)
+    return products
@@ -0,0 +1,285 @@
+import numpy as np
+
+# уникнути ділення на нуль, якщо y_ij = 1
+EPS = 1e-12
+
+
+def critic_from_moments(cov: np.ndarray, span: np.ndarray, maximize: np.ndarray) -> np.ndarray:
+    """
+    Ваги CRITIC з коваріаційної матриці (ddof=0) і розмахів критеріїв.
+
+    std нормалізованого стовпця — σ_j / span_j, кореляція — cov_jk / (σ_j σ_k)
+    із заміною знака для "min".
+
+    :return: Вектор m ваг; нуль для вироджених (span == 0) критеріїв.
+    """
+    m = len(span)
+    sd = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+    valid = (span > 0) & (sd > 0)
+    sd_safe = np.where(valid, sd, 1.0)
+    sign = np.where(maximize, 1.0, -1.0)
+    corr = cov / np.outer(sd_safe, sd_safe) * np.outer(sign, sign)
+    conflict = np.where(np.outer(valid, valid), 1.0 - corr, 0.0).sum(axis=1)
+
+    information = np.where(valid, sd / np.where(valid, span, 1.0), 0.0) * conflict
+    total = information.sum()
+    if total > 0:
+        return information / total
+    return np.full(m, 1.0 / m)
+
+
+def critic_weights(X: np.ndarray, maximize: np.ndarray) -> np.ndarray:
+    """
+    Ваги CRITIC для однієї матриці без побудови DataFrame.
+
+    Кореляції нормалізованих стовпців обчислюються одним матричним добутком
+    центрованої матриці: corr = (Xcᵀ Xc / n) / (σ σᵀ) із заміною знака для "min".
+
+    :param X: Матриця n×m значень критеріїв.
+    :param maximize: Вектор m bool — True для "max", False для "min".
+    :return: Вектор m ваг; нуль для вироджених (span == 0) критеріїв.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    span = X.max(axis=0) - X.min(axis=0)
+    centered = X - X.mean(axis=0)
+    return critic_from_moments(centered.T @ centered / X.shape[0], span, maximize)
+
+
+def voronin_terms(X: np.ndarray, maximize: np.ndarray) -> np.ndarray:
+    """
+    Матриця доданків Voronin 1 / (1 - y_ij + ε) розміру n×m; скори — її добуток на вектор ваг.
+
+    :param X: Матриця n×m значень критеріїв.
+    :param maximize: Вектор m bool — True для "max", False для "min".
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    lo, hi = X.min(axis=0), X.max(axis=0)
+    span = hi - lo
+    # |x - ідеал| / span; для вироджених критеріїв span = ∞ дає y_ij = 0
+    Y = X - np.where(maximize, hi, lo)
+    np.abs(Y, out=Y)
+    Y /= np.where(span > 0, span, np.inf)
+    np.subtract(1.0, Y, out=Y)
+    Y += EPS
+    np.reciprocal(Y, out=Y)
+    return Y
+
+
+def voronin_scores(X: np.ndarray, weights: np.ndarray, maximize: np.ndarray) -> np.ndarray:
+    """
+    Скори Voronin для однієї матриці (чим менший скор, тим краща альтернатива).
+
+    :param X: Матриця n×m значень критеріїв.
+    :param weights: Вектор m ваг.
+    :param maximize: Вектор m bool — True для "max", False для "min".
+    :return: Вектор n скорів.
+    """
+    return voronin_terms(X, maximize) @ np.asarray(weights, dtype=np.float64)
+
+
+def weight_sensitivity(X: np.ndarray, weights: np.ndarray, maximize: np.ndarray, draws: int,
+                       concentration: float, rng: np.random.Generator, chunk: int = 1000) -> dict:
+    """
+    Стійкість рейтингу Voronin до збурень ваг (Монте-Карло).
+
+    Ваги кожної спроби беруться з розподілу Діріхле з параметрами concentration · w
+    (середнє — w; що більша концентрація, то менший розкид). Критерії з нульовою
+    вагою не збурюються. Скори всіх спроб пакета — один матричний добуток
+    (спроби × m) · (m × n); місця (1 — найкраще) накопичуються в гістограмі n×n.
+
+    :param X: Матриця n×m значень критеріїв.
+    :param weights: Базові ваги (вектор m).
+    :param maximize: Вектор m bool.
+    :param draws: Кількість спроб.
+    :param concentration: Концентрація розподілу Діріхле.
+    :param rng: Генератор випадкових чисел.
+    :param chunk: Кількість спроб в одному пакеті (обмежує пам'ять).
+    :return: Словник масивів довжини n: base_rank, mean_rank, rank_p05, rank_p50, rank_p95, p_top1.
+    """
+    terms = voronin_terms(X, maximize)
+    n = terms.shape[0]
+    weights = np.asarray(weights, dtype=np.float64)
+    active = weights > 0
+    histogram = np.zeros(n * n, dtype=np.int64)
+    top1 = np.zeros(n, dtype=np.int64)
+    positions = np.arange(1, n + 1)
+
+    for start in range(0, draws, chunk):
+        size = min(chunk, draws - start)
+        sampled = np.zeros((size, len(weights)))
+        sampled[:, active] = rng.dirichlet(concentration * weights[active], size=size)
+        scores = sampled @ terms.T
+        order = np.argsort(scores, axis=1)
+        top1 += np.bincount(order[:, 0], minlength=n)
+        # місце товару order[d, r] у спробі d — r; гістограма індексується як товар · n + r
+        histogram += np.bincount((order * n + np.arange(n)).ravel(), minlength=n * n)
+
+    histogram = histogram.reshape(n, n)
+    cumulative = histogram.cumsum(axis=1)
+
+    def percentile(q):
+        return np.argmax(cumulative >= q * draws, axis=1) + 1
+
+    base = np.argsort(terms @ weights, kind='stable')
+    base_rank = np.empty(n, dtype=np.int64)
+    base_rank[base] = positions
+    return {
+        'base_rank': base_rank,
+        'mean_rank': histogram @ positions / draws,
+        'rank_p05': percentile(0.05),
+        'rank_p50': percentile(0.5),
+        'rank_p95': percentile(0.95),
+        'p_top1': top1 / draws,
+    }
+
+
+class IncrementalCritic:
+    """
+    Стан CRITIC, що оновлюється при додаванні й видаленні альтернатив.
+
+    Зберігає суми, перехресні добутки (зсунуті на першу додану альтернативу для
+    числової стійкості) і min/max кожного критерію, тож ваги обчислюються за O(m²)
+    замість O(n·m²). Min/max перераховуються повністю лише тоді, коли видалено
+    альтернативу з екстремальним значенням.
+    """
+
+    def __init__(self, maximize: np.ndarray):
+        self.maximize = np.asarray(maximize, dtype=bool)
+        self.recomputes = 0
+        self._rows = {}
+        self._reset()
+
+    def _reset(self):
+        m = len(self.maximize)
+        self._shift = None
+        self._sum = np.zeros(m)
+        self._cross = np.zeros((m, m))
+        self._lo = np.full(m, np.inf)
+        self._hi = np.full(m, -np.inf)
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key) -> bool:
+        return key in self._rows
+
+    def add(self, key, row) -> None:
+        """Додає (або замінює) альтернативу з ключем key."""
+        row = np.array(row, dtype=np.float64)
+        if row.shape != self.maximize.shape or not np.all(np.isfinite(row)):
+            raise ValueError(f"Альтернатива {key!r}: очікується {len(self.maximize)} скінченних значень.")
+        if key in self._rows:
+            self.remove(key)
+        if self._shift is None:
+            self._shift = row.copy()
+        delta = row - self._shift
+        self._sum += delta
+        self._cross += np.outer(delta, delta)
+        self._rows[key] = row
+        if not self._stale:
+            np.minimum(self._lo, row, out=self._lo)
+            np.maximum(self._hi, row, out=self._hi)
+
+    def remove(self, key) -> None:
+        """Видаляє альтернативу; KeyError, якщо її немає."""
+        row = self._rows.pop(key)
+        if not self._rows:
+            self._reset()
+            return
+        delta = row - self._shift
+        self._sum -= delta
+        self._cross -= np.outer(delta, delta)
+        if not self._stale and (np.any(row == self._lo) or np.any(row == self._hi)):
+            self._stale = True
+
+    def matrix(self):
+        """Ключі та матриця n×m поточних альтернатив."""
+        return list(self._rows), np.array(list(self._rows.values()), dtype=np.float64).reshape(-1, len(self.maximize))
+
+    def span(self) -> np.ndarray:
+        """Розмах критеріїв; перераховує min/max, якщо видалено екстремальну альтернативу."""
+        if self._stale:
+            _, X = self.matrix()
+            self._lo, self._hi = X.min(axis=0), X.max(axis=0)
+            self._stale = False
+            self.recomputes += 1
+        return self._hi - self._lo
+
+    def weights(self) -> np.ndarray:
+        """Ваги CRITIC поточного набору альтернатив."""
+        n = len(self._rows)
+        if not n:
+            raise ValueError("Немає альтернатив для ранжування.")
+        mean = self._sum / n
+        cov = self._cross / n - np.outer(mean, mean)
+        return critic_from_moments(cov, self.span(), self.maximize)
+
+    def scores(self):
+        """Ключі та скори Voronin поточних альтернатив."""
+        keys, X = self.matrix()
+        return keys, voronin_scores(X, self.weights(), self.maximize)
+
+
+def _scenario_matrices(X: np.ndarray, selected: np.ndarray, rows: np.ndarray):
+    """
+    Для кожного сценарію — індекси його рядків і стовпців та звужена матриця X[рядки][:, стовпці].
+
+    Рядки з пропусками (NaN) у вибраних критеріях у сценарій не потрапляють.
+    """
+    finite = np.isfinite(X)
+    for s in range(len(selected)):
+        columns = np.flatnonzero(selected[s])
+        active = np.flatnonzero(rows[s] & finite[:, columns].all(axis=1))
+        yield s, active, columns, X[np.ix_(active, columns)]
+
+
+def critic_weights_batch(X: np.ndarray, selected: np.ndarray,
+                         maximize: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Ваги CRITIC для S сценаріїв над спільною матрицею.
+
+    Кожен сценарій рахується через critic_weights над звуженою матрицею (лише його рядки
+    та вибрані критерії): один BLAS-добуток k×k на сценарій замість тензорів S×n×m,
+    що на реальних розмірах повільніше й вимагає пам'яті пропорційно S·n·m.
+
+    :param X: Матриця n×m (float64) значень критеріїв; NaN — пропуск.
+    :param selected: S×m bool — які критерії входять у сценарій.
+    :param maximize: S×m bool — True для "max", False для "min".
+    :param rows: S×n bool — які альтернативи входять у сценарій.
+    :return: S×m ваг; нуль для невибраних і вироджених (span == 0) критеріїв.
+             Якщо всі вибрані критерії вироджені (або сценарій без рядків) — рівні ваги.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    weights = np.zeros(selected.shape)
+    for s, active, columns, Xs in _scenario_matrices(X, selected, rows):
+        if not len(columns):
+            continue
+        if not len(active):
+            weights[s, columns] = 1.0 / len(columns)
+            continue
+        weights[s, columns] = critic_weights(Xs, maximize[s, columns])
+    return weights
+
+
+def voronin_scores_batch(X: np.ndarray, weights: np.ndarray, selected: np.ndarray,
+                         maximize: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Скори Voronin для S сценаріїв (чим менший скор, тим краща альтернатива).
+
+    Кожен сценарій — voronin_scores над звуженою матрицею його рядків і вибраних критеріїв;
+    нормалізація (ідеал, розмах) береться по рядках сценарію.
+
+    :param X: Матриця n×m значень критеріїв.
+    :param weights: S×m ваг (для невибраних критеріїв — нуль).
+    :param selected: S×m bool — вибрані критерії.
+    :param maximize: S×m bool — True для "max", False для "min".
+    :param rows: S×n bool — альтернативи сценарію.
+    :return: S×n скорів; NaN для рядків поза сценарієм.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    scores = np.full(rows.shape, np.nan)
+    for s, active, columns, Xs in _scenario_matrices(X, selected, rows):
+        if len(active) and len(columns):
+            scores[s, active] = voronin_scores(Xs, weights[s, columns], maximize[s, columns])
+    return scores
@@ -1,37 +1,59 @@
+import hashlib
+import json
 import logging
+import threading
+import uuid
 import numpy as np
 import pandas as pd
-from typing import List
+from typing import List, Optional, Tuple
+from backend.services.ranking_core import (critic_weights, voronin_scores, IncrementalCritic, weight_sensitivity,
+                                           critic_weights_batch, voronin_scores_batch)
+
+from backend.utils.lru_cache import LRUCache
+from backend.utils.metrics import RANK_SECONDS, register_cache
 
 logger = logging.getLogger(__name__)
 
+RANK_CACHE_ENTRIES = 512
+RANK_CACHE_BYTES = 64 * 1024 * 1024
+RANK_CACHE_TTL = 600
+RANK_SESSION_ENTRIES = 256
+RANK_SESSION_TTL = 1800
+
+# мемоізація повторних /rank з однаковим вмістом: ключ — хеш матриці, значення — (ваги, скори)
+_rank_cache = LRUCache(maxsize=RANK_CACHE_ENTRIES, ttl=RANK_CACHE_TTL, maxbytes=RANK_CACHE_BYTES,
+                       sizeof=lambda value: sum(a.nbytes for a in value))
+# сесії ранжування: інкрементальний стан CRITIC для послідовних змін набору товарів
+_sessions = LRUCache(maxsize=RANK_SESSION_ENTRIES, ttl=RANK_SESSION_TTL)
+register_cache('rank', _rank_cache.stats)
+
+def modes_to_mask(modes: List[str]) -> np.ndarray:
+    """
+    Перетворює список напрямків оптимізації на вектор bool (True — "max").
+
+    :raises ValueError: Якщо елемент не є "max" або "min".
+    """
+    for mode in modes:
+        if mode not in ('max', 'min'):
+            raise ValueError(f"Неприпустиме значення '{mode}' у modes. Має бути 'max' або 'min'.")
+    return np.array([mode == 'max' for mode in modes], dtype=bool)
+
 def compute_critic_weights(df: pd.DataFrame, modes: List[str]) -> pd.Series:
     """
     Обчислення ваг CRITIC з урахуванням напрямків оптимізації ("max" або "min") для кожного критерію.
+    Обгортка над ranking_core.critic_weights.
 
     :param df: Вхідний DataFrame із числовими характеристиками.
     :param modes: Список напрямків оптимізації для кожного стовпця ("max" або "min").
-    :return: Серія з вагами критеріїв.
+    :return: Серія з вагами критеріїв (нуль для критеріїв з однаковими значеннями).
     """
 
-    logger.info("compute_critic_weights: розмір датафрейму %s", df.shape)
+    logger.debug("compute_critic_weights: розмір датафрейму %s", df.shape)
     if len(modes) != df.shape[1]:
         raise ValueError("Кількість елементів у 'modes' має збігатися з кількістю стовпців у DataFrame.")
 
-    norm = df.copy()
-    for i, col in enumerate(df.columns):
-        if modes[i] == 'max':
-            norm[col] = (df[col] - df[col].min()) / (df[col].max() - df[col].min())
-        elif modes[i] == 'min':
-            norm[col] = (df[col].max() - df[col]) / (df[col].max() - df[col].min())
-        else:
-            raise ValueError(f"Неприпустиме значення '{modes[i]}' у modes. Має бути 'max' або 'min'.")
-
-    std = norm.std(ddof=0)
-    corr = norm.corr()
-    C = std * (1 - corr).sum(axis=1)
-    weights = C / C.sum()
-    return weights
+    weights = critic_weights(df.to_numpy(dtype=np.float64), modes_to_mask(modes))
+    return pd.Series(weights, index=df.columns)
 
 def voronin_score(
     df: pd.DataFrame,
@@ -40,6 +62,7 @@ def voronin_score(
 ) -> np.ndarray:
     """
     Обчислення скорів Voronin для заданого набору даних.
+    Обгортка над ranking_core.voronin_scores.
 
     :param df: Вхідний DataFrame із числовими характеристиками.
                Кожен стовпець представляє критерій, а кожен рядок — альтернативу.
@@ -48,17 +71,14 @@ def voronin_score(
     :param modes: Список напрямків оптимізації для кожного критерію.
                   Значення можуть бути "max" (більший кращий) або "min" (менший кращий).
                   Довжина списку повинна збігатися з кількістю стовпців df.
-    :return: Масив скорів для кожної альтернативи. Чим більший скор, тим краща альтернатива.
+    :return: Масив скорів для кожної альтернативи. Чим менший скор, тим краща альтернатива.
 
     :raises ValueError: Якщо:
         - Сума ваг не дорівнює 1.0.
         - Довжина modes не збігається з кількістю стовпців df.
         - Значення в modes не є "max" або "min".
     """
-    logger.info("voronin_score: початок обчислення скорів")
-    logger.info("voronin_score: розмір датафрейму %s", df.shape)
-    logger.info("voronin_score: ваги критеріїв %s", weights.values)
-    logger.info("voronin_score: режими оптимізації %s", modes)
+    logger.debug("voronin_score: розмір датафрейму %s, ваги %s, режими %s", df.shape, weights.values, modes)
 
     if not np.isclose(weights.sum(), 1.0):
         logger.error("voronin_score: сума ваг не дорівнює 1")
@@ -70,26 +90,271 @@ def voronin_score(
         logger.error("voronin_score: некоректні елементи в modes")
         raise ValueError("Елементи modes можуть бути лише 'max' або 'min'.")
 
-    # матриця нормалізованих відхилень y_ij ∈ [0, 1] (0 — ідеал, 1 — антиідеал)
-    Y = np.zeros_like(df.values, dtype=float)
+    scores = voronin_scores(df.to_numpy(dtype=np.float64), weights.values, modes_to_mask(modes))
+    logger.debug("voronin_score: обчислено скори для %d альтернатив", len(scores))
+    return scores
 
-    for j, mode in enumerate(modes):
-        col = df.iloc[:, j].astype(float).values
-        col_min, col_max = col.min(), col.max()
-        span = col_max - col_min
-        if span == 0:  # усі значення однакові — критерій не дискримінує
-            Y[:, j] = 0.0
-            continue
 
-        if mode == 'max':           # більший кращий → відхилення від max
-            Y[:, j] = (col_max - col) / span
-        else:                       # менший кращий → відхилення від min
-            Y[:, j] = (col - col_min) / span
+def matrix_key(X: np.ndarray, maximize: np.ndarray, ids: List[str], parameters: List[str]) -> str:
+    """Стабільний хеш вмісту запиту ранжування: (ids, назви критеріїв, значення, режими)."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([ids, parameters], ensure_ascii=False, default=str).encode())
+    digest.update(np.asarray(X.shape, dtype=np.int64).tobytes())
+    digest.update(X.tobytes())
+    digest.update(np.asarray(maximize, dtype=bool).tobytes())
+    return digest.hexdigest()
 
-    logger.debug("voronin_score: матриця нормалізованих відхилень Y створена")
-    # уникнути ділення на нуль, якщо y_ij = 1 → додаємо ε
-    eps = 1e-12
-    scores = np.sum(weights.values / (1.0 - Y + eps), axis=1)
+def rank_matrix(X: np.ndarray, maximize: np.ndarray, ids: List[str],
+                parameters: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ваги CRITIC і скори Voronin з мемоізацією за хешем вмісту запиту.
 
-    logger.info("voronin_score: обчислення скорів завершено")
-    return scores
+    Повторний запит з тими ж даними коштує лише хешування й пошуку в кеші.
+    Повернуті масиви спільні для всіх викликів і доступні лише для читання.
+
+    :return: (ваги, скори).
+    """
+    key = matrix_key(X, maximize, ids, parameters)
+    cached = _rank_cache.get(key)
+    if cached is not None:
+        logger.debug("rank_matrix: влучання в кеш %s", key)
+        return cached
+    with RANK_SECONDS.time(stage='weights'):
+        weights = critic_weights(X, maximize)
+    with RANK_SECONDS.time(stage='scores'):
+        scores = voronin_scores(X, weights, maximize)
+    weights.flags.writeable = False
+    scores.flags.writeable = False
+    _rank_cache.set(key, (weights, scores))
+    return weights, scores
+
+def rank_features(features: dict, criteria: dict, bounds: Optional[dict] = None):
+    """
+    Ранжує товари матриці ознак (product_service.feature_matrix) за вибраними критеріями.
+    Товари без значення хоча б одного критерію або поза межами bounds не ранжуються.
+
+    :param criteria: {назва стовпця: "max"|"min"}.
+    :param bounds: {назва стовпця: [мінімум, максимум]} — необов'язкові межі значень.
+    :return: (індекси рядків матриці, що ранжувалися, назви критеріїв, ваги, скори).
+    :raises ValueError: Для невідомих стовпців, некоректних режимів або меж.
+    """
+    columns = {name: j for j, name in enumerate(features['columns'])}
+    unknown = [p for p in list(criteria) + list(bounds or {}) if p not in columns]
+    if unknown:
+        raise ValueError(f"Невідомі критерії {unknown}.")
+    parameters = list(criteria)
+    maximize = modes_to_mask([criteria[p] for p in parameters])
+    matrix = features['matrix']
+    X = matrix[:, [columns[p] for p in parameters]]
+
+    keep = ~np.isnan(X).any(axis=1)
+    for p, (low, high) in (bounds or {}).items():
+        values = matrix[:, columns[p]]
+        keep &= (values >= float(low)) & (values <= float(high))
+    rows = np.flatnonzero(keep)
+    if not rows.size:
+        return rows, parameters, np.zeros(len(parameters)), np.empty(0)
+    weights, scores = rank_matrix(X[rows], maximize, [features['ids'][i] for i in rows], parameters)
+    return rows, parameters, weights, scores
+
+def rank_cache_stats() -> dict:
+    """Лічильники кешу ранжування."""
+    return _rank_cache.stats()
+
+def _session_rows(session: dict, items: List[dict]) -> List[tuple]:
+    """
+    Перетворює товари формату /rank ({'id', 'title', 'selected_characteristics'})
+    на рядки критеріїв сесії.
+
+    :raises ValueError: Якщо товар не має значення якогось із критеріїв сесії.
+    """
+    rows = []
+    for item in items:
+        values = {ch['parameter']: ch['value'] for ch in item['selected_characteristics']}
+        missing = [p for p in session['parameters'] if values.get(p) is None]
+        if missing:
+            raise ValueError(f"Товар {item['id']!r}: немає значень {missing}.")
+        rows.append((item['id'], item.get('title'), [float(values[p]) for p in session['parameters']]))
+    return rows
+
+def _session_add(session: dict, rows: List[tuple]) -> None:
+    for key, title, row in rows:
+        session['state'].add(key, row)
+        session['titles'][key] = title
+
+def create_session(items: List[dict]) -> str:
+    """
+    Створює сесію ранжування з початковим набором товарів.
+    Критерії та режими беруться з першого товару, як у /rank.
+
+    :return: Ідентифікатор сесії.
+    :raises ValueError: Для некоректних режимів або пропущених значень.
+    """
+    first = items[0]['selected_characteristics']
+    session = {
+        'parameters': [ch['parameter'] for ch in first],
+        'state': IncrementalCritic(modes_to_mask([ch['mode'] for ch in first])),
+        'titles': {},
+        'lock': threading.Lock(),
+    }
+    _session_add(session, _session_rows(session, items))
+    session_id = uuid.uuid4().hex
+    _sessions.set(session_id, session)
+    logger.info("Створено сесію ранжування %s (%d товарів)", session_id, len(items))
+    return session_id
+
+def get_session(session_id: str) -> Optional[dict]:
+    """Повертає сесію (і продовжує її TTL) або None."""
+    session = _sessions.get(session_id)
+    if session is not None:
+        _sessions.set(session_id, session)
+    return session
+
+def update_session(session: dict, add: List[dict] = (), remove: List[str] = ()) -> None:
+    """
+    Додає та видаляє товари сесії; ваги перераховуються інкрементально.
+
+    :raises ValueError: Для невідомих id у remove або некоректних товарів у add.
+    """
+    rows = _session_rows(session, add)
+    with session['lock']:
+        unknown = [key for key in remove if key not in session['state']]
+        if unknown:
+            raise ValueError(f"Невідомі id {unknown[:5]}.")
+        for key in remove:
+            session['state'].remove(key)
+            session['titles'].pop(key, None)
+        _session_add(session, rows)
+
+def session_ranking(session: dict):
+    """
+    Поточне ранжування сесії.
+
+    :return: (товари [{'id', 'title'}], ваги {критерій: вага}, скори).
+    """
+    with session['lock']:
+        state = session['state']
+        weights = state.weights()
+        keys, X = state.matrix()
+        scores = voronin_scores(X, weights, state.maximize)
+        items = [{'id': key, 'title': session['titles'].get(key)} for key in keys]
+    return items, dict(zip(session['parameters'], map(float, weights))), scores
+
+def delete_session(session_id: str) -> bool:
+    """Видаляє сесію; False, якщо її немає."""
+    return _sessions.pop(session_id) is not None
+
+def rank_sensitivity(X: np.ndarray, maximize: np.ndarray, draws: int, concentration: float,
+                     seed: Optional[int] = None) -> dict:
+    """
+    Стійкість рейтингу до збурень ваг CRITIC (див. ranking_core.weight_sensitivity).
+
+    :param seed: Зерно генератора; однакове зерно дає однакові результати.
+    :return: Результат weight_sensitivity плюс базові 'weights' і 'scores'.
+    :raises ValueError: Якщо матриця має пропуски.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if not np.all(np.isfinite(X)):
+        raise ValueError("Усі товари мають містити значення всіх критеріїв.")
+    weights = critic_weights(X, maximize)
+    result = weight_sensitivity(X, weights, maximize, draws, concentration, np.random.default_rng(seed))
+    result.update(weights=weights, scores=voronin_scores(X, weights, maximize))
+    return result
+
+def select_top(scores: np.ndarray, top_k: int, offset: int = 0) -> np.ndarray:
+    """
+    Індекси альтернатив на позиціях [offset, offset + top_k) рейтингу (від меншого скору).
+
+    Повне сортування не потрібне: np.argpartition відбирає offset + top_k найкращих,
+    і сортуються лише вони. NaN (альтернативи поза сценарієм) пропускаються.
+
+    :return: Масив індексів у порядку рейтингу.
+    """
+    candidates = np.flatnonzero(~np.isnan(scores))
+    end = min(offset + top_k, len(candidates))
+    if offset >= end:
+        return np.empty(0, dtype=np.intp)
+    values = scores[candidates]
+    if end < len(candidates):
+        leading = np.argpartition(values, end - 1)[:end]
+    else:
+        leading = np.arange(len(candidates))
+    leading = leading[np.lexsort((leading, values[leading]))]
+    return candidates[leading[offset:end]]
+
+def score_stats(scores: np.ndarray) -> dict:
+    """Статистика скорів (без NaN) для пагінації на клієнті."""
+    values = scores[~np.isnan(scores)]
+    if not len(values):
+        return {'min': None, 'max': None, 'mean': None, 'std': None}
+    return {'min': float(values.min()), 'max': float(values.max()),
+            'mean': float(values.mean()), 'std': float(values.std())}
+
+def build_matrix(items: List[dict]) -> Tuple[List[str], np.ndarray]:
+    """
+    Будує спільну матрицю float64 для пакетного ранжування.
+
+    :param items: Альтернативи виду {'values': {критерій: значення}}.
+    :return: Список критеріїв (у порядку появи) і матриця n×m; NaN — відсутнє значення.
+    """
+    parameters = list(dict.fromkeys(p for item in items for p in item['values']))
+    column = {p: j for j, p in enumerate(parameters)}
+    X = np.full((len(items), len(parameters)), np.nan)
+    for i, item in enumerate(items):
+        for p, value in item['values'].items():
+            X[i, column[p]] = float(value)
+    return parameters, X
+
+
+def rank_scenarios(X: np.ndarray, parameters: List[str], scenarios: List[dict],
+                   ids: Optional[List[str]] = None) -> List[dict]:
+    """
+    Ранжує спільну матрицю для багатьох сценаріїв (кожен — над звуженою матрицею, див. ranking_core).
+
+    Сценарій: {'name': ..., 'criteria': {критерій: "max"|"min"}, 'ids': [...]} — 'ids'
+    необов'язковий і обмежує альтернативи сценарію. Рядки з пропусками у вибраних
+    критеріях у сценарій не потрапляють.
+
+    :param X: Матриця n×m значень критеріїв.
+    :param parameters: Назви стовпців X.
+    :param scenarios: Список сценаріїв.
+    :param ids: Ідентифікатори рядків X (потрібні для 'ids' у сценаріях).
+    :return: Для кожного сценарію {'name', 'weights': {критерій: вага}, 'scores': масив n (NaN поза сценарієм)}.
+    :raises ValueError: Для невідомих критеріїв, некоректних режимів чи порожнього сценарію.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    column = {p: j for j, p in enumerate(parameters)}
+    row = {id_: i for i, id_ in enumerate(ids or [])}
+    S, (n, m) = len(scenarios), X.shape
+    selected = np.zeros((S, m), dtype=bool)
+    maximize = np.zeros((S, m), dtype=bool)
+    rows = np.ones((S, n), dtype=bool)
+
+    for s, scenario in enumerate(scenarios):
+        criteria = scenario.get('criteria') or {}
+        if not criteria:
+            raise ValueError(f"Сценарій {s}: не задано жодного критерію.")
+        for p, mode in criteria.items():
+            if p not in column:
+                raise ValueError(f"Сценарій {s}: невідомий критерій '{p}'.")
+            if mode not in ('max', 'min'):
+                raise ValueError(f"Неприпустиме значення '{mode}' у modes. Має бути 'max' або 'min'.")
+            selected[s, column[p]] = True
+            maximize[s, column[p]] = mode == 'max'
+        if scenario.get('ids') is not None:
+            unknown = [i for i in scenario['ids'] if i not in row]
+            if unknown:
+                raise ValueError(f"Сценарій {s}: невідомі id {unknown[:5]}.")
+            rows[s] = False
+            rows[s, [row[i] for i in scenario['ids']]] = True
+
+    weights = critic_weights_batch(X, selected, maximize, rows)
+    scores = voronin_scores_batch(X, weights, selected, maximize, rows)
+    logger.info("rank_scenarios: %d сценаріїв над матрицею %s", S, X.shape)
+
+    return [{
+        'name': scenario.get('name', str(s)),
+        'weights': {p: float(weights[s, j]) for p, j in column.items() if selected[s, j]},
+        'scores': scores[s],
+    } for s, scenario in enumerate(scenarios)]
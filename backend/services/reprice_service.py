@@ -0,0 +1,156 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from peewee import JOIN, fn
+from backend.data import hotline_cache
+from backend.data.database import db
+from backend.data.models import Product, QueryProduct, QueryStats
+from backend.services.product_service import refresh_suitability, invalidate_features
+from backend.utils.product_enricher import fetch_hotline_price, hotline_budget, hotline_request_cost
+from backend.utils.throttle import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+REPRICE_WORKERS = 4
+REPRICE_BUDGET_PER_HOUR = 600
+REPRICE_BATCH_SIZE = 50
+REPRICE_PASS_LIMIT = 500
+REPRICE_INTERVAL = 15 * 60
+# ціна вважається застарілою тоді ж, коли й запис кешу Hotline
+REPRICE_MIN_AGE = hotline_cache.PRICE_TTL
+
+
+def due_products(limit: int, min_age: datetime.timedelta = REPRICE_MIN_AGE) -> List[Product]:
+    """
+    Товари, ціна яких старша за min_age, у порядку пріоритету переоцінки:
+    спершу товари найпопулярніших запитів (сума hits), далі — з найстарішою ціною.
+    """
+    stale_since = fn.COALESCE(Product.price_updated_at, Product.created_at)
+    popularity = fn.COALESCE(fn.SUM(QueryStats.hits), 0)
+    return list(Product
+                .select(Product.id, Product.identifier, Product.price)
+                .join(QueryProduct, JOIN.LEFT_OUTER, on=(QueryProduct.product_id == Product.id))
+                .join(QueryStats, JOIN.LEFT_OUTER, on=(QueryStats.query == QueryProduct.query))
+                .where(stale_since < datetime.datetime.utcnow() - min_age)
+                .group_by(Product.id)
+                .order_by(popularity.desc(), stale_since.asc())
+                .limit(limit))
+
+
+def _store_prices(products: List[Product], prices: dict) -> int:
+    """
+    Bulk-оновлює ціни та час переоцінки; для товарів, у яких ціна з'явилась або зникла,
+    перераховує suitable.
+
+    :return: Кількість товарів зі зміненою ціною.
+    """
+    now = datetime.datetime.utcnow()
+    changed, flipped = [], []
+    for product in products:
+        if product.id not in prices:
+            continue
+        price = prices[product.id]
+        if price != product.price:
+            changed.append(product.id)
+            if (price is None) != (product.price is None):
+                flipped.append(product.id)
+        product.price = price
+        product.price_updated_at = now
+    updated = [p for p in products if p.id in prices]
+    if updated:
+        with db.atomic('IMMEDIATE'):
+            Product.bulk_update(updated, fields=[Product.price, Product.price_updated_at], batch_size=100)
+    if flipped:
+        refresh_suitability(flipped)
+    if changed:
+        # ціна — стовпець матриці ознак
+        invalidate_features()
+    return len(changed)
+
+
+def reprice(limit: int = REPRICE_PASS_LIMIT, budget: Optional[TokenBucket] = None,
+            workers: int = REPRICE_WORKERS, batch_size: int = REPRICE_BATCH_SIZE,
+            stop: Optional[threading.Event] = None) -> dict:
+    """
+    Один прохід переоцінки: до limit застарілих товарів у порядку пріоритету.
+
+    Кожен HTTP-запит до Hotline витрачає токен бюджету: товар без закешованого зіставлення
+    коштує три запити, із зіставленням — один; товари, чия ціна вже свіжа в кеші Hotline
+    (той самий ідентифікатор), бюджету не потребують. Очікуваний обсяг токенів прохід чекає
+    до звернення, а не всередині нього, тож вичерпаний бюджет не гальмує запити користувачів
+    до того ж ідентифікатора; запити понад очікувані (повторне зіставлення) без вільних токенів
+    не виконуються.
+    Тимчасові помилки Hotline лишають товар на наступний прохід.
+
+    :param limit: Максимальна кількість товарів за прохід.
+    :param budget: Бюджет запитів; за замовчуванням — REPRICE_BUDGET_PER_HOUR на годину.
+    :param workers: Кількість паралельних звернень до Hotline.
+    :param batch_size: Скільки товарів оновлюється в базі за раз.
+    :param stop: Подія для дострокового завершення проходу.
+    :return: Лічильники {'checked', 'repriced', 'changed', 'failed'}.
+    """
+    budget = budget or TokenBucket.per_hour(REPRICE_BUDGET_PER_HOUR)
+    stats = {'checked': 0, 'repriced': 0, 'changed': 0, 'failed': 0}
+
+    def price_of(product: Product):
+        # більше за capacity бюджет не накопичить; решту hotline_request візьме без очікування
+        cost = min(hotline_request_cost(product.identifier), budget.capacity)
+        if cost and not budget.acquire(cost, stop=stop):
+            return product.id, False, None
+        with hotline_budget(budget, prepaid=cost):
+            price = fetch_hotline_price(product.identifier)
+        # None без свіжого запису кешу — тимчасова помилка, а не «не знайдено»
+        ok = price is not None or hotline_cache.get_fresh_price(product.identifier) is not None
+        return product.id, ok, price
+
+    products = due_products(limit)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reprice') as pool:
+        for start in range(0, len(products), batch_size):
+            if stop is not None and stop.is_set():
+                break
+            batch = products[start:start + batch_size]
+            prices = {}
+            for product_id, ok, price in pool.map(price_of, batch):
+                stats['checked'] += 1
+                if ok:
+                    prices[product_id] = price
+                else:
+                    stats['failed'] += 1
+            stats['repriced'] += len(prices)
+            stats['changed'] += _store_prices(batch, prices)
+
+    logger.info("Переоцінка цін: перевірено %(checked)d, оновлено %(repriced)d, "
+                "змінено %(changed)d, помилок %(failed)d", stats)
+    return stats
+
+
+class RepriceScheduler(threading.Thread):
+    """
+    Фоновий планувальник переоцінки в процесі застосунку: кожні interval секунд —
+    прохід reprice зі спільним погодинним бюджетом запитів.
+    """
+
+    def __init__(self, interval: float = REPRICE_INTERVAL,
+                 budget_per_hour: int = REPRICE_BUDGET_PER_HOUR,
+                 workers: int = REPRICE_WORKERS, limit: int = REPRICE_PASS_LIMIT):
+        super().__init__(name='reprice-scheduler', daemon=True)
+        self.interval = interval
+        self.workers = workers
+        self.limit = limit
+        self.budget = TokenBucket.per_hour(budget_per_hour)
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                reprice(self.limit, self.budget, self.workers, stop=self.stop_event)
+            except Exception:
+                logger.exception("Помилка проходу переоцінки цін")
+            finally:
+                db.close()
+            self.stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stop_event.set()
@@ -0,0 +1,71 @@
+import logging
+import queue
+import threading
+from typing import Iterator, List
+from backend.data.models import Product
+from backend.services.product_service import (normalize_query, get_cached_suitable, suitable_in_query,
+                                              attach_characteristics, fill_cache)
+
+logger = logging.getLogger(__name__)
+
+
+def _suitable_by_ids(query: str, ids: List[str]) -> List[Product]:
+    """Повертає «підходящі» для запиту товари серед заданих id разом із характеристиками."""
+    return attach_characteristics(list(suitable_in_query(Product.select().where(Product.id.in_(ids)), query)))
+
+
+def stream_suitable(query: str, limit: int) -> Iterator[dict]:
+    """
+    Віддає «підходящі» товари запиту по мірі появи.
+
+    Спершу — закешовані, далі — кожен новий товар, щойно його збережено й визнано
+    «підходящим». Останній запис — підсумок із лічильниками.
+
+    :return: Ітератор записів {'type': 'item', 'item': {...}} і {'type': 'done', ...}.
+    """
+    query = normalize_query(query)
+    emitted = set()
+    cached = get_cached_suitable(query, limit)
+    for product in cached:
+        emitted.add(product.id)
+        yield {'type': 'item', 'source': 'cache', 'item': product.to_dict()}
+
+    found = 0
+    if len(emitted) < limit:
+        events = queue.Queue()
+
+        def on_saved(ids):
+            events.put(('items', [p.to_dict() for p in _suitable_by_ids(query, ids)]))
+
+        def progress(fetched, _suitable):
+            nonlocal found
+            found = fetched
+
+        def worker():
+            try:
+                fill_cache(query, limit, progress=progress, on_saved=on_saved)
+                events.put(('done', None))
+            except Exception as exc:
+                logger.exception("Помилка потокового завантаження для %r", query)
+                events.put(('error', str(exc)))
+
+        threading.Thread(target=worker, name='stream-fetch', daemon=True).start()
+        while True:
+            kind, payload = events.get()
+            if kind != 'items':
+                break
+            for item in payload:
+                if len(emitted) < limit and item['id'] not in emitted:
+                    emitted.add(item['id'])
+                    yield {'type': 'item', 'source': 'fetch', 'item': item}
+
+        if kind == 'error':
+            yield {'type': 'error', 'error': payload}
+        # товари могли з'явитися завдяки паралельному завантаженню іншого запиту
+        for product in get_cached_suitable(query, limit):
+            if len(emitted) < limit and product.id not in emitted:
+                emitted.add(product.id)
+                yield {'type': 'item', 'source': 'fetch', 'item': product.to_dict()}
+
+    logger.info("Потоково віддано %d товарів за запитом %r (з кешу %d)", len(emitted), query, len(cached))
+    yield {'type': 'done', 'count': len(emitted), 'cached': len(cached), 'fetched': found, 'needed': limit}
@@ -0,0 +1,30 @@
+import pytest
+from backend.data import hotline_cache
+from backend.data.database import db, initialize_database
+from backend.services import product_service
+
+@pytest.fixture
+def database(tmp_path):
+    """Тимчасова база з усіма таблицями та міграціями; кеші процесу, що дзеркалять базу, скидаються."""
+    db.init(str(tmp_path / 'products.db'), pragmas={'journal_mode': 'wal'})
+    initialize_database()
+    hotline_cache._resolutions.clear()
+    product_service.invalidate_features()
+    yield db
+    db.close()
+    hotline_cache._resolutions.clear()
+    product_service.invalidate_features()
+
+def _make_enriched(pid, price=100.0, requirements=('Ємність', 'Потужність')):
+    return {
+        'id': pid,
+        'identifier': f'AB-{pid}',
+        'title': f'powerbank ({pid})',
+        'price': price,
+        'characteristics': [{'requirement': r, 'value': 1, 'unit': 'шт'} for r in requirements],
+    }
+
+@pytest.fixture
+def make_enriched():
+    """Фабрика збагачених товарів у форматі enrich_product."""
+    return _make_enriched
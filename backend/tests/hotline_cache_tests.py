@@ -0,0 +1,131 @@
+import datetime
+import threading
+import time
+from backend.data import hotline_cache
+from backend.data.models import HotlinePrice, HotlineResolution
+from backend.utils import product_enricher
+
+def age_price(identifier, **delta):
+    stamp = datetime.datetime.utcnow() - datetime.timedelta(**delta)
+    HotlinePrice.update(fetched_at=stamp).where(HotlinePrice.identifier == identifier).execute()
+
+def test_fresh_price_respects_separate_ttl_for_not_found(database):
+    hotline_cache.store_price('AB-1', [100.0, 110.0], 105.0)
+    hotline_cache.store_price('AB-2', [], None)
+    assert hotline_cache.get_fresh_price('AB-1').smart_trend == 105.0
+    assert not hotline_cache.get_fresh_price('AB-2').found
+
+    # негативний запис старіє за NOT_FOUND_TTL, позитивний — лише за PRICE_TTL
+    age_price('AB-1', hours=7)
+    age_price('AB-2', hours=7)
+    assert hotline_cache.get_fresh_price('AB-1') is not None
+    assert hotline_cache.get_fresh_price('AB-2') is None
+
+    age_price('AB-1', hours=25)
+    assert hotline_cache.get_fresh_price('AB-1') is None
+    assert hotline_cache.get_fresh_price('AB-1', ttl=datetime.timedelta(hours=26)) is not None
+    assert hotline_cache.get_fresh_price('AB-3') is None
+
+def test_duplicate_identifiers_hit_hotline_once(database, monkeypatch):
+    calls = []
+
+    def fake_offers(identifier):
+        calls.append(identifier)
+        time.sleep(0.05)
+        return [100.0, 120.0, 110.0]
+
+    monkeypatch.setattr(product_enricher, 'fetch_hotline_offers', fake_offers)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(product_enricher.fetch_hotline_price('AB-1')))
+               for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.append(product_enricher.fetch_hotline_price('AB-1'))
+
+    assert calls == ['AB-1'], "Паралельні та повторні запити одного коду — один похід на Hotline"
+    assert len(set(results)) == 1 and results[0] is not None
+
+def test_different_identifiers_are_fetched_concurrently(database, monkeypatch):
+    # обидва звернення мають бути в польоті одночасно, інакше бар'єр не пройде
+    barrier = threading.Barrier(2, timeout=2)
+
+    def fake_offers(identifier):
+        barrier.wait()
+        return [100.0]
+
+    monkeypatch.setattr(product_enricher, 'fetch_hotline_offers', fake_offers)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.update({i: product_enricher.fetch_hotline_price(i)}))
+               for i in ('AB-1', 'AB-2')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {'AB-1': 100.0, 'AB-2': 100.0}
+
+def test_not_found_is_cached_but_errors_are_not(database, monkeypatch):
+    responses = {'AB-1': [], 'AB-2': None}
+    monkeypatch.setattr(product_enricher, 'fetch_hotline_offers', lambda identifier: responses[identifier])
+    assert product_enricher.fetch_hotline_price('AB-1') is None
+    assert product_enricher.fetch_hotline_price('AB-2') is None
+    assert not hotline_cache.get_fresh_price('AB-1').found
+    assert hotline_cache.get_fresh_price('AB-2') is None
+
+def test_malformed_offers_response_is_an_error_not_empty(monkeypatch):
+    replies = iter([{'data': None},
+                    {'data': {'byPathQueryProduct': {'offers': {'edges': []}}}},
+                    {'data': {'byPathQueryProduct': {'offers': {'edges': [{'node': {'price': 99.0}}]}}}}])
+    monkeypatch.setattr(product_enricher, 'hotline_request', lambda *args, **kwargs: next(replies))
+    assert product_enricher.fetch_offers_by_path('AB-1', '/ua/p/', 'p', 'token') is None
+    assert product_enricher.fetch_offers_by_path('AB-1', '/ua/p/', 'p', 'token') == []
+    assert product_enricher.fetch_offers_by_path('AB-1', '/ua/p/', 'p', 'token') == [99.0]
+
+def test_resolution_lru_fronts_database_and_expires(database):
+    hotline_cache.store_resolution('AB-1', '/ua/p1/', 'p1', 'token-1')
+    hotline_cache._resolutions.clear()
+    assert hotline_cache.get_resolution('AB-1') == ('/ua/p1/', 'p1', 'token-1'), "Промах LRU читає з бази"
+
+    # наступне звернення обслуговує LRU навіть без рядка в базі
+    HotlineResolution.delete().execute()
+    assert hotline_cache.get_resolution('AB-1') == ('/ua/p1/', 'p1', 'token-1')
+
+    hotline_cache.store_resolution('AB-2', '/ua/p2/', 'p2', 'token-2')
+    hotline_cache._resolutions.clear()
+    stale = datetime.datetime.utcnow() - hotline_cache.RESOLUTION_TTL - datetime.timedelta(minutes=1)
+    HotlineResolution.update(resolved_at=stale).execute()
+    assert hotline_cache.get_resolution('AB-2') is None
+
+def test_invalidate_and_prune_resolutions(database):
+    for i in range(5):
+        hotline_cache.store_resolution(f'AB-{i}', f'/ua/p{i}/', f'p{i}', 't')
+        (HotlineResolution.update(last_used_at=datetime.datetime.utcnow() - datetime.timedelta(hours=10 - i))
+         .where(HotlineResolution.identifier == f'AB-{i}').execute())
+    hotline_cache.invalidate_resolution('AB-4')
+    assert hotline_cache.get_resolution('AB-4') is None
+
+    stale = datetime.datetime.utcnow() - hotline_cache.RESOLUTION_TTL - datetime.timedelta(minutes=1)
+    HotlineResolution.update(resolved_at=stale).where(HotlineResolution.identifier == 'AB-3').execute()
+    assert hotline_cache.prune_resolutions(max_entries=2) == 2
+    assert sorted(r.identifier for r in HotlineResolution.select()) == ['AB-1', 'AB-2'], \
+        "Спершу прострочені, далі найдавніше використані"
+
+def test_stale_cached_resolution_is_re_resolved_once(database, monkeypatch):
+    hotline_cache.store_resolution('AB-1', '/ua/old/', 'old', 'expired')
+    offers = {'old': None, 'new': [100.0]}
+    calls = []
+
+    def fake_offers(identifier, url_path, slug, token):
+        calls.append(slug)
+        return offers[slug]
+
+    monkeypatch.setattr(product_enricher, 'fetch_offers_by_path', fake_offers)
+    monkeypatch.setattr(product_enricher, 'resolve_hotline_product', lambda identifier: ('/ua/new/', 'new', 'fresh'))
+    assert product_enricher.fetch_hotline_offers('AB-1') == [100.0]
+    assert calls == ['old', 'new']
+    assert hotline_cache.get_resolution('AB-1') == ('/ua/new/', 'new', 'fresh')
+
+    offers['new'] = None
+    assert product_enricher.fetch_hotline_offers('AB-1') is None
+    assert calls == ['old', 'new', 'new', 'new'], "Оновлення зіставлення — лише один раз за виклик"
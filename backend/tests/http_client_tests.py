@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from backend.utils import http_client
+from backend.utils.http_client import HttpClient
+from backend.utils.throttle import HostThrottle
+
+URL = 'https://hotline.ua/svc/search/api/json-rpc'
+
+class ScriptedAdapter(BaseAdapter):
+    """Транспорт-заглушка: повертає (або піднімає) заздалегідь задані відповіді по черзі."""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        status, headers = step
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.url = request.url
+        response.request = request
+        response._content = b'{}'
+        return response
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(http_client, 'time', SimpleNamespace(sleep=delays.append))
+    return delays
+
+def make_client(script, **kwargs):
+    client = HttpClient(throttle=HostThrottle(intervals={}, default_interval=0.0, jitter=0.0), **kwargs)
+    adapter = ScriptedAdapter(script)
+    client.session_for(URL).mount('https://', adapter)
+    return client, adapter
+
+def test_retry_after_is_honoured_on_429(sleeps):
+    client, adapter = make_client([(429, {'Retry-After': '3'}), (200, {})])
+    assert client.post(URL, json={}).status_code == 200
+    assert sleeps == [3.0]
+    assert adapter.timeouts == [http_client.DEFAULT_TIMEOUT] * 2
+
+def test_server_errors_are_retried_with_bounded_jittered_backoff(sleeps):
+    client, adapter = make_client([(503, {}), (502, {}), (200, {})], backoff_base=0.5)
+    assert client.get(URL, timeout=1.5).status_code == 200
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    assert adapter.timeouts == [1.5] * 3, "Таймаут викликача передається в кожну спробу"
+
+def test_exhausted_retries_return_last_response(sleeps):
+    client, adapter = make_client([(500, {})] * 3 + [(504, {})], max_retries=3)
+    assert client.get(URL).status_code == 504
+    assert len(sleeps) == 3 and not adapter.script
+
+def test_client_errors_are_not_retried(sleeps):
+    client, _ = make_client([(404, {})])
+    assert client.get(URL).status_code == 404
+    assert sleeps == []
+
+def test_connection_errors_are_retried_then_propagated(sleeps):
+    client, _ = make_client([requests.ConnectionError('reset'), (200, {})])
+    assert client.get(URL).status_code == 200
+
+    client, adapter = make_client([requests.ConnectionError('reset')] * 3, max_retries=2)
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL)
+    assert not adapter.script
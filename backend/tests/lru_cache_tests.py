@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+from backend.utils import lru_cache
+from backend.utils.lru_cache import LRUCache
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None, "Витісняється найдавніше використаний запис"
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+
+def test_lru_ttl_and_per_entry_override(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(lru_cache, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    cache = LRUCache(maxsize=10, ttl=10)
+    cache.set('short', 1, ttl=1)
+    cache.set('long', 2)
+    clock.now = 5
+    assert cache.get('short') is None and cache.get('long') == 2
+    clock.now = 11
+    assert cache.get('long') is None
+    assert len(cache) == 0, "Прострочені записи видаляються при зверненні"
+
+def test_lru_byte_budget():
+    cache = LRUCache(maxsize=10, maxbytes=10, sizeof=len)
+    cache.set('a', 'xxxx')
+    cache.set('b', 'yyyy')
+    cache.set('c', 'zzzz')
+    assert cache.get('a') is None and cache.nbytes == 8
+    cache.set('huge', 'h' * 11)
+    assert cache.get('huge') is None and cache.nbytes == 8, "Завеликі значення не кешуються"
+    cache.pop('b')
+    assert cache.nbytes == 4
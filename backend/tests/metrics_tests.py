@@ -0,0 +1,47 @@
+import pytest
+from flask import Flask
+from backend.api.metrics import metrics_bp
+from backend.api.ranking import rank_bp
+from backend.utils.metrics import Registry
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram('op_seconds', 'Тривалість.', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage='a')
+    counter = registry.counter('calls_total', 'Виклики.', ['result'])
+    counter.inc(result='ok')
+    text = registry.render()
+
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{stage="a",le="1.0"} 3' in text
+    assert 'op_seconds_bucket{stage="a",le="+Inf"} 4' in text
+    assert 'op_seconds_count{stage="a"} 4' in text
+    assert 'calls_total{result="ok"} 1' in text
+    with pytest.raises(ValueError):
+        histogram.observe(1.0)
+
+def test_metrics_endpoint_reports_rank_stages_sql_and_caches(database):
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    app.register_blueprint(metrics_bp)
+    client = app.test_client()
+    items = [{'id': f'p{i}', 'title': f't{i}', 'selected_characteristics': [
+        {'parameter': 'a', 'value': i + 1, 'mode': 'max'},
+        {'parameter': 'b', 'value': (i * 7) % 5 + 1, 'mode': 'min'}]} for i in range(6)]
+    for _ in range(2):
+        assert client.post('/rank', json=items).status_code == 200
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    for stage in ('weights', 'scores', 'serialize'):
+        assert f'rank_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'sqlite_query_seconds_count{operation="select"}' in text
+    assert 'cache_hit_ratio{cache="rank"}' in text
+    assert '# TYPE cache_requests_total counter' in text
+    assert 'cache_requests_total{cache="rank",result="hit"}' in text
+    assert 'cache_lookups' not in text, "Звернення до кешів експортуються лише в cache_requests_total"
+    assert 'http_request_seconds_count{method="POST",endpoint="/rank",status="200"}' in text
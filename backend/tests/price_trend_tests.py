@@ -0,0 +1,42 @@
+import json
+import statistics
+import numpy as np
+import pytest
+from backend.data import hotline_cache
+from backend.data.models import HotlinePrice
+from backend.utils.price_trend import smart_trend_many
+from backend.utils.product_enricher import smart_trend
+
+def reference_trend(values):
+    # попередня реалізація smart_trend по одному списку
+    if len(values) <= 3:
+        return statistics.mean(values)
+    q75, q25 = np.percentile(values, [75, 25])
+    bin_width = 2 * (q75 - q25) * (len(values) ** (-1 / 3))
+    if bin_width == 0:
+        return statistics.mean(values)
+    counts, edges = np.histogram(values, bins=np.arange(min(values), max(values) + bin_width, bin_width))
+    i = np.argmax(counts)
+    clustered = [v for v in values if edges[i] <= v < edges[i + 1]]
+    return statistics.mean(clustered) if clustered else statistics.mean(values)
+
+def test_batch_matches_single_list_algorithm():
+    rng = np.random.default_rng(0)
+    lists = [[1500.0], [100.0, 200.0], [999.0] * 8, [100.0, 105.0, 110.0, 5000.0, 104.0]]
+    lists += [list(np.round(rng.lognormal(7, 0.5, size=rng.integers(4, 60)), 2)) for _ in range(300)]
+    lists += [list(rng.integers(100, 2000, size=rng.integers(1, 40)).astype(float)) for _ in range(300)]
+
+    trends = smart_trend_many(lists)
+    np.testing.assert_allclose(trends, [reference_trend(v) for v in lists], rtol=1e-12)
+    assert smart_trend(lists[3]) == pytest.approx(reference_trend(lists[3]))
+    assert np.isnan(smart_trend_many([[]])[0])
+
+def test_recompute_trends_updates_cached_prices(database):
+    hotline_cache.store_price('AB-1', [100.0, 101.0, 102.0, 103.0, 900.0], 0.0)
+    hotline_cache.store_price('AB-2', [], None)
+    hotline_cache.store_price('AB-3', [50.0], 50.0)
+
+    assert hotline_cache.recompute_trends(batch_size=1) == 1
+    entry = HotlinePrice.get_by_id('AB-1')
+    assert entry.smart_trend == round(reference_trend(json.loads(entry.offers)), 2)
+    assert HotlinePrice.get_by_id('AB-2').smart_trend is None
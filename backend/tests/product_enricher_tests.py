@@ -0,0 +1,30 @@
+import random
+import time
+from backend.utils import product_enricher
+
+def fake_search_page(pages, calls):
+    def fetch(search_query, page):
+        calls.append(page)
+        time.sleep(random.uniform(0, 0.02))  # сторінки завершуються не по порядку
+        if page > pages:
+            return []
+        return [{'id': f'{page}-{i}', 'title': f'Товар ({"AB" if i % 2 else "ab"}{page}{i})'} for i in range(6)]
+    return fetch
+
+def test_iter_products_keeps_page_order_and_stops_on_empty_page(monkeypatch):
+    calls = []
+    monkeypatch.setattr(product_enricher, 'fetch_search_page', fake_search_page(5, calls))
+    products = list(product_enricher.iter_products('q', window=3))
+    assert [p['id'] for p in products] == [f'{page}-{i}' for page in range(1, 6) for i in (1, 3, 5)]
+    assert products[0]['identifier'] == 'AB11'
+    assert products[0]['title'] == 'товар (ab11)'
+    assert 6 in calls
+
+def test_fetch_products_respects_limit_without_prefetching_for_small_queries(monkeypatch):
+    calls = []
+    monkeypatch.setattr(product_enricher, 'fetch_search_page', fake_search_page(10, calls))
+    assert len(product_enricher.fetch_products(2, 'q')) == 2
+    assert calls == [1], "Вікно стартує з однієї сторінки"
+    calls.clear()
+    assert len(product_enricher.fetch_products(7, 'q')) == 7
+    assert sorted(calls)[:3] == [1, 2, 3]
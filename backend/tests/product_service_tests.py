@@ -0,0 +1,241 @@
+import threading
+import time
+import numpy as np
+from backend.data.migrations import run_migrations
+from backend.data.models import Product, ProductCharacteristic, QueryProduct
+from backend.services import product_service
+from backend.utils import product_enricher
+
+def test_save_products_bulk_insert_ignores_duplicates(database, make_enriched):
+    product_service.save_products([make_enriched(str(i)) for i in range(300)])
+    product_service.save_products([make_enriched('0', price=1.0), make_enriched('300')])
+    assert Product.select().count() == 301
+    assert Product.get_by_id('0').price == 100.0, "Існуючий рядок не перезаписується"
+
+def test_known_ids_checks_in_chunks(database, make_enriched):
+    product_service.save_products([make_enriched(str(i)) for i in range(10)])
+    ids = [str(i) for i in range(2000)]
+    assert product_service.known_ids(ids) == {str(i) for i in range(10)}
+
+def test_fetch_and_cache_enriches_only_new_products(database, monkeypatch, make_enriched):
+    product_service.save_products([make_enriched('1')])
+    raw = [{'id': str(i), 'identifier': f'AB-{i}', 'title': f'powerbank ({i})'} for i in range(1, 6)]
+    enriched_ids = []
+
+    def fake_enrich(item):
+        enriched_ids.append(item['id'])
+        return make_enriched(item['id'])
+
+    monkeypatch.setattr(product_service, 'iter_product_pages', lambda query, limit: iter([raw, raw[:2]]))
+    monkeypatch.setattr(product_service, 'enrich_product', fake_enrich)
+    product_service.fetch_and_cache('powerbank', 5, workers=4)
+
+    assert sorted(enriched_ids) == ['2', '3', '4', '5']
+    assert len(product_service.get_cached_suitable('powerbank', 10)) == 5
+
+def test_update_suitability_counts_each_product_once(database, make_enriched):
+    product_service.save_products([make_enriched(str(i)) for i in range(4)])
+    assert product_service.update_suitability('powerbank') == 4
+    assert product_service.update_suitability('powerbank') == 4, "Повторний виклик не рахує товари вдруге"
+    product_service.save_products([make_enriched('4', price=None)])
+    assert product_service.update_suitability('powerbank') == 5
+    assert not QueryProduct.get(query='powerbank', product_id='4').suitable, "Товар без ціни не підходить"
+    assert QueryProduct.get(query='powerbank', product_id='0').suitable
+
+def test_update_suitability_flips_rows_when_required_set_changes(database, make_enriched):
+    product_service.save_products([make_enriched(str(i), requirements=('Ємність',)) for i in range(2)])
+    product_service.update_suitability('powerbank')
+    assert all(row.suitable for row in QueryProduct.select())
+
+    # «Потужність» є у 8 з 10 товарів і стає обов'язковою — старі товари мають змінити прапорець
+    product_service.save_products([make_enriched(str(i)) for i in range(2, 10)])
+    product_service.update_suitability('powerbank')
+    assert {row.product_id for row in QueryProduct.select().where(~QueryProduct.suitable)} == {'0', '1'}
+
+def test_suitability_is_scoped_per_query(database, make_enriched):
+    # Для «powerbank» обов'язкова «Потужність», для «зарядка» — ні: вердикт одного запиту не переноситься в інший
+    product_service.save_products([dict(make_enriched(str(i)), title=f'powerbank зарядка ({i})') for i in range(4)])
+    product_service.save_products([dict(make_enriched('4', requirements=('Ємність',)),
+                                        title='powerbank зарядка (4)')])
+    product_service.save_products([dict(make_enriched(str(i), requirements=('Ємність',)), title=f'зарядка ({i})')
+                                   for i in range(5, 9)])
+
+    assert '4' not in {p.id for p in product_service.get_cached_suitable('powerbank', 10)}
+    assert '4' in {p.id for p in product_service.get_cached_suitable('зарядка', 10)}
+    assert product_service.count_cached_suitable('powerbank', 10) == 4
+    assert product_service.count_cached_suitable('зарядка', 10) == 9
+
+def test_suitability_migration_evaluates_each_query(database, make_enriched):
+    product_service.save_products([make_enriched(str(i)) for i in range(4)])
+    product_service.save_products([make_enriched('4', requirements=('Ємність',))])
+    product_service.update_suitability('powerbank')
+    QueryProduct.update(suitable=False).execute()
+    database.execute_sql('PRAGMA user_version = 4')
+
+    run_migrations()
+    assert {row.product_id for row in QueryProduct.select().where(QueryProduct.suitable)} == {'0', '1', '2', '3'}
+
+def test_get_cached_suitable_returns_normalized_characteristics(database, make_enriched):
+    product_service.save_products([make_enriched('1')])
+    product_service.update_suitability('powerbank')
+    [product] = product_service.get_cached_suitable('powerbank', 10)
+    assert product.to_dict()['characteristics'] == [
+        {'requirement': 'Ємність', 'value': 1, 'unit': 'шт'},
+        {'requirement': 'Потужність', 'value': 1, 'unit': 'шт'},
+    ]
+
+def test_migration_moves_json_characteristics_to_table(database):
+    Product.create(id='old', identifier='X1', title='powerbank (X1)', price=10.0,
+                   characteristics='[{"requirement": "Колір", "value": "чорний", "unit": "-"},'
+                                   ' {"requirement": "Ємність", "value": "20000", "unit": "мА·год"}]')
+    database.execute_sql('PRAGMA user_version = 0')
+    run_migrations()
+    rows = list(ProductCharacteristic.select().order_by(ProductCharacteristic.id))
+    assert [(r.requirement, r.value, r.raw_value) for r in rows] == [
+        ('Колір', None, '"чорний"'),
+        ('Ємність', 20000.0, '"20000"'),
+    ]
+    run_migrations()
+    assert ProductCharacteristic.select().count() == 2, "Міграція застосовується лише раз"
+
+def test_characteristic_values_round_trip_with_their_types(database, make_enriched):
+    values = ['20000', 'чорний', 20000, 1, 4.5, True, False, None]
+    product = make_enriched('1')
+    product['characteristics'] = [{'requirement': f'r{i}', 'value': v, 'unit': None} for i, v in enumerate(values)]
+    product_service.save_products([product])
+    rows = list(ProductCharacteristic.select().order_by(ProductCharacteristic.id))
+    returned = [row.to_dict()['value'] for row in rows]
+    assert returned == values
+    assert [type(v) for v in returned] == [type(v) for v in values]
+    assert [row.value for row in rows] == [20000.0, None, 20000.0, 1.0, 4.5, None, None, None], \
+        "Числовий стовпець лише для фільтрації; булеві не є числами"
+
+def test_search_products_supports_prefix_and_multi_token_queries(database, make_enriched):
+    product_service.save_products([
+        dict(make_enriched('1'), title='павербанк xiaomi redmi (PB-20)', identifier='PB-20'),
+        dict(make_enriched('2'), title='павербанк anker (A1263)', identifier='A1263'),
+        dict(make_enriched('3'), title='зарядний пристрій xiaomi (MDY-11)', identifier='MDY-11'),
+    ])
+    ids = lambda q: {p.id for p in product_service.search_products(q)}
+    assert ids('павер') == {'1', '2'}
+    assert ids('xiaomi павербанк') == {'1'}
+    assert ids('a1263') == {'2'}
+    assert ids('—') == set()
+
+    Product.update(title='павербанк baseus (MDY-11)').where(Product.id == '3').execute()
+    assert ids('baseus') == {'3'}, "Індекс оновлюється тригером при зміні назви"
+
+def test_concurrent_cache_misses_share_one_fetch(database, monkeypatch, make_enriched):
+    calls = []
+
+    def fake_pages(query, limit):
+        calls.append(limit)
+        time.sleep(0.2)
+        yield [{'id': str(i), 'identifier': f'AB-{i}', 'title': f'powerbank ({i})'} for i in range(limit)]
+
+    monkeypatch.setattr(product_service, 'iter_product_pages', fake_pages)
+    monkeypatch.setattr(product_service, 'enrich_product', lambda raw: make_enriched(raw['id']))
+    results = []
+    threads = [threading.Thread(target=lambda n=n: results.append(
+        len(product_service.get_or_fetch_suitable(' PowerBank ', n)))) for n in (5, 5, 3, 5)]
+    threads[0].start()
+    time.sleep(0.05)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [5], "Усі запити мають дочекатися одного завантаження"
+    assert sorted(results) == [3, 5, 5, 5]
+
+def test_feature_matrix_is_cached_and_invalidated(database, make_enriched):
+    items = [make_enriched(str(i), price=100.0 + i) for i in range(3)]
+    items[1]['characteristics'] = [{'requirement': 'Ємність', 'value': 'багато', 'unit': 'шт'}]
+    product_service.save_products(items)
+
+    features = product_service.feature_matrix('powerbank', 10)
+    assert features['columns'] == [product_service.PRICE_FEATURE, 'Ємність', 'Потужність']
+    row = features['ids'].index('1')
+    assert features['matrix'][row, 0] == 101.0
+    assert np.isnan(features['matrix'][row, 1:]).all(), "Нечислове й відсутнє значення — NaN"
+    assert product_service.feature_matrix('powerbank', 10) is features
+
+    product_service.save_products([make_enriched('3')])
+    refreshed = product_service.feature_matrix('powerbank', 10)
+    assert refreshed is not features and len(refreshed['ids']) == 4
+
+def test_enrich_concurrently_bounds_workers_and_reads_input_lazily(monkeypatch, make_enriched):
+    lock = threading.Lock()
+    state = {'active': 0, 'peak': 0, 'read': 0}
+
+    def raws():
+        for i in range(40):
+            state['read'] += 1
+            yield {'id': str(i)}
+
+    def fake_enrich(raw):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            assert state['read'] - int(raw['id']) <= 2 * 3, "Вхід читається не далі ніж на 2 * workers"
+        time.sleep(0.005)
+        with lock:
+            state['active'] -= 1
+        return make_enriched(raw['id'])
+
+    monkeypatch.setattr(product_service, 'enrich_product', fake_enrich)
+    ids = [item['id'] for item in product_service.enrich_concurrently(raws(), workers=3)]
+    assert sorted(ids, key=int) == [str(i) for i in range(40)]
+    assert 1 < state['peak'] <= 3
+
+def test_fetch_and_cache_persists_pending_items_while_next_enrichment_hangs(database, monkeypatch, make_enriched):
+    monkeypatch.setattr(product_service, 'PERSIST_INTERVAL', 0.05)
+    released = threading.Event()
+    saved, waits = [], []
+
+    def fake_enrich(raw):
+        if raw['id'] == '2':
+            # зависає, доки перший товар не буде збережено
+            waits.append(released.wait(timeout=2))
+        return make_enriched(raw['id'])
+
+    def on_saved(ids):
+        saved.append(ids)
+        released.set()
+
+    monkeypatch.setattr(product_service, 'iter_product_pages', lambda query, limit: iter([[{'id': '1'}, {'id': '2'}]]))
+    monkeypatch.setattr(product_service, 'enrich_product', fake_enrich)
+    product_service.fetch_and_cache('powerbank', 2, workers=2, on_saved=on_saved)
+    assert waits == [True], "Перший товар зберігається, не чекаючи на повільний другий"
+    assert saved == [['1'], ['2']]
+
+def test_enrich_concurrently_isolates_a_failing_product(monkeypatch, make_enriched):
+    def fake_enrich(raw):
+        if raw['id'] == '2':
+            raise RuntimeError('збій збагачення')
+        return make_enriched(raw['id'])
+
+    monkeypatch.setattr(product_service, 'enrich_product', fake_enrich)
+    ids = {item['id'] for item in product_service.enrich_concurrently([{'id': str(i)} for i in range(5)], workers=2)}
+    assert ids == {'0', '1', '3', '4'}
+
+def test_enrich_product_keeps_item_when_hotline_fails(monkeypatch):
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {'data': {'requirementResponses': [{'requirement': 'Ємність', 'value': 1, 'unit': {'name': 'шт'}}]}}
+
+    def failing_price(identifier):
+        if identifier == 'AB-2':
+            raise ConnectionError('Hotline недоступний')
+        return 500.0
+
+    monkeypatch.setattr(product_enricher.client, 'get', lambda url, **kwargs: Response())
+    monkeypatch.setattr(product_enricher, 'fetch_hotline_price', failing_price)
+    raws = [{'id': str(i), 'identifier': f'AB-{i}', 'title': f'powerbank ({i})'} for i in range(4)]
+    items = {item['id']: item for item in product_service.enrich_concurrently(raws, workers=2)}
+
+    assert set(items) == {'0', '1', '2', '3'}, "Збій ціни не відкидає товар"
+    assert items['2']['price'] is None and items['2']['characteristics']
+    assert all(items[i]['price'] == 500.0 for i in ('0', '1', '3'))
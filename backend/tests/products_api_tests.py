@@ -0,0 +1,61 @@
+import json
+import time
+import pytest
+from flask import Flask
+from backend.api.products import products_bp
+from backend.services import product_service
+
+@pytest.fixture
+def client(database, monkeypatch, make_enriched):
+
+    def fake_pages(query, limit):
+        time.sleep(0.1)
+        yield [{'id': str(i), 'identifier': f'AB-{i}', 'title': f'powerbank ({i})'} for i in range(limit)]
+
+    def fake_enrich(raw):
+        return make_enriched(raw['id'], requirements=('Ємність',))
+
+    monkeypatch.setattr(product_service, 'iter_product_pages', fake_pages)
+    monkeypatch.setattr(product_service, 'enrich_product', fake_enrich)
+    app = Flask(__name__)
+    app.register_blueprint(products_bp)
+    return app.test_client()
+
+def test_products_sync_mode_keeps_contract(client):
+    response = client.get('/products?query=powerbank&limit=3')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 3
+    assert set(body['items'][0]) == {'id', 'identifier', 'title', 'price', 'characteristics'}
+
+def test_products_async_mode_returns_job_and_results(client):
+    response = client.get('/products?query=powerbank&limit=4', headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['job']['progress']['needed'] == 4
+
+    for _ in range(100):
+        status = client.get(body['status_url']).get_json()
+        if status['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.05)
+    assert status['status'] == 'done'
+    assert status['progress']['suitable'] == 4
+    assert status['count'] == 4
+
+    cached = client.get('/products?query=powerbank&limit=4', headers={'Prefer': 'respond-async'})
+    assert cached.status_code == 200, "Закешовані товари повертаються одразу"
+
+def test_unknown_job_returns_404(client):
+    assert client.get('/products/jobs/nope').status_code == 404
+
+def test_products_stream_emits_cached_then_fetched_items(client):
+    client.get('/products?query=powerbank&limit=2')
+    response = client.get('/products?query=powerbank&limit=5', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    items = [r for r in records if r['type'] == 'item']
+    assert [r['source'] for r in items] == ['cache'] * 2 + ['fetch'] * 3
+    assert len({r['item']['id'] for r in items}) == 5
+    assert records[-1] == {'type': 'done', 'count': 5, 'cached': 2, 'fetched': 3, 'needed': 5}
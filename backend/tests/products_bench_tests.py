@@ -0,0 +1,21 @@
+from backend.benchmarks import products_bench
+from backend.benchmarks.upstream_simulator import SimulatorConfig, ENRICHER_URLS
+from backend.data.database import db
+from backend.utils import product_enricher
+from backend.utils.throttle import throttle
+
+def test_products_benchmark_runs_offline():
+    urls = {name: getattr(product_enricher, name) for name in ENRICHER_URLS}
+    intervals, jitter, database = dict(throttle.intervals), throttle.jitter, db.database
+    config = SimulatorConfig(catalogue_size=30, latency={}, not_found_rate=0.0)
+
+    report = products_bench.run(queries=2, limit=5, warm=2, config=config, real_throttle=False)
+
+    assert report['cold']['items_per_request'] == 5
+    assert report['cold']['upstream_calls']['search'] >= 2
+    assert report['cold']['upstream_calls']['hotline_offers'] >= 10
+    assert report['warm']['latency_ms']['count'] == 4
+    assert report['warm']['upstream_calls'] == {}, "Повторні запити обслуговуються з кешу"
+    assert {name: getattr(product_enricher, name) for name in ENRICHER_URLS} == urls
+    assert (throttle.intervals, throttle.jitter, db.database) == (intervals, jitter, database), \
+        "Бенчмарк відновлює глобальний стан"
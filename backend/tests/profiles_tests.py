@@ -0,0 +1,52 @@
+import pstats
+from flask import Flask
+from backend.api.profiles import profiles_bp, install_profiler
+from backend.api.ranking import rank_bp
+
+ITEMS = [{'id': f'p{i}', 'title': f't{i}', 'selected_characteristics': [
+    {'parameter': 'a', 'value': i + 1, 'mode': 'max'},
+    {'parameter': 'b', 'value': (i * 7) % 5 + 1, 'mode': 'min'}]} for i in range(6)]
+
+def make_client(tmp_path, **kwargs):
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    app.register_blueprint(profiles_bp)
+    install_profiler(app, directory=tmp_path / 'profiles', **kwargs)
+    return app.test_client()
+
+def test_slow_requests_are_sampled_into_bounded_ring(tmp_path):
+    client = make_client(tmp_path, threshold=0.0, ring_size=2, mode='sample', interval=0.001)
+    for _ in range(3):
+        assert client.post('/rank', json=ITEMS).status_code == 200
+
+    listing = client.get('/profiles').get_json()['items']
+    assert len(listing) == 2
+    assert listing[0]['endpoint'] == 'rank' and listing[0]['format'] == 'collapsed'
+    assert listing[0]['created'] >= listing[1]['created']
+
+    response = client.get(f"/profiles/{listing[0]['name']}")
+    assert response.status_code == 200
+    for line in response.get_data(as_text=True).splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0 and ';' in stack
+    assert client.get('/profiles/../app.log').status_code == 404
+    assert client.get('/profiles/missing.prof').status_code == 404
+
+def test_cprofile_mode_and_threshold(tmp_path):
+    client = make_client(tmp_path, threshold=3600.0, mode='cprofile')
+    client.post('/rank', json=ITEMS)
+    assert client.get('/profiles').get_json()['items'] == []
+
+    client = make_client(tmp_path, threshold=0.0, mode='cprofile')
+    client.post('/rank', json=ITEMS)
+    [profile] = client.get('/profiles').get_json()['items']
+    assert profile['format'] == 'prof'
+    stats = pstats.Stats(str(tmp_path / 'profiles' / profile['name']))
+    assert any(func[2] == 'rank_matrix' for func in stats.stats)
+
+def test_profiler_is_off_by_default(tmp_path):
+    app = Flask(__name__)
+    app.register_blueprint(profiles_bp)
+    assert install_profiler(app, directory=tmp_path / 'profiles') is None
+    assert not app.before_request_funcs and not app.teardown_request_funcs
+    assert app.test_client().get('/profiles').status_code == 404
@@ -0,0 +1,12 @@
+from backend.benchmarks import ranking_suite
+
+def test_ranking_suite_runs_and_flags_regressions():
+    results = ranking_suite.run(rows=[10, 200], criteria=[2, 5], max_cells=500, min_time=0.0)
+    assert set(results) == {f"rank/{p}/{n}x{m}" for p in ranking_suite.PROFILES
+                            for n, m in [(10, 2), (10, 5), (200, 2)]}
+
+    baseline = {key: dict(r) for key, r in results.items()}
+    assert ranking_suite.compare(results, baseline, tolerance=0.25) == []
+    slower = {key: dict(r, rows_per_s=r['rows_per_s'] * 0.5) for key, r in results.items()}
+    regressions = ranking_suite.compare(slower, baseline, tolerance=0.25)
+    assert len(regressions) == len(results)
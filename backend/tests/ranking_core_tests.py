@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+from flask import Flask
+from backend.api import ranking
+from backend.api.ranking import rank_bp
+from backend.services.product_service import save_products, feature_matrix
+from backend.services.ranking_core import critic_weights, critic_weights_batch, voronin_scores_batch
+from backend.services.ranking_service import compute_critic_weights, voronin_score, rank_scenarios
+
+def make_matrix(n=40, m=4, seed=1):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, m)) * [1, 10, 100, 1000][:m] + 5000
+
+def reference(X, modes):
+    df = pd.DataFrame(X, columns=[f'c{j}' for j in range(X.shape[1])])
+    weights = compute_critic_weights(df, modes)
+    return weights.values, voronin_score(df, weights, modes)
+
+def test_numpy_core_matches_pandas_normalization():
+    X = make_matrix(n=200, m=4)
+    modes = ['min', 'max', 'max', 'min']
+    df = pd.DataFrame(X)
+    norm = pd.DataFrame({
+        j: (df[j] - df[j].min()) / (df[j].max() - df[j].min()) if mode == 'max'
+        else (df[j].max() - df[j]) / (df[j].max() - df[j].min())
+        for j, mode in enumerate(modes)
+    })
+    C = norm.std(ddof=0) * (1 - norm.corr()).sum(axis=1)
+    np.testing.assert_allclose(critic_weights(X, np.array([m == 'max' for m in modes])), C / C.sum(), rtol=1e-9)
+
+def test_batch_matches_single_scenario_functions():
+    X = make_matrix()
+    scenarios = [['max', 'min', 'max', 'min'], ['min', 'min', 'max', 'max'], ['max'] * 4]
+    maximize = np.array([[m == 'max' for m in modes] for modes in scenarios])
+    selected = np.ones_like(maximize)
+    rows = np.ones((len(scenarios), X.shape[0]), dtype=bool)
+
+    weights = critic_weights_batch(X, selected, maximize, rows)
+    scores = voronin_scores_batch(X, weights, selected, maximize, rows)
+    for s, modes in enumerate(scenarios):
+        ref_weights, ref_scores = reference(X, modes)
+        np.testing.assert_allclose(weights[s], ref_weights, rtol=1e-9)
+        np.testing.assert_allclose(scores[s], ref_scores, rtol=1e-9)
+
+def test_batch_subsets_and_masks_match_sliced_matrix():
+    X = make_matrix()
+    mask = np.arange(X.shape[0]) % 3 != 0
+    ranked = rank_scenarios(X, ['a', 'b', 'c', 'd'], [
+        {'name': 'subset', 'criteria': {'b': 'min', 'd': 'max'}, 'ids': [str(i) for i in np.flatnonzero(mask)]},
+    ], ids=[str(i) for i in range(X.shape[0])])
+
+    ref_weights, ref_scores = reference(X[mask][:, [1, 3]], ['min', 'max'])
+    assert list(ranked[0]['weights']) == ['b', 'd']
+    np.testing.assert_allclose(list(ranked[0]['weights'].values()), ref_weights, rtol=1e-9)
+    np.testing.assert_allclose(ranked[0]['scores'][mask], ref_scores, rtol=1e-9)
+    assert np.isnan(ranked[0]['scores'][~mask]).all()
+
+def test_batch_degenerate_criterion_gets_zero_weight():
+    X = np.array([[1.0, 5.0, 10.0], [2.0, 5.0, 30.0], [3.0, 5.0, 20.0]])
+    weights = critic_weights_batch(X, np.ones((1, 3), bool), np.ones((1, 3), bool), np.ones((1, 3), bool))
+    assert weights[0, 1] == 0
+    assert np.isclose(weights.sum(), 1.0)
+
+def test_batch_scenario_without_rows_gets_uniform_weights_and_no_scores():
+    X = np.array([[1.0, np.nan], [2.0, np.nan]])
+    selected = np.array([[True, True], [True, False]])
+    maximize = np.ones((2, 2), bool)
+    rows = np.ones((2, 2), bool)
+    weights = critic_weights_batch(X, selected, maximize, rows)
+    scores = voronin_scores_batch(X, weights, selected, maximize, rows)
+    assert weights.tolist() == [[0.5, 0.5], [1.0, 0.0]]
+    assert np.isnan(scores[0]).all() and not np.isnan(scores[1]).any()
+
+def test_rank_batch_endpoint():
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    items = [{'id': str(i), 'title': f'p{i}', 'values': {'Ціна': 100 + 10 * i, 'Ємність': 1000 + 500 * (i % 3)}}
+             for i in range(6)]
+    body = app.test_client().post('/rank/batch', json={'items': items, 'scenarios': [
+        {'name': 'ціна', 'criteria': {'Ціна': 'min', 'Ємність': 'max'}},
+        {'name': 'перші три', 'criteria': {'Ціна': 'max'}, 'ids': ['0', '1', '2']},
+    ]}).get_json()
+
+    first, second = body['scenarios']
+    assert set(body['parameters']) == {'Ціна', 'Ємність'}
+    assert first['count'] == 6
+    assert [r['score'] for r in first['results']] == sorted(r['score'] for r in first['results'])
+    assert [r['id'] for r in second['results']] == ['2', '1', '0']
+    assert second['weights'] == {'Ціна': 1.0}
+
+    bad = app.test_client().post('/rank/batch', json={'items': items, 'scenarios': [{'criteria': {'X': 'max'}}]})
+    assert bad.status_code == 400
+    for scenarios in (['x'], [{'criteria': ['Ціна']}], [{'name': 'без критеріїв'}]):
+        response = app.test_client().post('/rank/batch', json={'items': items, 'scenarios': scenarios})
+        assert response.status_code == 400, scenarios
+
+def test_rank_batch_caps_items_times_scenarios(monkeypatch):
+    monkeypatch.setattr(ranking, 'MAX_BATCH_CELLS', 10)
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    items = [{'id': str(i), 'values': {'Ціна': i}} for i in range(6)]
+    scenarios = [{'criteria': {'Ціна': 'min'}}] * 2
+    assert app.test_client().post('/rank/batch', json={'items': items, 'scenarios': scenarios}).status_code == 400
+    assert app.test_client().post('/rank/batch', json={'items': items[:5], 'scenarios': scenarios}).status_code == 200
+
+def test_rank_top_k_returns_page_of_best_items():
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    rng = np.random.default_rng(3)
+    data = [{'id': str(i), 'title': f'p{i}', 'selected_characteristics': [
+        {'parameter': 'Ціна', 'value': float(rng.integers(100, 1000)), 'mode': 'min'},
+        {'parameter': 'Ємність', 'value': float(rng.integers(1000, 20000)), 'mode': 'max'},
+    ]} for i in range(50)]
+    client = app.test_client()
+    full = client.post('/rank', json=data).get_json()
+    assert full == sorted(full, key=lambda r: r['score']), "Без пагінації — теж від кращого"
+
+    page = client.post('/rank?top_k=5&offset=10', json=data).get_json()
+    assert page['total'] == 50 and page['offset'] == 10 and page['top_k'] == 5
+    assert [r['id'] for r in page['items']] == [r['id'] for r in full[10:15]]
+    assert np.isclose(page['stats']['min'], full[0]['score'])
+    assert client.post('/rank?top_k=-1', json=data).status_code == 400
+
+def test_rank_memoizes_identical_payloads():
+    from backend.services import ranking_service
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    client = app.test_client()
+    data = [{'id': str(i), 'title': f'p{i}', 'selected_characteristics': [
+        {'parameter': 'Ціна', 'value': 100.0 + i * 7 % 5, 'mode': 'min'},
+        {'parameter': 'Ємність', 'value': 1000.0 + i * 13 % 11, 'mode': 'max'},
+    ]} for i in range(20)]
+    ranking_service._rank_cache.clear()
+    before = ranking_service.rank_cache_stats()
+
+    first = client.post('/rank', json=data).get_json()
+    assert client.post('/rank', json=data).get_json() == first
+    data[0]['selected_characteristics'][0]['mode'] = 'max'
+    client.post('/rank', json=data)
+
+    stats = client.get('/rank/cache').get_json()
+    assert stats['hits'] - before['hits'] == 1
+    assert stats['misses'] - before['misses'] == 2
+    assert stats['entries'] == 2 and stats['bytes'] > 0
+
+def test_incremental_critic_matches_full_recompute():
+    from backend.services.ranking_core import IncrementalCritic
+    X = make_matrix(n=30, m=3)
+    maximize = np.array([True, False, True])
+    state = IncrementalCritic(maximize)
+    for i, row in enumerate(X):
+        state.add(i, row)
+    np.testing.assert_allclose(state.weights(), critic_weights(X, maximize), rtol=1e-9)
+
+    inner = int(np.flatnonzero(((X > X.min(axis=0)) & (X < X.max(axis=0))).all(axis=1))[0])
+    state.remove(inner)
+    state.weights()
+    assert state.recomputes == 0, "Видалення не-екстремальної альтернативи не потребує перерахунку"
+    extreme = int(np.argmax(X[:, 1]))
+    state.remove(extreme)
+    keep = np.setdiff1d(np.arange(30), [inner, extreme])
+    np.testing.assert_allclose(state.weights(), critic_weights(X[keep], maximize), rtol=1e-9)
+    assert state.recomputes == 1
+
+def test_rank_session_updates_incrementally():
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    client = app.test_client()
+
+    def item(i, price, capacity):
+        return {'id': str(i), 'title': f'p{i}', 'selected_characteristics': [
+            {'parameter': 'Ціна', 'value': price, 'mode': 'min'},
+            {'parameter': 'Ємність', 'value': capacity, 'mode': 'max'}]}
+
+    data = [item(i, 100 + 37 * i % 200, 1000 + 53 * i % 700) for i in range(10)]
+    created = client.post('/rank/sessions', json=data)
+    assert created.status_code == 201
+    session_url = f"/rank/sessions/{created.get_json()['session_id']}"
+
+    updated = client.patch(session_url + '?top_k=3', json={'add': [item(99, 50, 5000)], 'remove': ['0', '1']}).get_json()
+    assert updated['total'] == 9
+    assert updated['items'][0]['id'] == '99'
+    expected = client.post('/rank?top_k=3', json=data[2:] + [item(99, 50, 5000)]).get_json()
+    assert [r['id'] for r in updated['items']] == [r['id'] for r in expected['items']]
+    assert np.allclose([r['score'] for r in updated['items']], [r['score'] for r in expected['items']])
+
+    assert client.patch(session_url, json={'remove': ['nope']}).status_code == 400
+    assert client.delete(session_url).status_code == 204
+    assert client.get(session_url).status_code == 404
+
+def test_rank_sensitivity_is_reproducible_and_consistent():
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    client = app.test_client()
+    rng = np.random.default_rng(5)
+    data = [{'id': str(i), 'title': f'p{i}', 'selected_characteristics': [
+        {'parameter': 'Ціна', 'value': float(rng.integers(100, 1000)), 'mode': 'min'},
+        {'parameter': 'Ємність', 'value': float(rng.integers(1000, 20000)), 'mode': 'max'},
+        {'parameter': 'Вага', 'value': float(rng.integers(100, 900)), 'mode': 'min'},
+    ]} for i in range(40)]
+    data.append({'id': 'best', 'title': 'best', 'selected_characteristics': [
+        {'parameter': 'Ціна', 'value': 50.0, 'mode': 'min'},
+        {'parameter': 'Ємність', 'value': 30000.0, 'mode': 'max'},
+        {'parameter': 'Вага', 'value': 10.0, 'mode': 'min'},
+    ]})
+
+    body = client.post('/rank/sensitivity?draws=500&seed=7', json=data).get_json()
+    assert body == client.post('/rank/sensitivity?draws=500&seed=7', json=data).get_json()
+    items = body['items']
+    assert [r['base_rank'] for r in items] == list(range(1, 42))
+    assert items[0]['id'] == 'best' and items[0]['p_top1'] == 1.0
+    assert np.isclose(sum(r['p_top1'] for r in items), 1.0)
+    assert all(r['rank_p05'] <= r['rank_p50'] <= r['rank_p95'] for r in items)
+    assert client.post('/rank/sensitivity?draws=0', json=data).status_code == 400
+
+def test_rank_sensitivity_rejects_too_many_items(monkeypatch):
+    monkeypatch.setattr(ranking, 'MAX_SENSITIVITY_ITEMS', 3)
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    data = [{'id': str(i), 'title': f'p{i}', 'selected_characteristics': [
+        {'parameter': 'Ціна', 'value': float(i + 1), 'mode': 'min'}]} for i in range(4)]
+    response = app.test_client().post('/rank/sensitivity', json=data)
+    assert response.status_code == 400 and '3' in response.get_json()['error']
+
+def test_rank_query_ranks_cached_features_server_side(database, make_enriched):
+    rng = np.random.default_rng(5)
+    products = [make_enriched(f'p{i}', price=float(rng.integers(300, 900)), requirements=('Ємність',))
+                for i in range(12)]
+    for product in products:
+        for ch in product['characteristics']:
+            ch['value'] = int(rng.integers(5, 30)) * 1000 if product['id'] != 'p7' else 'невідомо'
+    save_products(products)
+    app = Flask(__name__)
+    app.register_blueprint(rank_bp)
+    client = app.test_client()
+    response = client.post('/rank/query?top_k=5', json={
+        'query': 'Powerbank', 'limit': 12, 'criteria': {'Ємність': 'max', 'Ціна': 'min'},
+        'bounds': {'Ціна': [0, 850]}})
+    features = feature_matrix('powerbank', 12)
+    bad = client.post('/rank/query', json={'query': 'powerbank', 'criteria': {'Вага': 'min'}})
+
+    assert response.status_code == 200 and bad.status_code == 400
+    body = response.get_json()
+    prices = features['matrix'][:, 0]
+    assert body['excluded'] == 1 + int(np.count_nonzero(prices > 850))
+    assert body['total'] == 12 - body['excluded'] and len(body['items']) == 5
+
+    legacy = [{'id': pid, 'title': title, 'selected_characteristics': [
+        {'parameter': 'Ємність', 'value': row[1], 'mode': 'max'},
+        {'parameter': 'Ціна', 'value': row[0], 'mode': 'min'}]}
+        for pid, title, row in zip(features['ids'], features['titles'], features['matrix'])
+        if not np.isnan(row[1]) and row[0] <= 850]
+    expected = client.post('/rank?top_k=5', json=legacy).get_json()
+    assert body['items'] == expected['items']
@@ -0,0 +1,104 @@
+import datetime
+from types import SimpleNamespace
+from backend.data import hotline_cache
+from backend.data.models import Product, QueryProduct
+from backend.services import product_service, reprice_service
+from backend.utils import product_enricher
+from backend.utils.throttle import TokenBucket
+
+def age(ids, hours):
+    stamp = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+    Product.update(price_updated_at=stamp).where(Product.id.in_(ids)).execute()
+
+def test_due_products_orders_by_popularity_then_staleness(database, make_enriched):
+    product_service.save_products([make_enriched(str(i)) for i in range(4)])
+    product_service.save_products([dict(make_enriched('5'), title='зарядка (5)')])
+    product_service.update_suitability('powerbank')
+    product_service.update_suitability('зарядка')
+    for _ in range(3):
+        product_service.record_query('зарядка')
+    product_service.record_query('powerbank')
+    age(['0', '1', '5'], 48)
+    age(['2'], 72)
+    age(['3'], 1)
+
+    assert [p.id for p in reprice_service.due_products(10)] == ['5', '2', '0', '1']
+
+def test_reprice_updates_prices_and_suitability_within_budget(database, monkeypatch, make_enriched):
+    product_service.save_products([make_enriched('1'), make_enriched('2', price=None), make_enriched('3')])
+    product_service.update_suitability('powerbank')
+    assert not QueryProduct.get(query='powerbank', product_id='2').suitable
+    age(['1', '2', '3'], 48)
+    calls = []
+
+    def fake_price(identifier):
+        calls.append(identifier)
+        if identifier == 'AB-3':
+            return None     # тимчасова помилка: кеш не оновлюється
+        hotline_cache.store_price(identifier, [150.0], 150.0)
+        return 150.0
+
+    monkeypatch.setattr(reprice_service, 'fetch_hotline_price', fake_price)
+    stats = reprice_service.reprice(budget=TokenBucket(rate=1000.0, capacity=3), workers=2)
+
+    assert stats == {'checked': 3, 'repriced': 2, 'changed': 2, 'failed': 1}
+    assert sorted(calls) == ['AB-1', 'AB-2', 'AB-3']
+    assert Product.get_by_id('2').price == 150.0
+    assert QueryProduct.get(query='powerbank', product_id='2').suitable
+    assert [p.id for p in reprice_service.due_products(10)] == ['3']
+
+class FakeHotline:
+    """Замість HTTP-клієнта: відповідає на пошук, запит токена та getOffers, рахуючи запити."""
+
+    def __init__(self, on_post=None):
+        self.posts = []
+        self.on_post = on_post
+
+    def post(self, url, headers=None, json=None):
+        self.posts.append(json.get('method') or json['operationName'])
+        if self.on_post:
+            self.on_post(len(self.posts))
+        body = {
+            'search.search': {'result': [{'url': '/ua/p/'}]},
+            'urlTypeDefiner': {'data': {'urlTypeDefiner': {'token': 't'}}},
+            'getOffers': {'data': {'byPathQueryProduct': {'offers': {'edges': [{'node': {'price': 150.0}}]}}}},
+        }[self.posts[-1]]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: body)
+
+def test_reprice_budget_is_charged_per_hotline_request(database, make_enriched, monkeypatch):
+    product_service.save_products([make_enriched('1'), make_enriched('2'), make_enriched('3')])
+    age(['1', '2', '3'], 48)
+    hotline_cache.store_resolution('AB-3', '/ua/p/', 'p', 't')
+    hotline = FakeHotline()
+    monkeypatch.setattr(product_enricher, 'client', hotline)
+    budget = TokenBucket(rate=1e-6, capacity=7)
+
+    stats = reprice_service.reprice(budget=budget, workers=1)
+
+    assert stats == {'checked': 3, 'repriced': 3, 'changed': 3, 'failed': 0}
+    assert len(hotline.posts) == 7, "Два товари без зіставлення — по три запити, із зіставленням — один"
+    assert not budget.try_acquire(0.5)
+
+def test_hotline_budget_never_waits_and_refunds_unused_tokens(database, monkeypatch):
+    hotline = FakeHotline()
+    monkeypatch.setattr(product_enricher, 'client', hotline)
+    budget = TokenBucket(rate=1e-6, capacity=3)
+
+    assert budget.try_acquire(3)
+    with product_enricher.hotline_budget(budget, prepaid=3):
+        assert product_enricher.fetch_hotline_price('AB-1') == 150.0
+    assert hotline.posts == ['search.search', 'urlTypeDefiner', 'getOffers']
+
+    # бюджет порожній і нічого не передплачено: запит не виконується й не чекає
+    with product_enricher.hotline_budget(budget):
+        assert product_enricher.fetch_hotline_price('AB-2') is None
+    assert len(hotline.posts) == 3 and hotline_cache.get_fresh_price('AB-2') is None
+
+    hotline_cache.store_resolution('AB-2', '/ua/p/', 'p', 't')
+    assert product_enricher.hotline_request_cost('AB-1') == 0
+    assert product_enricher.hotline_request_cost('AB-2') == 1
+    assert product_enricher.hotline_request_cost('AB-4') == 3
+    assert not budget.try_acquire(0.5)
+    with product_enricher.hotline_budget(budget, prepaid=3):
+        product_enricher.fetch_hotline_price('AB-2')
+    assert budget.try_acquire(2) and not budget.try_acquire(0.5), "Невикористані токени повертаються"
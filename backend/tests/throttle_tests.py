@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+import pytest
+from backend.utils import throttle as throttle_module
+from backend.utils.throttle import HostThrottle
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+def fake_throttle(monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle_module, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return HostThrottle(**kwargs), clock
+
+def test_host_throttle_spaces_requests_to_one_host(monkeypatch):
+    throttle, clock = fake_throttle(monkeypatch, intervals={'hotline.ua': 0.5}, jitter=0.0)
+    url = 'https://hotline.ua/svc/search/api/json-rpc'
+    assert [throttle.reserve(url) for _ in range(3)] == pytest.approx([0.0, 0.5, 1.0])
+
+    clock.now += 0.7
+    assert throttle.reserve(url) == pytest.approx(0.8), "Наступний слот — після вже зарезервованих"
+    clock.now += 10
+    assert throttle.reserve(url) == 0.0, "Після паузи запит іде одразу"
+
+def test_host_throttle_keeps_hosts_independent(monkeypatch):
+    throttle, _ = fake_throttle(monkeypatch, intervals={'hotline.ua': 0.5}, default_interval=0.2, jitter=0.0)
+    for _ in range(3):
+        throttle.reserve('https://hotline.ua/a')
+    assert throttle.reserve('https://prozorro.gov.ua/api/search/products') == 0.0
+    assert throttle.reserve('https://prozorro.gov.ua/api/products/1') == pytest.approx(0.2)
+    assert throttle.reserve('https://hotline.ua/b') == pytest.approx(1.5)
+
+def test_host_throttle_jitter_only_extends_interval(monkeypatch):
+    throttle, _ = fake_throttle(monkeypatch, intervals={'h': 0.5}, jitter=0.1)
+    throttle.reserve('http://h/')
+    delays = [throttle.reserve('http://h/') for _ in range(20)]
+    steps = [b - a for a, b in zip([0.0] + delays, delays)]
+    assert all(0.5 <= step <= 0.6 + 1e-9 for step in steps)
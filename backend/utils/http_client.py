@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+import logging
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.utils.throttle import HostThrottle, throttle as shared_throttle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (5, 20)          # (connect, read), с
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5                 # с, подвоюється з кожною спробою
+BACKOFF_MAX = 10.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+POOL_MAXSIZE = 16
+
+
+class HttpClient:
+    """
+    Спільний HTTP-клієнт для зовнішніх API (Prozorro, Hotline).
+
+    — тримає окрему requests.Session із пулом keep-alive з'єднань на кожен хост,
+    — підставляє таймаут за замовчуванням,
+    — повторює запит із експоненційною затримкою та джитером на 429/5xx і мережевих помилках,
+    — пропускає кожну спробу через per-host обмежувач частоти.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, pool_maxsize=POOL_MAXSIZE,
+                 throttle: HostThrottle = shared_throttle):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.pool_maxsize = pool_maxsize
+        self.throttle = throttle
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        """Повертає (або створює) сесію з пулом з'єднань для хоста з URL."""
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount(f"{parsed.scheme}://", adapter)
+                self._sessions[key] = session
+                logger.debug("Створено HTTP-сесію для %s", parsed.netloc)
+        return session
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Затримка перед повтором: Retry-After, якщо сервер його задав, інакше full jitter."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), BACKOFF_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, self.backoff_base * 2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Виконує запит із повторами.
+
+        :return: Останню отриману відповідь (навіть із кодом помилки — перевірка лишається за викликачем).
+        :raises: requests.RequestException, якщо мережеві помилки не зникли після всіх повторів.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session_for(url)
+        attempt = 0
+        while True:
+            self.throttle.wait(url)
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("%s %s: %s; повтор через %.2f с", method, url, exc, delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.warning("%s %s: статус %d; повтор через %.2f с",
+                               method, url, response.status_code, delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """Закриває всі сесії (наприклад, при зупинці процесу)."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# спільний клієнт для всіх функцій збагачення
+client = HttpClient()
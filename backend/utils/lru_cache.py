@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Потокобезпечний in-memory LRU-кеш з необов'язковим TTL та обмеженням за розміром у байтах.
+
+    При переповненні (за кількістю записів або, якщо задано maxbytes, за сумарним
+    розміром sizeof(value)) витісняється найдавніше використаний запис;
+    записи, старші за ttl секунд, вважаються відсутніми.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, maxbytes: int = None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof if sizeof is not None else (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()          # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        value, _, size = self._data.pop(key)
+        self.nbytes -= size
+        return value
+
+    def get(self, key, default=None):
+        """Повертає значення за ключем і позначає його як нещодавно використане."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[1] is not None and item[1] < time.monotonic():
+                self._remove(key)
+                item = _MISSING
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """
+        Додає або оновлює запис, витісняючи найстаріші за використанням.
+        ttl перекриває час життя кешу для цього запису.
+        Значення, більше за maxbytes, не кешується.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        """Видаляє запис і повертає його значення."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """Лічильники влучань/промахів і поточний розмір кешу."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._data),
+                'bytes': self.nbytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,219 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+# межі кошиків гістограм тривалості, с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: очікуються мітки {self.labelnames}, отримано {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        return ()
+
+
+class Counter(_Metric):
+    """Лічильник, що лише зростає."""
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    """Гістограма з кумулятивними кошиками, сумою та кількістю спостережень."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}      # key -> [counts per bucket + inf, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Контекстний менеджер: спостерігає тривалість блоку (зокрема, якщо він завершився винятком)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Gauge(_Metric):
+    """Показник, що зчитується функцією під час експорту: fn() → {кортеж міток: значення}."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], fn: Callable[[], dict]):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def _samples(self):
+        for key, value in sorted(self.fn().items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class CounterFunc(Gauge):
+    """Лічильник, що зчитується функцією під час експорту (накопичені значення ведуться деінде)."""
+    kind = 'counter'
+
+
+class Registry:
+    """Реєстр метрик процесу з експортом у текстовому форматі Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str], fn: Callable[[], dict]) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, fn))
+
+    def counter_func(self, name: str, documentation: str, labelnames: Iterable[str],
+                     fn: Callable[[], dict]) -> CounterFunc:
+        return self._register(CounterFunc(name, documentation, labelnames, fn))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+# спільний реєстр процесу
+registry = Registry()
+
+UPSTREAM_SECONDS = registry.histogram(
+    'upstream_request_seconds', 'Тривалість звернень до зовнішніх API за етапом.', ['stage'])
+SQLITE_SECONDS = registry.histogram(
+    'sqlite_query_seconds', 'Тривалість SQL-запитів SQLite за типом операції.', ['operation'])
+RANK_SECONDS = registry.histogram(
+    'rank_stage_seconds', 'Тривалість етапів /rank: weights, scores, serialize.', ['stage'])
+HTTP_SECONDS = registry.histogram(
+    'http_request_seconds', 'Тривалість обробки HTTP-запитів API.', ['method', 'endpoint', 'status'])
+# звернення до кешів, не заснованих на LRUCache; окремо не експортуються —
+# входять у cache_requests_total разом зі статистикою LRUCache
+CACHE_LOOKUPS = Counter('cache_lookups', 'Звернення до кешів, не заснованих на LRUCache.', ['cache', 'result'])
+
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """Підключає кеш до метрик: stats() повертає {'hits': …, 'misses': …} (як LRUCache.stats)."""
+    _caches[name] = stats
+
+
+def _cache_counts() -> Dict[str, Tuple[float, float]]:
+    counts = {}
+    for name, stats in list(_caches.items()):
+        snapshot = stats()
+        counts[name] = (snapshot['hits'], snapshot['misses'])
+    for (cache, result), value in list(CACHE_LOOKUPS._values.items()):
+        hits, misses = counts.get(cache, (0, 0))
+        counts[cache] = (hits + value, misses) if result == 'hit' else (hits, misses + value)
+    return counts
+
+
+def _hit_ratios() -> dict:
+    return {(name,): hits / (hits + misses) if hits + misses else 0.0
+            for name, (hits, misses) in _cache_counts().items()}
+
+
+def _cache_hits() -> dict:
+    return {(name, kind): value for name, (hits, misses) in _cache_counts().items()
+            for kind, value in (('hit', hits), ('miss', misses))}
+
+
+registry.gauge('cache_hit_ratio', 'Частка влучань у кеш.', ['cache'], _hit_ratios)
+registry.counter_func('cache_requests_total', 'Кількість звернень до кешу за результатом.',
+                      ['cache', 'result'], _cache_hits)
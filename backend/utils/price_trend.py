@@ -0,0 +1,99 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+
+
+def pack_offers(offer_lists: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Пакує списки цін у «рваний» масив: значення підряд і зміщення початків.
+
+    :return: (values, offsets); ціни i-го списку — values[offsets[i]:offsets[i + 1]].
+    """
+    lengths = np.fromiter((len(offers) for offers in offer_lists), dtype=np.int64, count=len(offer_lists))
+    offsets = np.zeros(len(offer_lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter((price for offers in offer_lists for price in offers), dtype=np.float64,
+                         count=int(offsets[-1]))
+    return values, offsets
+
+
+def _percentile(sorted_values: np.ndarray, starts: np.ndarray, lengths: np.ndarray, q: float) -> np.ndarray:
+    """Перцентиль q кожної групи відсортованих значень (лінійна інтерполяція, як у np.percentile)."""
+    position = q * (lengths - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, lengths - 1)
+    fraction = position - below
+    a, b = sorted_values[starts + below], sorted_values[starts + above]
+    return np.where(fraction >= 0.5, b - (b - a) * (1 - fraction), a + (b - a) * fraction)
+
+
+def smart_trend_batch(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Трендові ціни для багатьох списків пропозицій одним набором векторних операцій.
+
+    Для кожного списку будується гістограма з шириною кошика за Фрідманом-Діаконисом
+    (2·IQR·n^(-1/3)) і повертається середнє значень найгустішого кошика. Списки з не
+    більше ніж трьома цінами або з нульовою шириною кошика дають просте середнє.
+
+    :param values: Ціни всіх списків підряд.
+    :param offsets: Зміщення початків списків довжини k + 1 (див. pack_offers).
+    :return: Масив k трендових цін; NaN для порожніх списків.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    k = len(offsets) - 1
+    lengths = np.diff(offsets)
+    group = np.repeat(np.arange(k), lengths)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        trend = np.bincount(group, weights=values, minlength=k) / lengths
+
+    # сортування всередині груп: перцентилі, мінімум і максимум
+    order = np.lexsort((values, group))
+    sorted_values = values[order]
+    candidates = np.flatnonzero(lengths > 3)
+    starts, n = offsets[candidates], lengths[candidates]
+    iqr = _percentile(sorted_values, starts, n, 0.75) - _percentile(sorted_values, starts, n, 0.25)
+    bin_width = 2 * iqr * n ** (-1 / 3)
+    keep = bin_width > 0
+    groups, starts, n, bin_width = candidates[keep], starts[keep], n[keep], bin_width[keep]
+    if not len(groups):
+        return trend
+
+    lo, hi = sorted_values[starts], sorted_values[starts + n - 1]
+    # межі кошиків такі ж, як у np.arange(lo, hi + bin_width, bin_width): lo + i·Δ
+    delta = (lo + bin_width) - lo
+    bins = np.maximum(np.ceil((hi + bin_width - lo) / bin_width).astype(np.int64) - 1, 1)
+    bin_offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum(bins, out=bin_offsets[1:])
+
+    member = np.zeros(k, dtype=np.int64) - 1
+    member[groups] = np.arange(len(groups))
+    g = member[group]
+    inside = g >= 0
+    v, g = values[inside], g[inside]
+
+    index = np.floor((v - lo[g]) / delta[g]).astype(np.int64)
+    index -= v < lo[g] + index * delta[g]
+    index += v >= lo[g] + (index + 1) * delta[g]
+    last_edge = lo + bins * delta
+    counted = v <= last_edge[g]
+    index = np.clip(index, 0, bins[g] - 1)
+    counts = np.bincount((bin_offsets[g] + index)[counted], minlength=int(bin_offsets[-1]))
+
+    # перший кошик із максимальною кількістю в кожній групі (як np.argmax)
+    bin_group = np.repeat(np.arange(len(groups)), bins)
+    peak = np.maximum.reduceat(counts, bin_offsets[:-1])
+    first = np.flatnonzero(counts == peak[bin_group])
+    _, first_of_group = np.unique(bin_group[first], return_index=True)
+    best = first[first_of_group] - bin_offsets[:-1]
+
+    left, right = lo + best * delta, lo + (best + 1) * delta
+    clustered = (v >= left[g]) & (v < right[g])
+    size = np.bincount(g[clustered], minlength=len(groups))
+    total = np.bincount(g[clustered], weights=v[clustered], minlength=len(groups))
+    trend[groups] = np.where(size > 0, total / np.maximum(size, 1), trend[groups])
+    return trend
+
+
+def smart_trend_many(offer_lists: Sequence[Sequence[float]]) -> List[float]:
+    """Трендові ціни для списку списків пропозицій (NaN для порожніх)."""
+    return smart_trend_batch(*pack_offers(offer_lists)).tolist()
@@ -1,12 +1,34 @@
 import re
-import statistics
 import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import requests
+from backend.data import hotline_cache
+from backend.utils.http_client import client
+from backend.utils.metrics import UPSTREAM_SECONDS, CACHE_LOOKUPS
+from backend.utils.price_trend import smart_trend_batch
+from backend.utils.single_flight import SingleFlight
 
 # Налаштування логування
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+PROZORRO_SEARCH_URL = "https://prozorro.gov.ua/api/search/products"
+PROZORRO_PRODUCT_URL = "https://market-api.prozorro.gov.ua/api/products"
+# сторінок пошуку Prozorro, що завантажуються наперед
+PAGE_PREFETCH = 4
+# код товару в дужках: містить і велику латинську літеру, і цифру
+IDENTIFIER_REGEX = re.compile(r"\((?=[^)]*[A-Z])(?=[^)]*\d)[A-Za-z0-9\-/]+\)")
+
+HOTLINE_BASE_URL = "https://hotline.ua"
+HOTLINE_SEARCH_URL = f"{HOTLINE_BASE_URL}/svc/search/api/json-rpc"
+HOTLINE_GRAPHQL_URL = f"{HOTLINE_BASE_URL}/svc/frontend-api/graphql"
+
+# паралельні промахи кешу цін для одного ідентифікатора виконують одне звернення до Hotline
+_price_fetches = SingleFlight()
+
 
 def extract_text_in_last_parentheses(text):
     """
@@ -25,6 +47,52 @@ def extract_text_in_last_parentheses(text):
     return None
 
 
+class HotlineBudgetExhausted(requests.RequestException):
+    """Передплачені токени бюджету запитів до Hotline вичерпано, а вільних у бюджеті немає."""
+
+
+# запитів до Hotline на ціну товару без закешованого зіставлення: пошук, токен і getOffers
+HOTLINE_REQUESTS_UNRESOLVED = 3
+
+# бюджет запитів до Hotline, що діє в поточному потоці (див. hotline_budget)
+_budget = threading.local()
+
+
+def hotline_request_cost(identifier):
+    """
+    Скільки запитів до Hotline потрібно для ціни identifier за поточного стану кешів:
+    0 — ціна свіжа, 1 — зіставлення закешоване, інакше HOTLINE_REQUESTS_UNRESOLVED.
+    Повторне зіставлення після застарілого шляху не враховується.
+    """
+    if not identifier or hotline_cache.get_fresh_price(identifier) is not None:
+        return 0
+    return 1 if hotline_cache.get_resolution(identifier) is not None else HOTLINE_REQUESTS_UNRESOLVED
+
+
+@contextmanager
+def hotline_budget(budget, prepaid=0):
+    """
+    Списує з бюджету по токену за кожен запит до Hotline, виконаний у межах блоку
+    в поточному потоці: пошук, токен і getOffers, зокрема під час повторного зіставлення.
+
+    Спершу витрачаються prepaid токенів, уже отриманих викликачем: чекати на бюджет слід
+    до блоку, бо всередині потік може бути лідером single-flight, на якого чекають запити
+    користувачів. Понад передплачені токени беруться без очікування, а якщо їх немає,
+    запит не виконується (HotlineBudgetExhausted). Невикористані токени повертаються в бюджет.
+
+    :param budget: TokenBucket, з якого списуються токени.
+    :param prepaid: Кількість уже отриманих токенів.
+    """
+    previous = getattr(_budget, 'current', None)
+    charge = _budget.current = {'budget': budget, 'prepaid': prepaid}
+    try:
+        yield
+    finally:
+        _budget.current = previous
+        if charge['prepaid']:
+            budget.release(charge['prepaid'])
+
+
 def hotline_request(url, payload, token=None, referer=None):
     """
     Надсилає POST-запит до API Hotline з необхідними заголовками.
@@ -34,8 +102,15 @@ def hotline_request(url, payload, token=None, referer=None):
     :param token: Токен авторизації (необов'язковий).
     :param referer: Referer-рядок (необов'язковий).
     :return: JSON-відповідь сервера.
-    :raises: HTTPError, якщо запит не вдалий.
+    :raises: HTTPError, якщо запит не вдалий; HotlineBudgetExhausted, якщо бюджет запитів
+             (hotline_budget) вичерпано. На бюджет ця функція ніколи не чекає.
     """
+    charge = getattr(_budget, 'current', None)
+    if charge is not None:
+        if charge['prepaid'] > 0:
+            charge['prepaid'] -= 1
+        elif not charge['budget'].try_acquire():
+            raise HotlineBudgetExhausted(f"Бюджет запитів до Hotline вичерпано: {url}")
     headers = {
         "accept": "*/*",
         "accept-language": "uk,ru;q=0.9,en;q=0.8",
@@ -44,12 +119,12 @@ def hotline_request(url, payload, token=None, referer=None):
         "user-agent": "Mozilla/5.0",
     }
     if referer:
-        headers["x-referer"] = f"https://hotline.ua{referer}"
+        headers["x-referer"] = f"{HOTLINE_BASE_URL}{referer}"
     if token:
         headers["x-token"] = token
 
     logging.debug(f"Надсилання запиту до API Hotline: {url} з даними: {payload}")
-    response = requests.post(url, headers=headers, json=payload)
+    response = client.post(url, headers=headers, json=payload)
     response.raise_for_status()
     return response.json()
 
@@ -57,33 +132,97 @@ def hotline_request(url, payload, token=None, referer=None):
 def smart_trend(values):
     """
     Обчислює трендову (типову) ціну з використанням гістограми та методу Фрідмана-Діакониса.
+    Обгортка над price_trend.smart_trend_batch для одного списку.
 
     :param values: Список числових значень (наприклад, ціни).
     :return: Усереднене значення в найгустішому інтервалі.
     """
-    if len(values) <= 3:
-        return statistics.mean(values)
+    result = smart_trend_batch(np.asarray(values, dtype=np.float64), np.array([0, len(values)]))[0]
+    logging.debug(f"Розраховано трендову ціну: {result}")
+    return float(result)
 
-    q75, q25 = np.percentile(values, [75, 25])
-    iqr = q75 - q25
-    n = len(values)
-    bin_width = 2 * iqr * (n ** (-1 / 3))
 
-    if bin_width == 0:
-        return statistics.mean(values)
+def fetch_search_page(search_query, page):
+    """
+    Завантажує одну сторінку пошуку Prozorro.
 
-    min_value, max_value = min(values), max(values)
-    bins = np.arange(min_value, max_value + bin_width, bin_width)
-    counts, bin_edges = np.histogram(values, bins=bins)
+    :param search_query: Текст пошуку.
+    :param page: Номер сторінки (з 1).
+    :return: Список сирих елементів сторінки (порожній, якщо сторінок більше немає)
+             або None, якщо запит неуспішний.
+    """
+    params = {"text": search_query, "page": page}
+    with UPSTREAM_SECONDS.time(stage='prozorro_search_page'):
+        response = client.post(PROZORRO_SEARCH_URL, params=params, headers={
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "uk",
+            "user-agent": "Mozilla/5.0"
+        })
 
-    max_count_index = np.argmax(counts)
-    trend_interval = (bin_edges[max_count_index], bin_edges[max_count_index + 1])
+    if response.status_code != 200:
+        logging.warning(f"Помилка запиту сторінки {page}: {response.status_code}")
+        return None
+    return response.json().get("data", [])
 
-    clustered_values = [v for v in values if trend_interval[0] <= v < trend_interval[1]]
-    result = statistics.mean(clustered_values) if clustered_values else statistics.mean(values)
 
-    logging.debug(f"Розраховано трендову ціну: {result}")
-    return result
+def iter_product_pages(search_query, product_limit=None, window=PAGE_PREFETCH):
+    """
+    Генератор сторінок пошуку Prozorro з попереднім завантаженням.
+
+    Одночасно в роботі тримається до window сторінок (вікно стартує з однієї сторінки
+    й подвоюється, щоб невеликі запити не тягнули зайвих сторінок); сторінки віддаються
+    строго по порядку, тож результат не відрізняється від послідовного обходу. Обхід
+    зупиняється на першій порожній або неуспішній сторінці чи після product_limit товарів;
+    сторінки, що вже завантажуються, скасовуються.
+
+    :param search_query: Текст пошуку.
+    :param product_limit: Максимальна кількість товарів (None — без обмеження).
+    :param window: Кількість сторінок «у польоті».
+    :return: Ітератор списків продуктів (id, title, identifier) — по одному на сторінку.
+    """
+    yielded = 0
+    next_page = 1
+    current_window = 1
+    in_flight = deque()
+    pool = ThreadPoolExecutor(max_workers=max(1, window), thread_name_prefix='prozorro-page')
+    try:
+        while True:
+            while len(in_flight) < current_window:
+                in_flight.append(pool.submit(fetch_search_page, search_query, next_page))
+                next_page += 1
+
+            items = in_flight.popleft().result()
+            if not items:
+                logging.info("Немає більше продуктів для завантаження.")
+                return
+
+            products = []
+            for item in items:
+                title = item.get("title", "")
+                if IDENTIFIER_REGEX.search(title):
+                    products.append({
+                        "id": item.get("id"),
+                        "identifier": extract_text_in_last_parentheses(title),
+                        "title": title.lower(),
+                    })
+                    if product_limit is not None and yielded + len(products) >= product_limit:
+                        yield products
+                        return
+            yielded += len(products)
+            current_window = min(max(1, window), current_window * 2)
+            yield products
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_products(search_query, product_limit=None, window=PAGE_PREFETCH):
+    """
+    Генератор продуктів Prozorro з витягом ідентифікаторів (див. iter_product_pages).
+
+    :return: Ітератор продуктів з полями id, title, identifier.
+    """
+    for products in iter_product_pages(search_query, product_limit, window):
+        yield from products
 
 
 def fetch_products(product_limit, search_query):
@@ -94,61 +233,27 @@ def fetch_products(product_limit, search_query):
     :param search_query: Текст пошуку.
     :return: Список продуктів з полями id, title, identifier.
     """
-    base_url = "https://prozorro.gov.ua/api/search/products"
-    products = []
-    page = 1
-    regex = re.compile(r"\((?=[^)]*[A-Z])(?=[^)]*\d)[A-Za-z0-9\-/]+\)")
-
-    while len(products) < product_limit:
-        params = {"text": search_query, "page": page}
-        response = requests.post(base_url, params=params, headers={
-            "accept": "application/json, text/plain, */*",
-            "accept-language": "uk",
-            "user-agent": "Mozilla/5.0"
-        })
-
-        if response.status_code != 200:
-            logging.warning(f"Помилка запиту: {response.status_code}")
-            break
-
-        data = response.json()
-        items = data.get("data", [])
-
-        if not items:
-            logging.info("Немає більше продуктів для завантаження.")
-            break
-
-        for item in items:
-            title = item.get("title", "")
-            match = regex.search(title)
-            if match:
-                identifier = extract_text_in_last_parentheses(title)
-                products.append({
-                    "id": item.get("id"),
-                    "identifier": identifier,
-                    "title": title.lower(),
-                })
-                if len(products) >= product_limit:
-                    break
-        page += 1
-
+    products = list(iter_products(search_query, product_limit))
     logging.info(f"Завантажено {len(products)} продуктів.")
     return products
 
 
+@UPSTREAM_SECONDS.time(stage='enrich_product')
 def enrich_product(product):
     """
     Розширює продукт характеристиками з Prozorro та ціною з Hotline.
 
     :param product: Словник з ключами id, identifier, title.
-    :return: Розширений словник продукту з ціною та характеристиками або None.
+    :return: Розширений словник продукту з ціною та характеристиками або None, якщо картку
+             Prozorro не отримано; збій Hotline дає товар із ціною None.
     """
-    url = f"https://market-api.prozorro.gov.ua/api/products/{product['id']}"
-    response = requests.get(url, headers={
-        "accept": "application/json, text/plain, */*",
-        "accept-language": "uk",
-        "user-agent": "Mozilla/5.0"
-    })
+    url = f"{PROZORRO_PRODUCT_URL}/{product['id']}"
+    with UPSTREAM_SECONDS.time(stage='prozorro_product'):
+        response = client.get(url, headers={
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "uk",
+            "user-agent": "Mozilla/5.0"
+        })
 
     if response.status_code != 200:
         logging.warning(f"Помилка отримання даних продукту {product['id']}: {response.status_code}")
@@ -165,7 +270,12 @@ def enrich_product(product):
                 "unit": req["unit"].get("name")
             })
 
-    price = fetch_hotline_price(product["identifier"])
+    try:
+        price = fetch_hotline_price(product["identifier"])
+    except Exception:
+        # ціна необов'язкова: товар зберігається без неї, переоцінка допише її пізніше
+        logging.exception(f"Не вдалося отримати ціну Hotline для {product['identifier']}")
+        price = None
 
     enriched = {
         "id": product["id"],
@@ -181,15 +291,84 @@ def enrich_product(product):
 
 def fetch_hotline_price(identifier):
     """
-    Отримує ціну продукту з Hotline за допомогою трьох етапів API-запитів.
+    Повертає трендову ціну продукту з Hotline, використовуючи персистентний кеш.
+
+    Свіжий запис кешу (зокрема негативний — «не знайдено») повертається без запитів до Hotline;
+    інакше ціни завантажуються через fetch_hotline_offers і зберігаються разом із трендом.
+    Паралельні промахи з однаковим ідентифікатором об'єднуються (single-flight), тож Hotline
+    опитується один раз, а запити інших ідентифікаторів одне одного не чекають.
 
     :param identifier: Ідентифікатор продукту.
     :return: Усереднена типова ціна або None, якщо не вдалося знайти.
     """
-    base_url = "https://hotline.ua"
-    api_url_search = f"{base_url}/svc/search/api/json-rpc"
-    api_url_graphql = f"{base_url}/svc/frontend-api/graphql"
+    if not identifier:
+        return None
+
+    cached = hotline_cache.get_fresh_price(identifier)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(cache='hotline_price', result='hit')
+        logging.debug(f"Ціна для {identifier} взята з кешу: {cached.smart_trend}")
+        return cached.smart_trend
+    CACHE_LOOKUPS.inc(cache='hotline_price', result='miss')
+    return _price_fetches.do(identifier, 1, lambda: _fetch_and_store_price(identifier))
+
+
+def _fetch_and_store_price(identifier):
+    """Завантажує ціни з Hotline і зберігає їх у кеші; виконується одним потоком на ідентифікатор."""
+    # попередній виклик міг зберегти ціну між перевіркою кешу й початком цього
+    cached = hotline_cache.get_fresh_price(identifier)
+    if cached is not None:
+        return cached.smart_trend
+
+    prices = fetch_hotline_offers(identifier)
+    if prices is None:
+        # тимчасова помилка — не кешуємо, щоб наступний запит повторив спробу
+        return None
+
+    trend = round(smart_trend(prices), 2) if prices else None
+    hotline_cache.store_price(identifier, prices, trend)
+    if trend is not None:
+        logging.info(f"Знайдено ціну для {identifier}: {trend}")
+    return trend
+
+
+def fetch_hotline_offers(identifier):
+    """
+    Отримує ціни пропозицій продукту з Hotline.
+
+    Якщо зіставлення identifier → (url_path, slug, token) вже закешоване, потрібен лише
+    один запит getOffers; інакше спершу виконуються пошук і запит токена.
+    Якщо за закешованим зіставленням getOffers не вдався або повернув відповідь неочікуваної
+    структури (застарілий шлях чи токен), зіставлення скидається й оновлюється один раз.
 
+    :param identifier: Ідентифікатор продукту.
+    :return: Список цін; порожній список, якщо товар не знайдено або пропозицій немає;
+             None у разі мережевої чи тимчасової помилки.
+    """
+    resolution = hotline_cache.get_resolution(identifier)
+    if resolution is not None:
+        prices = fetch_offers_by_path(identifier, *resolution)
+        if prices is not None:
+            return prices
+        logging.info(f"Закешоване зіставлення Hotline для {identifier} не спрацювало, оновлюємо")
+        hotline_cache.invalidate_resolution(identifier)
+
+    resolution = resolve_hotline_product(identifier)
+    if not resolution:
+        # () — товар не знайдено, None — тимчасова помилка
+        return None if resolution is None else []
+    hotline_cache.store_resolution(identifier, *resolution)
+    return fetch_offers_by_path(identifier, *resolution)
+
+
+def resolve_hotline_product(identifier):
+    """
+    Знаходить сторінку товару на Hotline та отримує для неї x-token (перші два етапи запитів).
+
+    :param identifier: Ідентифікатор продукту.
+    :return: Кортеж (url_path, slug, token); порожній кортеж, якщо товар не знайдено;
+             None у разі мережевої чи тимчасової помилки.
+    """
     # Пошук продукту
     search_payload = {
         "jsonrpc": "2.0",
@@ -199,12 +378,17 @@ def fetch_hotline_price(identifier):
     }
 
     try:
-        data = hotline_request(api_url_search, search_payload)
+        with UPSTREAM_SECONDS.time(stage='hotline_search'):
+            data = hotline_request(HOTLINE_SEARCH_URL, search_payload)
+    except requests.RequestException:
+        logging.warning(f"Помилка пошуку на Hotline для {identifier}")
+        return None
+    try:
         url_path = data["result"][0]["url"]
         product_slug = url_path.strip('/').split('/')[-1]
-    except (KeyError, IndexError, requests.RequestException):
+    except (KeyError, IndexError, TypeError):
         logging.warning(f"Не знайдено продукт на Hotline для {identifier}")
-        return None
+        return ()
 
     # Отримання токена
     token_payload = {
@@ -219,13 +403,28 @@ def fetch_hotline_price(identifier):
     }
 
     try:
-        data = hotline_request(api_url_graphql, token_payload)
+        with UPSTREAM_SECONDS.time(stage='hotline_token'):
+            data = hotline_request(HOTLINE_GRAPHQL_URL, token_payload)
         token = data["data"]["urlTypeDefiner"]["token"]
     except (KeyError, TypeError, requests.RequestException):
         logging.warning(f"Не вдалося отримати токен для {identifier}")
         return None
 
-    # Отримання цін
+    return url_path, product_slug, token
+
+
+def fetch_offers_by_path(identifier, url_path, product_slug, token):
+    """
+    Завантажує ціни пропозицій для вже знайденої сторінки Hotline (запит getOffers).
+
+    :param identifier: Ідентифікатор продукту (для логування).
+    :param url_path: Шлях сторінки товару.
+    :param product_slug: Останній сегмент шляху.
+    :param token: x-token сторінки.
+    :return: Список цін; порожній список, лише якщо Hotline повернув порожній список пропозицій;
+             None у разі помилки запиту або відповіді неочікуваної структури (зокрема data: null) —
+             такі результати не кешуються як «не знайдено».
+    """
     prices_payload = {
         "operationName": "getOffers",
         "variables": {"path": product_slug, "cityId": 187},
@@ -244,14 +443,14 @@ def fetch_hotline_price(identifier):
     }
 
     try:
-        data = hotline_request(api_url_graphql, prices_payload, token=token, referer=url_path)
+        with UPSTREAM_SECONDS.time(stage='hotline_offers'):
+            data = hotline_request(HOTLINE_GRAPHQL_URL, prices_payload, token=token, referer=url_path)
+    except requests.RequestException:
+        logging.warning(f"Не вдалося завантажити ціни для {identifier}")
+        return None
+    try:
         edges = data["data"]["byPathQueryProduct"]["offers"]["edges"]
-        prices = [edge["node"]["price"] for edge in edges if "price" in edge["node"]]
-        if prices:
-            trend = round(smart_trend(prices), 2)
-            logging.info(f"Знайдено ціну для {identifier}: {trend}")
-            return trend
-    except (KeyError, TypeError, requests.RequestException):
-        logging.warning(f"Не вдалося витягнути ціни для {identifier}")
-    return None
-
+        return [edge["node"]["price"] for edge in edges if "price" in edge["node"]]
+    except (KeyError, TypeError):
+        logging.warning(f"Неочікувана відповідь getOffers для {identifier}")
+        return None
@@ -0,0 +1,130 @@
+"""
+Профайлери запитів і кільце збережених профілів (див. api/profiles.py).
+
+Режими:
+  sample   – семплер стеків усіх потоків процесу (зокрема воркерів fetch_and_cache)
+             кожні PROFILE_INTERVAL секунд; файл .collapsed у форматі flamegraph.pl/speedscope,
+  cprofile – cProfile потоку запиту; файл .prof для pstats/snakeviz.
+"""
+import datetime
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+PROFILE_SLOW_MS = 2000
+PROFILE_DIR = 'profiles'
+PROFILE_RING_SIZE = 50
+# профілювання вмикається явно (PROFILE_MODE=sample|cprofile)
+PROFILE_MODE = 'off'
+PROFILE_MODES = ('sample', 'cprofile', 'off')
+# період семплювання стеків, с
+PROFILE_INTERVAL = 0.005
+SAMPLER_THREAD_NAME = 'profile-sampler'
+
+EXTENSIONS = {'sample': 'collapsed', 'cprofile': 'prof'}
+PROFILE_NAME = re.compile(r'^(?P<created>\d{8}T\d{6}\.\d{6})-(?P<endpoint>\w+)-(?P<duration_ms>\d+)ms'
+                          r'\.(?P<format>collapsed|prof)$')
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Фоновий потік, що періодично знімає стеки всіх потоків і рахує однакові стеки."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        super().__init__(name=SAMPLER_THREAD_NAME, daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name.startswith(SAMPLER_THREAD_NAME):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(name)
+                self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """Стеки у форматі «потік;зовнішня;…;внутрішня кількість», по рядку на стек."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileRing:
+    """Каталог профілів, що зберігає не більше size останніх файлів."""
+
+    def __init__(self, directory, size: int = PROFILE_RING_SIZE):
+        self.directory = Path(directory)
+        self.size = size
+        self._lock = threading.Lock()
+
+    def _paths(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted((path for path in self.directory.iterdir() if PROFILE_NAME.match(path.name)),
+                      key=lambda path: path.name)
+
+    def save(self, endpoint: str, duration: float, fmt: str, write) -> Path:
+        """
+        Створює файл профілю й видаляє найстаріші понад розмір кільця.
+
+        :param endpoint: Шаблон маршруту запиту (наприклад, '/rank/batch').
+        :param duration: Тривалість запиту, с.
+        :param fmt: 'collapsed' або 'prof'.
+        :param write: Функція, що записує профіль за переданим шляхом.
+        :return: Шлях збереженого файлу.
+        """
+        slug = re.sub(r'\W+', '_', endpoint).strip('_') or 'root'
+        created = datetime.datetime.now().strftime('%Y%m%dT%H%M%S.%f')
+        path = self.directory / f"{created}-{slug}-{int(duration * 1000)}ms.{fmt}"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write(path)
+            paths = self._paths()
+            for stale in paths[:max(0, len(paths) - self.size)]:
+                stale.unlink(missing_ok=True)
+        return path
+
+    def list(self) -> List[dict]:
+        """Метадані збережених профілів, від найновішого."""
+        profiles = []
+        for path in reversed(self._paths()):
+            match = PROFILE_NAME.match(path.name)
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            profiles.append({
+                'name': path.name,
+                'created': datetime.datetime.strptime(match['created'], '%Y%m%dT%H%M%S.%f').isoformat(),
+                'endpoint': match['endpoint'],
+                'duration_ms': int(match['duration_ms']),
+                'format': match['format'],
+                'size': size,
+            })
+        return profiles
+
+    def path(self, name: str) -> Optional[Path]:
+        """Шлях профілю за іменем або None (зокрема для імен поза кільцем)."""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
@@ -0,0 +1,67 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Виклик, що виконується зараз: розмір, результат і подія завершення."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Координатор «single-flight»: паралельні виклики з однаковим ключем виконують
+    функцію один раз і отримують спільний результат.
+
+    Кожен виклик має розмір (наприклад, ліміт товарів). Запит розміру не більшого,
+    ніж у виконуваного виклику, просто чекає його результату. Більший запит спершу
+    чекає на менший виклик (його дані часто покривають більшу частину потреби),
+    а потім запускає власний — або приєднується до вже запущеного більшого.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, size: int, fn):
+        """Виконує fn() для ключа або чекає на вже запущений виклик; повертає результат fn."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call(size)
+                    leader = True
+                else:
+                    call.waiters += 1
+                    leader = False
+
+            if leader:
+                return self._run(key, call, fn)
+
+            logger.debug("Очікування виклику %r (розмір %d) для розміру %d", key, call.size, size)
+            call.done.wait()
+            if call.size >= size:
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+    def _run(self, key, call: _Call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info("Результат виклику %r спільно використали ще %d запитів", key, call.waiters)
+            call.done.set()
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+import logging
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# мінімальний інтервал (с) між запитами до одного хоста та випадкова добавка до нього
+DEFAULT_MIN_INTERVAL = 0.1
+DEFAULT_JITTER = 0.1
+HOST_MIN_INTERVALS = {
+    'prozorro.gov.ua': 0.1,
+    'market-api.prozorro.gov.ua': 0.1,
+    'hotline.ua': 0.15,
+}
+
+
+class HostThrottle:
+    """
+    Потокобезпечний «бюджет ввічливості» для зовнішніх хостів.
+
+    Кожен хост має власний мінімальний інтервал між запитами (із джитером),
+    тож паралельні воркери разом не перевищують дозволену частоту,
+    а запити до різних хостів не блокують один одного. Хост — це host[:port] з URL,
+    тож сервіси на різних портах однієї адреси обмежуються окремо.
+    """
+
+    def __init__(self, intervals=None, default_interval=DEFAULT_MIN_INTERVAL, jitter=DEFAULT_JITTER):
+        self.intervals = dict(HOST_MIN_INTERVALS if intervals is None else intervals)
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url: str) -> float:
+        """Резервує наступний слот для хоста з URL і повертає, скільки секунд чекати."""
+        host = urlparse(url).netloc.rpartition('@')[2].lower() or url
+        interval = self.intervals.get(host, self.default_interval)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval + random.uniform(0, self.jitter)
+        return slot - now
+
+    def wait(self, url: str) -> None:
+        """Блокує потік до настання дозволеного слоту для хоста."""
+        delay = self.reserve(url)
+        if delay > 0:
+            logger.debug("Очікування %.3f с перед запитом до %s", delay, url)
+            time.sleep(delay)
+
+
+# спільний екземпляр для всіх клієнтів Prozorro/Hotline
+throttle = HostThrottle()
+
+
+class TokenBucket:
+    """
+    Потокобезпечний бюджет запитів «token bucket»: токени поповнюються зі швидкістю rate
+    за секунду, у запасі — не більше capacity (допустимий сплеск).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_hour(cls, budget: int, burst: int = None) -> 'TokenBucket':
+        """Бюджет budget запитів на годину; сплеск за замовчуванням — п'ятихвилинна частка."""
+        return cls(budget / 3600.0, burst if burst is not None else max(1, budget // 12))
+
+    def _take(self, tokens: float) -> float:
+        """Забирає токени, якщо їх вистачає (повертає 0), інакше — скільки секунд чекати."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Забирає токени без очікування; False, якщо бюджет вичерпано."""
+        return self._take(tokens) == 0.0
+
+    def release(self, tokens: float) -> None:
+        """Повертає невикористані токени (не більше capacity у запасі)."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens: float = 1, stop: threading.Event = None) -> bool:
+        """
+        Чекає, доки бюджет дозволить запит.
+
+        :param stop: Подія, встановлення якої перериває очікування.
+        :return: True, якщо токени отримано; False, якщо очікування перервано.
+        """
+        while True:
+            delay = self._take(tokens)
+            if delay == 0.0:
+                return True
+            logger.debug("Бюджет запитів вичерпано, очікування %.1f с", delay)
+            if stop is not None:
+                if stop.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
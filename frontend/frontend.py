@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import requests
+import json
 import uuid
 
 def highlight_score(val):
@@ -32,19 +33,86 @@ if 'custom_products' not in st.session_state:
 query = st.text_input("Пошуковий запит", value="powerbank")
 limit = st.number_input("Кількість товарів", min_value=1, max_value=100, value=10)
 
+def item_to_row(item):
+    """Розгортає характеристики товару в плоский рядок таблиці."""
+    row = {"Назва": item["title"], "Ціна": item["price"], "id": item["id"]}
+    for ch in item["characteristics"]:
+        row[ch["requirement"]] = ch["value"]
+    return row
+
+
+def fetch_items(query, limit):
+    """
+    Отримує товари потоково (NDJSON): закешовані приходять одразу, нові — щойно бекенд
+    їх збагатить, тож таблиця перемальовується в міру надходження.
+    """
+    items = []
+    status = st.empty()
+    table = st.empty()
+    with requests.get(
+        "http://localhost:8000/products",
+        params={"query": query, "limit": limit},
+        headers={"Accept": "application/x-ndjson"},
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["type"] == "item":
+                items.append(record["item"])
+                status.info(f"⏳ Отримано {len(items)}/{limit} товарів...")
+                table.dataframe(
+                    pd.DataFrame([item_to_row(i) for i in items]).drop(columns=["id"]),
+                    use_container_width=True,
+                )
+            elif record["type"] == "error":
+                raise RuntimeError(record["error"])
+    status.empty()
+    table.empty()
+    return items
+
+
+def rank_by_query(query, limit, criteria, bounds):
+    """
+    Ранжує товари запиту на бекенді (/rank/query): надсилаються лише критерії та межі,
+    значення характеристик бекенд бере зі свого кешу.
+    """
+    res = requests.post("http://localhost:8000/rank/query", json={
+        "query": query, "limit": int(limit), "criteria": criteria, "bounds": bounds,
+    })
+    res.raise_for_status()
+    return res.json()["items"]
+
+
+def rank_with_values(df, criteria):
+    """Надсилає значення вибраних характеристик на /rank (потрібно для власних товарів, яких немає на бекенді)."""
+    payload = []
+    for _, row in df.iterrows():
+        obj = {
+            "id": row["id"],
+            "title": row["Назва"],
+            "selected_characteristics": []
+        }
+        for param, mode in criteria.items():
+            if param in row and pd.notna(row[param]):
+                obj["selected_characteristics"].append({
+                    "parameter": param,
+                    "value": row[param],
+                    "mode": mode
+                })
+        payload.append(obj)
+    res = requests.post("http://localhost:8000/rank", json=payload)
+    res.raise_for_status()
+    return res.json()
+
+
 if st.button("📦 Отримати товари"):
     try:
-        url = f"http://localhost:8000/products?query={query}&limit={limit}"
-        response = requests.get(url)
-        response.raise_for_status()
-        items = response.json()["items"]
-        rows = []
-        for item in items:
-            row = {"Назва": item["title"], "Ціна": item["price"], "id": item["id"]}
-            for ch in item["characteristics"]:
-                row[ch["requirement"]] = ch["value"]
-            rows.append(row)
-        st.session_state.products_df = pd.DataFrame(rows)
+        items = fetch_items(query, limit)
+        st.session_state.products_df = pd.DataFrame([item_to_row(item) for item in items])
+        st.session_state.products_query = (query, limit)
     except Exception as e:
         st.error(f"❌ Помилка: {e}")
 
@@ -89,6 +157,7 @@ if st.session_state.products_df is not None:
     # Вибір параметрів
     st.subheader("⚙️ Вибір індикаторів та екстримальні вимоги до них")
     selected_criteria = {}
+    bounds = {}
     filter_mask = pd.Series([True] * len(df_all))
 
     for col in df_all.columns:
@@ -106,35 +175,19 @@ if st.session_state.products_df is not None:
                         slider = st.slider(f"Екстримальні значення для {col}", min_val, max_val, (min_val, max_val), key=f"slider_{col}")
                         filter_mask &= (df_all[col] >= slider[0]) & (df_all[col] <= slider[1])
                         selected_criteria[col] = mode
+                        bounds[col] = list(slider)
                     except:
                         st.warning(f"⚠️ Неможливо побудувати фільтр для {col} (нечислове значення?)")
 
     # Submit
     if st.button("📤 Обрати оптимальні товари"):
-        filtered_df = df_all[filter_mask].copy()
-        payload = []
-
-        for _, row in filtered_df.iterrows():
-            obj = {
-                "id": row["id"],
-                "title": row["Назва"],
-                "selected_characteristics": []
-            }
-            for param, mode in selected_criteria.items():
-                if param in row and pd.notna(row[param]):
-                    obj["selected_characteristics"].append({
-                        "parameter": param,
-                        "value": row[param],
-                        "mode": mode
-                    })
-            payload.append(obj)
-
         st.success("Дані підготовлено. Надсилаємо на оцінку...")
 
         try:
-            res = requests.post("http://localhost:8000/rank", json=payload)
-            res.raise_for_status()
-            ranking = res.json()
+            if st.session_state.custom_products:
+                ranking = rank_with_values(df_all[filter_mask], selected_criteria)
+            else:
+                ranking = rank_by_query(*st.session_state.products_query, selected_criteria, bounds)
         except Exception as e:
             st.error(f"❌ Помилка при ранжуванні: {e}")
             ranking = []